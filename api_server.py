@@ -1,22 +1,127 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import google.generativeai as genai
-import traceback
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Literal
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import time
 import os
 
-# --- Gemini AI 설정 ---
-# 환경 변수에서 API 키를 가져옵니다.
-# GOOGLE_API_KEY라는 이름의 환경 변수를 설정해야 합니다.
+from app_logging import (
+    RequestIdMiddleware,
+    StageTimer,
+    dropped_log_records,
+    logger,
+    setup_logging,
+    should_log_bodies,
+    shutdown_logging,
+)
+import metrics
+from category_classifier import create_category_classifier_from_env
+from few_shot import create_few_shot_index_from_env
+from model_backend import GenerationResult, create_backend_from_env
+from prompt_compaction import CompactedPrompt, create_prompt_compactor_from_env
+from prompts import get_system_prompt
+from response_cache import create_response_cache_from_env
+from upstream_scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE, create_scheduler_from_env
+
+# --- 로깅 설정 ---
+# LOG_LEVEL, LOG_BODY_SAMPLE_RATE, LOG_QUEUE_SIZE, LOG_FILE 환경 변수로 설정합니다.
+setup_logging()
+
+# --- 모델 백엔드 설정 ---
+# MODEL_BACKEND 환경 변수로 선택합니다. 기본값 gemini는 GOOGLE_API_KEY 환경 변수가 필요합니다.
 # 예: export GOOGLE_API_KEY='당신의 API 키'
-API_KEY = os.getenv("GOOGLE_API_KEY")
-if not API_KEY:
-    raise ValueError("GOOGLE_API_KEY 환경 변수가 설정되지 않았습니다.")
+# 부하 테스트 시에는 MODEL_BACKEND=fake로 네트워크 없이 실행할 수 있습니다.
+model_backend = create_backend_from_env()
+
+# --- 동시성 및 타임아웃 설정 ---
+# 하나의 워커가 동시에 유지할 수 있는 Gemini 호출 수의 상한입니다.
+# 슬롯이 모자라면 단건 요청이 배치 요청보다 먼저 슬롯을 받습니다.
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "200"))
+# 슬롯 대기 시간을 포함한 요청 1건의 최대 처리 시간(초)입니다.
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "30"))
+# 클라이언트 연결 종료 여부를 확인하는 주기(초)입니다.
+DISCONNECT_POLL_INTERVAL_SECONDS = float(os.getenv("DISCONNECT_POLL_INTERVAL_SECONDS", "0.5"))
+
+# 배치 요청 1건 안에서 동시에 처리할 항목 수와 배치당 최대 항목 수입니다.
+BATCH_MAX_WORKERS = int(os.getenv("BATCH_MAX_WORKERS", "16"))
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "100"))
+# /classify 요청 1건의 최대 항목 수입니다. 분류는 모델 호출 없이 로컬에서 계산하므로 생성 배치보다 크게 둡니다.
+CLASSIFY_MAX_ITEMS = int(os.getenv("CLASSIFY_MAX_ITEMS", "1000"))
+
+# --- 업스트림 스케줄러 설정 ---
+# 레이트 리밋(UPSTREAM_RATE_LIMIT_RPM, UPSTREAM_RATE_LIMIT_BURST), 재시도(UPSTREAM_MAX_RETRIES,
+# UPSTREAM_BACKOFF_BASE_MS, UPSTREAM_BACKOFF_MAX_MS), 헤지(UPSTREAM_HEDGE_ENABLED, UPSTREAM_HEDGE_MIN_DELAY_MS)를 설정합니다.
+# 동시성 슬롯(MAX_CONCURRENT_REQUESTS)도 스케줄러가 우선순위 순으로 나눠 줍니다.
+upstream_scheduler = create_scheduler_from_env(model_backend.is_retryable, max_concurrency=MAX_CONCURRENT_REQUESTS)
+
+
+class ClientDisconnectedError(Exception):
+    """모델 호출이 끝나기 전에 클라이언트가 연결을 끊었을 때 발생합니다."""
+
+# --- API 요청/응답 모델 정의 ---
+class GenerateRequest(BaseModel):
+    prompt: str
+    category: str | None = None
+    # "bypass"이면 캐시를 조회하지 않고 새로 생성합니다. 새 답변은 캐시에 덮어씁니다.
+    cache: Literal["default", "bypass"] = "default"
+
+class CompletionResponse(BaseModel):
+    reply: str
+
+class BatchGenerateRequest(BaseModel):
+    items: list[GenerateRequest] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+class ClassifyItem(BaseModel):
+    prompt: str
+
+class ClassifyRequest(BaseModel):
+    items: list[ClassifyItem] = Field(..., min_length=1, max_length=CLASSIFY_MAX_ITEMS)
+
+
+# --- 응답 캐시 ---
+# RESPONSE_CACHE_SIZE, RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_SQLITE_PATH 환경 변수로 설정합니다.
+response_cache = create_response_cache_from_env()
+
+# --- few-shot 예시 색인 ---
+# 비슷한 과거 리뷰의 실제 답변을 프롬프트에 예시로 붙입니다. 색인은 data/scripts/build_reply_index.py로 만듭니다.
+# FEW_SHOT_INDEX_DIR, FEW_SHOT_TOP_K(0이면 끔), FEW_SHOT_MIN_SCORE, FEW_SHOT_MAX_EXAMPLE_CHARS, FEW_SHOT_RELOAD_SECONDS 환경 변수로 설정합니다.
+few_shot_index = create_few_shot_index_from_env()
+
+# --- 카테고리 분류기 ---
+# 요청에 카테고리가 없으면 리뷰 텍스트와 별점으로 시스템 프롬프트를 고릅니다. 모델은 data/scripts/train_category_classifier.py로 만듭니다.
+# CATEGORY_CLASSIFIER_PATH(빈 값이면 끔), CATEGORY_CLASSIFIER_MIN_CONFIDENCE, CATEGORY_CLASSIFIER_RELOAD_SECONDS 환경 변수로 설정합니다.
+category_classifier = create_category_classifier_from_env()
+
+# --- 프롬프트 압축 ---
+# 모델에 보내기 전에 불필요한 메타데이터 줄, 인용된 이전 메일, 서명을 빼고 카테고리별 토큰 예산에 맞춥니다.
+# PROMPT_COMPACTION_ENABLED, PROMPT_DROP_FIELDS, PROMPT_TOKEN_BUDGET, PROMPT_TOKEN_BUDGETS 환경 변수로 설정합니다.
+prompt_compactor = create_prompt_compactor_from_env()
+
+# /metrics 수집 시점에 캐시 적중률을 계산합니다.
+metrics.RESPONSE_CACHE_HIT_RATIO.set_function(lambda: response_cache.stats()["hit_rate"])
+metrics.RESPONSE_CACHE_HITS.set_function(lambda: response_cache.hits)
+metrics.RESPONSE_CACHE_MISSES.set_function(lambda: response_cache.misses)
+metrics.MODEL_REGISTRY_HIT_RATIO.set_function(
+    lambda: model_backend.stats().get("model_registry", {}).get("hit_rate", 0.0)
+)
 
-genai.configure(api_key=API_KEY)
 
 # --- FastAPI 앱 설정 ---
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    # 서버 시작 시 카테고리별 모델을 미리 만들어 첫 요청에서 생성 비용이 들지 않도록 합니다.
+    model_backend.warm_up()
+    yield
+    response_cache.close()
+    shutdown_logging()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -24,75 +129,410 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
+)
+app.add_middleware(RequestIdMiddleware)
+app.add_middleware(
+    metrics.InFlightMiddleware,
+    paths=("/generate-response", "/generate-response/stream", "/generate-responses"),
 )
 
-# --- API 요청/응답 모델 정의 ---
-class GenerateRequest(BaseModel):
-    prompt: str
-    category: str | None = None
+# --- 모델 호출 ---
+def observe_usage(category: str | None, usage: dict | None):
+    """usage_metadata의 토큰 수를 메트릭에 더합니다."""
+    if not usage:
+        return
+    label = category or "default"
+    metrics.TOKENS.inc(usage.get("prompt_token_count") or 0, category=label, type="prompt")
+    metrics.TOKENS.inc(usage.get("candidates_token_count") or 0, category=label, type="candidates")
 
-class CompletionResponse(BaseModel):
-    reply: str
 
-# --- 카테고리별 시스템 프롬프트 정의 ---
-SYSTEM_PROMPTS = {
-    "bug_report": "당신은 모바일 게임의 기술적인 문제를 해결하는 '버그 리포트 분석 전문가'입니다. 사용자가 버그를 신고했습니다. 문제 상황을 명확히 이해하고, 필요하다면 추가 정보(기기 종류, OS 버전 등)를 요청하는 답변을 생성해주세요.",
-    "account_issue": "당신은 '계정 문제 해결 전문가'입니다. 사용자가 계정(로그인, 분실, 연동 등)과 관련된 문제를 겪고 있습니다. 친절하게 안심시키고, 계정 복구를 위한 절차를 안내하는 답변을 생성해주세요.",
-    "billing_inquiry": "당신은 '결제 및 환불 정책 전문가'입니다. 사용자가 결제 또는 환불에 대해 문의했습니다. 회사의 정책에 기반하여 명확하고 정확한 답변을 생성해주세요.",
-    "gameplay_question": "당신은 게임의 모든 것을 알고 있는 '마스터 게이머'입니다. 사용자가 게임 플레이에 대해 질문했습니다. 친절하고 상세하게 게임 공략법이나 팁을 알려주는 답변을 생성해주세요.",
-    "event_reward_inquiry": "당신은 게임의 '이벤트 및 보상 담당자'입니다. 사용자가 이벤트 참여나 보상 지급에 대해 문의했습니다. 이벤트 내용을 확인하고, 보상 지급 조건과 상태를 안내하는 답변을 생성해주세요.",
-    "content_suggestion": "당신은 게임의 미래를 기획하는 '게임 기획자'입니다. 사용자가 게임에 대한 새로운 아이디어를 제안했습니다. 소중한 의견에 감사하고, 긍정적으로 검토하겠다는 답변을 생성해주세요.",
-    "review_5_star": "당신은 커뮤니티 매니저입니다. 사용자가 5점 만점의 긍정적인 리뷰를 남겼습니다. 진심 어린 감사를 표현하고, 게임을 계속 즐겨달라는 따뜻한 답변을 작성해주세요.",
-    "review_4_star_no_complaint": "당신은 고객 경험 개선 담당자입니다. 사용자가 4점 이하의 리뷰를 남겼지만, 구체적인 불만 내용은 없습니다. 아쉬운 점이 있었는지 구체적인 피드백을 정중하게 요청하여, 게임을 개선할 기회를 만드는 답변을 작성해주세요.",
-    "etc": "당신은 모든 종류의 문의에 대응하는 '만능 고객 지원 담당자'입니다. 사용자의 문의에 대해 최대한 친절하고 상세하게 답변해주세요."
-}
-DEFAULT_SYSTEM_PROMPT = "당신은 모바일 게임 회사의 고객 지원 담당자입니다. 다음 문의에 대해 친절하고 도움이 되는 답변을 생성해주세요."
+async def call_model(category: str | None, prompt: str, priority: int = PRIORITY_INTERACTIVE) -> GenerationResult:
+    """
+    스케줄러(레이트 리밋, 우선순위 동시성 슬롯, 재시도, 헤지)를 거쳐 모델 백엔드의 비동기 API로 답변을 생성합니다.
+    각 시도는 동시성 슬롯을 얻은 뒤 실행되며, 이벤트 루프를 막지 않으므로
+    스레드 풀 크기와 무관하게 많은 호출을 동시에 유지할 수 있습니다.
+    """
+    async def attempt():
+        started = time.perf_counter()
+        metrics.UPSTREAM_IN_FLIGHT.inc()
+        try:
+            return await model_backend.generate(category, prompt)
+        finally:
+            metrics.UPSTREAM_IN_FLIGHT.dec()
+            metrics.UPSTREAM_LATENCY.observe(time.perf_counter() - started,
+                                             backend=model_backend.name, category=category or "default")
+
+    # 헤지 요청은 상담원이 기다리는 단건 요청에만 사용합니다.
+    result = await upstream_scheduler.run(attempt, priority, hedge=priority == PRIORITY_INTERACTIVE)
+    observe_usage(category, result.usage)
+    return result
+
+
+async def call_model_stream(category: str | None, prompt: str):
+    """
+    모델 백엔드의 스트리밍 API로 답변을 생성하며, 도착하는 텍스트 조각을 순서대로 내보냅니다.
+    마지막에는 ("usage", 사용량 dict)를 내보냅니다. 생성이 끝날 때까지 동시성 슬롯을 점유합니다.
+    첫 조각이 도착하기 전에 일시적인 오류가 나면 스케줄러가 재시도합니다.
+    """
+    async def attempt():
+        started = time.perf_counter()
+        metrics.UPSTREAM_IN_FLIGHT.inc()
+        try:
+            async for kind, value in model_backend.generate_stream(category, prompt):
+                if kind == "usage":
+                    observe_usage(category, value)
+                yield kind, value
+        finally:
+            metrics.UPSTREAM_IN_FLIGHT.dec()
+            metrics.UPSTREAM_LATENCY.observe(time.perf_counter() - started,
+                                             backend=model_backend.name, category=category or "default")
+
+    async for event in upstream_scheduler.run_stream(attempt, PRIORITY_INTERACTIVE):
+        yield event
+
+
+def choose_category(requested: str | None, prompt: str) -> tuple[str | None, str]:
+    """요청의 카테고리(없으면 분류기의 결과)와 결정 방식(request, classifier, default)을 반환하고 메트릭에 기록합니다."""
+    category, source = category_classifier.choose(requested, prompt)
+    metrics.CATEGORY_SELECTIONS.inc(source=source)
+    return category, source
+
+
+def compact_prompt(category: str | None, prompt: str) -> CompactedPrompt:
+    """프롬프트를 압축하고 압축 전후의 예상 토큰 수를 메트릭에 기록합니다. 캐시와 모델 호출에는 압축한 프롬프트를 사용합니다."""
+    compacted = prompt_compactor.compact(category, prompt)
+    label = category or "default"
+    metrics.PROMPT_TOKENS.inc(compacted.tokens_before, category=label, stage="before")
+    metrics.PROMPT_TOKENS.inc(compacted.tokens_after, category=label, stage="after")
+    return compacted
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Server-Sent Events 형식의 메시지 한 건을 만듭니다."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def observe_request(endpoint: str, category: str | None, status: str, timer: StageTimer,
+                    error_type: str | None = None):
+    """요청 1건의 처리 결과와 단계별 소요 시간을 메트릭에 기록합니다."""
+    label = category or "default"
+    metrics.REQUESTS.inc(endpoint=endpoint, category=label, status=status)
+    metrics.REQUEST_LATENCY.observe(timer.elapsed_seconds(), endpoint=endpoint, category=label)
+    for stage, elapsed_ms in timer.timings_ms.items():
+        metrics.STAGE_LATENCY.observe(elapsed_ms / 1000, endpoint=endpoint, stage=stage)
+    if error_type:
+        metrics.ERRORS.inc(endpoint=endpoint, error_type=error_type)
+
+
+def record_generation(endpoint: str, category: str | None, prompt: str, reply: str | None,
+                      timer: StageTimer, cached: bool, **fields):
+    """
+    답변 생성 1건을 메트릭과 구조화된 로그로 남깁니다.
+    프롬프트/답변 전문은 LOG_BODY_SAMPLE_RATE 비율로 샘플링된 요청에만 포함합니다.
+    """
+    observe_request(endpoint, category, "cached" if cached else "ok", timer)
+    record = {
+        "endpoint": endpoint,
+        "category": category,
+        "cached": cached,
+        "prompt_chars": len(prompt),
+        "reply_chars": len(reply) if reply is not None else None,
+        "timings_ms": timer.timings_ms,
+        **fields,
+    }
+    if should_log_bodies():
+        record["system_prompt"] = get_system_prompt(category)
+        record["prompt"] = prompt
+        record["reply"] = reply
+    logger.info("generation_completed", extra={"fields": record})
+
+
+async def generate_reply(category: str | None, prompt: str, cache_mode: str = "default",
+                         timer: StageTimer | None = None, priority: int = PRIORITY_INTERACTIVE) -> tuple[str, bool]:
+    """
+    응답 캐시를 확인한 뒤, 없으면 few-shot 예시를 붙여 모델을 호출하고 결과를 캐시에 저장합니다.
+    캐시 키는 예시를 붙이기 전의 프롬프트입니다.
+    cache_mode가 "bypass"이면 캐시 조회를 건너뜁니다. (답변, 캐시 적중 여부)를 반환합니다.
+    """
+    timer = timer or StageTimer()
+    if cache_mode == "bypass":
+        response_cache.record_bypass()
+    else:
+        with timer.stage("cache_lookup"):
+            cached_reply = await response_cache.get_async(category, prompt)
+        if cached_reply is not None:
+            return cached_reply, True
+
+    with timer.stage("retrieval"):
+        model_prompt = few_shot_index.augment(prompt)
+    with timer.stage("model_call"):
+        reply_text = (await call_model(category, model_prompt, priority)).text
+    with timer.stage("cache_store"):
+        await response_cache.set_async(category, prompt, reply_text)
+    return reply_text, False
+
+
+async def run_with_disconnect_guard(http_request: Request, coro):
+    """
+    코루틴을 타임아웃과 함께 실행하면서 클라이언트 연결 상태를 주기적으로 확인합니다.
+    클라이언트가 연결을 끊으면 진행 중인 모델 호출을 취소하고 ClientDisconnectedError를 발생시킵니다.
+    """
+    task = asyncio.ensure_future(asyncio.wait_for(coro, timeout=REQUEST_TIMEOUT_SECONDS))
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL_SECONDS)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                raise ClientDisconnectedError()
+    finally:
+        if not task.done():
+            task.cancel()
+
 
 # --- API 엔드포인트 정의 ---
 @app.post("/generate-response", response_model=CompletionResponse)
-def generate_response(request: GenerateRequest):
+async def generate_response(request: GenerateRequest, http_request: Request):
     """
     시스템 프롬프트와 사용자 프롬프트를 사용하여 Gemini 모델을 호출하고, 생성된 답변을 반환합니다.
     카테고리가 지정된 경우, 해당 카테고리에 맞는 특화된 시스템 프롬프트를 사용합니다.
+    모델 호출은 비동기로 이루어지며, 타임아웃을 넘기거나 클라이언트가 연결을 끊으면 취소됩니다.
     """
-    
-    # 카테고리에 따라 시스템 프롬프트 선택
-    system_prompt = DEFAULT_SYSTEM_PROMPT
-    if request.category and request.category in SYSTEM_PROMPTS:
-        system_prompt = SYSTEM_PROMPTS[request.category]
+    timer = StageTimer()
 
-    print("--- SYSTEM-PROMPT-TO-AI-START ---")
-    print(system_prompt)
-    print("--- SYSTEM-PROMPT-TO-AI-END ---")
-    print("--- USER-PROMPT-TO-AI-START ---")
-    print(request.prompt)
-    print("--- USER-PROMPT-TO-AI-END ---")
+    # 카테고리에 따라 시스템 프롬프트 선택 (카테고리가 없으면 분류기로 고름)
+    with timer.stage("prompt_selection"):
+        category, category_source = choose_category(request.category, request.prompt)
+    with timer.stage("prompt_compaction"):
+        compacted = compact_prompt(category, request.prompt)
 
     try:
-        # Gemini 모델 설정 (시스템 프롬프트 포함)
-        model = genai.GenerativeModel(
-            model_name="gemini-2.0-flash-lite",
-            system_instruction=system_prompt
+        reply_text, cached = await run_with_disconnect_guard(
+            http_request, generate_reply(category, compacted.prompt, request.cache, timer)
+        )
+    except ClientDisconnectedError:
+        observe_request("generate-response", category, "disconnected", timer)
+        logger.info("client_disconnected", extra={"fields": {"endpoint": "generate-response", "category": category,
+                                                               "timings_ms": timer.timings_ms}})
+        # 499: 클라이언트가 응답을 받기 전에 연결을 닫음 (nginx 관례)
+        raise HTTPException(status_code=499, detail="클라이언트가 연결을 종료하여 요청이 취소되었습니다.")
+    except asyncio.TimeoutError:
+        observe_request("generate-response", category, "timeout", timer, "TimeoutError")
+        logger.warning("generation_timeout", extra={"fields": {"endpoint": "generate-response", "category": category,
+                                                                "timings_ms": timer.timings_ms}})
+        raise HTTPException(
+            status_code=504,
+            detail=f"모델 응답이 {REQUEST_TIMEOUT_SECONDS:g}초 안에 도착하지 않았습니다."
         )
-        
-        # 모델 호출
-        response = model.generate_content(request.prompt)
-        
-        reply_text = response.text
-
-        print("--- AI-GENERATED-REPLY-START ---")
-        print(reply_text)
-        print("--- AI-GENERATED-REPLY-END ---")
-
-        return CompletionResponse(reply=reply_text)
-        
     except Exception as e:
-        print("--- FULL-EXCEPTION-START ---")
-        traceback.print_exc()
-        print("--- FULL-EXCEPTION-END ---")
+        observe_request("generate-response", category, "error", timer, type(e).__name__)
+        logger.exception("generation_failed", extra={"fields": {"endpoint": "generate-response", "category": category,
+                                                                 "error_type": type(e).__name__,
+                                                                 "timings_ms": timer.timings_ms}})
         raise HTTPException(status_code=500, detail=f"모델 호출 중 서버 내부 오류가 발생했습니다: {str(e)}")
 
+    with timer.stage("serialization"):
+        body = CompletionResponse(reply=reply_text).model_dump_json()
+
+    record_generation("generate-response", category, compacted.prompt, reply_text, timer, cached,
+                      category_source=category_source, **compacted.log_fields())
+    return Response(content=body, media_type="application/json")
+
+
+@app.post("/generate-response/stream")
+async def generate_response_stream(request: GenerateRequest):
+    """
+    /generate-response의 스트리밍 버전입니다. 생성되는 답변을 Server-Sent Events로 전달합니다.
+
+    이벤트 종류:
+      - chunk: {"text": 텍스트 조각}
+      - done:  {"reply": 전체 답변, "usage": 토큰 사용량 또는 null, "cached": 캐시 적중 여부}
+      - error: {"detail": 오류 메시지}
+    클라이언트가 연결을 끊으면 스트림과 함께 모델 호출도 취소됩니다.
+    """
+    timer = StageTimer()
+    with timer.stage("prompt_selection"):
+        category, category_source = choose_category(request.category, request.prompt)
+    with timer.stage("prompt_compaction"):
+        compacted = compact_prompt(category, request.prompt)
+    prompt = compacted.prompt
+
+    async def stream_events():
+        if request.cache == "bypass":
+            response_cache.record_bypass()
+        else:
+            with timer.stage("cache_lookup"):
+                cached_reply = await response_cache.get_async(category, prompt)
+            if cached_reply is not None:
+                yield format_sse("chunk", {"text": cached_reply})
+                yield format_sse("done", {"reply": cached_reply, "usage": None, "cached": True})
+                record_generation("generate-response/stream", category, prompt, cached_reply, timer, True,
+                                  category_source=category_source, **compacted.log_fields())
+                return
+
+        with timer.stage("retrieval"):
+            model_prompt = few_shot_index.augment(prompt)
+
+        started = time.perf_counter()
+        deadline = time.monotonic() + REQUEST_TIMEOUT_SECONDS
+        parts = []
+        usage = None
+        stream = call_model_stream(category, model_prompt)
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError()
+                try:
+                    kind, value = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+                except StopAsyncIteration:
+                    break
+                if kind == "text":
+                    if not parts:
+                        timer.add("first_token", time.perf_counter() - started)
+                    parts.append(value)
+                    yield format_sse("chunk", {"text": value})
+                else:
+                    usage = value
+        except asyncio.TimeoutError:
+            observe_request("generate-response/stream", category, "timeout", timer, "TimeoutError")
+            logger.warning("generation_timeout", extra={"fields": {"endpoint": "generate-response/stream",
+                                                                    "category": category, "timings_ms": timer.timings_ms}})
+            yield format_sse("error", {"detail": f"모델 응답이 {REQUEST_TIMEOUT_SECONDS:g}초 안에 완료되지 않았습니다."})
+            return
+        except Exception as e:
+            observe_request("generate-response/stream", category, "error", timer, type(e).__name__)
+            logger.exception("generation_failed", extra={"fields": {"endpoint": "generate-response/stream",
+                                                                     "category": category, "error_type": type(e).__name__,
+                                                                     "timings_ms": timer.timings_ms}})
+            yield format_sse("error", {"detail": f"모델 호출 중 서버 내부 오류가 발생했습니다: {str(e)}"})
+            return
+        finally:
+            await stream.aclose()
+            timer.add("model_call", time.perf_counter() - started)
+
+        reply_text = "".join(parts)
+        await response_cache.set_async(category, prompt, reply_text)
+        yield format_sse("done", {"reply": reply_text, "usage": usage, "cached": False})
+        record_generation("generate-response/stream", category, prompt, reply_text, timer, False,
+                          usage=usage, category_source=category_source, **compacted.log_fields())
+
+    return StreamingResponse(
+        stream_events(),
+        media_type="text/event-stream",
+        # 리버스 프록시(Apache/nginx)가 이벤트를 모아서 보내지 않도록 버퍼링을 끕니다.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/generate-responses")
+async def generate_responses(batch: BatchGenerateRequest):
+    """
+    한 페이지 분량의 리뷰를 한 번의 HTTP 요청으로 처리하는 배치 엔드포인트입니다.
+    배치 안에서 같은 (카테고리, 정규화된 프롬프트)는 한 번만 생성하고,
+    최대 BATCH_MAX_WORKERS개씩 동시에 처리하여 끝나는 순서대로 NDJSON 한 줄씩 스트리밍합니다.
+
+    각 줄의 형식: {"index": 요청 내 순번, "reply": 답변 또는 null, "error": 오류 메시지 또는 null}
+    """
+    # 동일한 프롬프트를 하나의 작업으로 묶습니다.
+    groups = {}
+    for index, item in enumerate(batch.items):
+        category, category_source = choose_category(item.category, item.prompt)
+        compacted = compact_prompt(category, item.prompt)
+        key = (response_cache.key_for(category, compacted.prompt), item.cache)
+        if key not in groups:
+            groups[key] = (category, category_source, compacted, item.cache, [])
+        groups[key][4].append(index)
+
+    worker_semaphore = asyncio.Semaphore(BATCH_MAX_WORKERS)
+
+    async def run_group(category, category_source, compacted, cache_mode, indices):
+        async with worker_semaphore:
+            timer = StageTimer()
+            try:
+                reply_text, cached = await asyncio.wait_for(
+                    generate_reply(category, compacted.prompt, cache_mode, timer, PRIORITY_BATCH),
+                    timeout=REQUEST_TIMEOUT_SECONDS,
+                )
+                record_generation("generate-responses", category, compacted.prompt, reply_text, timer, cached,
+                                  batch_indices=indices, category_source=category_source, **compacted.log_fields())
+                return indices, reply_text, None
+            except asyncio.TimeoutError:
+                observe_request("generate-responses", category, "timeout", timer, "TimeoutError")
+                logger.warning("generation_timeout", extra={"fields": {"endpoint": "generate-responses",
+                                                                        "category": category, "batch_indices": indices,
+                                                                        "timings_ms": timer.timings_ms}})
+                return indices, None, f"모델 응답이 {REQUEST_TIMEOUT_SECONDS:g}초 안에 도착하지 않았습니다."
+            except Exception as e:
+                observe_request("generate-responses", category, "error", timer, type(e).__name__)
+                logger.exception("generation_failed", extra={"fields": {"endpoint": "generate-responses",
+                                                                         "category": category, "batch_indices": indices,
+                                                                         "error_type": type(e).__name__,
+                                                                         "timings_ms": timer.timings_ms}})
+                return indices, None, f"모델 호출 중 서버 내부 오류가 발생했습니다: {str(e)}"
+
+    async def stream_results():
+        started = time.perf_counter()
+        errors = 0
+        tasks = [asyncio.ensure_future(run_group(*group)) for group in groups.values()]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                indices, reply_text, error = await next_done
+                errors += len(indices) if error else 0
+                for index in indices:
+                    line = {"index": index, "reply": reply_text, "error": error}
+                    yield json.dumps(line, ensure_ascii=False) + "\n"
+            logger.info("batch_completed", extra={"fields": {
+                "items": len(batch.items),
+                "unique_prompts": len(groups),
+                "errors": errors,
+                "total_ms": round((time.perf_counter() - started) * 1000, 3),
+            }})
+        finally:
+            # 클라이언트가 중간에 연결을 끊으면 남은 모델 호출을 취소합니다.
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
+
+
+@app.post("/classify")
+def classify(request: ClassifyRequest):
+    """
+    프롬프트(리뷰)의 카테고리를 로컬 분류기로 예측합니다. 모델을 호출하지 않으므로 여러 건을 한 번에 보낼 수 있습니다.
+
+    응답 형식: {"results": [{"index": 순번, "category": 카테고리 또는 null, "confidence": 최고 확률,
+                             "scores": {카테고리: 확률, ...}}, ...]}
+    category는 최고 확률이 CATEGORY_CLASSIFIER_MIN_CONFIDENCE 이상일 때만 채워지며, null이면 기본 프롬프트가 사용됩니다.
+    """
+    if not category_classifier.enabled:
+        raise HTTPException(status_code=503, detail="카테고리 분류 모델이 없습니다. train_category_classifier.py로 먼저 학습하세요.")
+    results = [{"index": index, **category_classifier.classify(item.prompt)} for index, item in enumerate(request.items)]
+    return {"results": results}
+
 
 @app.get("/")
 def read_root():
     return {"status": "Customer Support AI API is running."}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def read_metrics():
+    """Prometheus 텍스트 형식의 서버 메트릭을 반환합니다."""
+    return PlainTextResponse(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/stats")
+def read_stats():
+    """서버 내부 캐시 상태를 반환합니다."""
+    return {
+        "backend": model_backend.stats(),
+        "upstream_scheduler": upstream_scheduler.stats(),
+        "response_cache": response_cache.stats(),
+        "few_shot": few_shot_index.stats(),
+        "category_classifier": category_classifier.stats(),
+        "prompt_compaction": prompt_compactor.stats(),
+        "logging": {"dropped_records": dropped_log_records()},
+    }
@@ -0,0 +1,189 @@
+import contextvars
+import copy
+import datetime
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import time
+import uuid
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+
+# --- 로깅 설정 ---
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# 프롬프트/답변 전문을 로그에 남길 요청의 비율입니다. (0이면 남기지 않음, 1이면 전부)
+LOG_BODY_SAMPLE_RATE = float(os.getenv("LOG_BODY_SAMPLE_RATE", "0.01"))
+# 백그라운드 스레드가 처리하기 전까지 보관할 로그 레코드 수입니다. 가득 차면 새 레코드는 버려집니다.
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# 지정하면 표준 출력 대신 파일에 기록합니다.
+LOG_FILE = os.getenv("LOG_FILE")
+
+REQUEST_ID_HEADER = "x-request-id"
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+
+class RequestIdFilter(logging.Filter):
+    """현재 요청의 ID를 로그 레코드에 붙입니다."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    로그 레코드를 한 줄짜리 JSON으로 만듭니다.
+    logger.info("...", extra={"fields": {...}})로 넘긴 값은 최상위 키로 들어갑니다.
+    """
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.datetime.fromtimestamp(record.created, datetime.timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+        }
+        payload.update(getattr(record, "fields", None) or {})
+        if record.exc_text:
+            payload["exception"] = record.exc_text
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    레코드를 큐에 넣기만 하고 바로 반환하는 핸들러입니다. 실제 출력은 QueueListener의 백그라운드 스레드가 담당합니다.
+    큐가 가득 차면 요청 경로를 막지 않도록 레코드를 버리고 dropped 수만 늘립니다.
+    """
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # JSON 직렬화는 백그라운드 스레드에서 하도록, 여기서는 메시지와 예외 정보만 문자열로 고정합니다.
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+logger = logging.getLogger("api_server")
+_queue_handler = None
+_listener = None
+_listener_running = False
+
+
+def setup_logging():
+    """
+    api_server 로거에 큐 기반 JSON 로깅을 설정하고 백그라운드 출력 스레드를 시작합니다.
+    여러 번 호출해도 한 번만 설정됩니다.
+    """
+    global _queue_handler, _listener, _listener_running
+    if _listener is None:
+        if LOG_FILE:
+            output_handler = logging.FileHandler(LOG_FILE, encoding="utf-8")
+        else:
+            output_handler = logging.StreamHandler(sys.stdout)
+        output_handler.setFormatter(JsonFormatter())
+
+        _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=LOG_QUEUE_SIZE))
+        _queue_handler.addFilter(RequestIdFilter())
+        _listener = QueueListener(_queue_handler.queue, output_handler, respect_handler_level=True)
+
+        logger.addHandler(_queue_handler)
+        logger.setLevel(LOG_LEVEL)
+        logger.propagate = False
+
+    if not _listener_running:
+        _listener.start()
+        _listener_running = True
+
+
+def shutdown_logging():
+    """남은 로그를 모두 출력한 뒤 백그라운드 스레드를 멈춥니다."""
+    global _listener_running
+    if _listener_running:
+        _listener.stop()
+        _listener_running = False
+
+
+def dropped_log_records() -> int:
+    return _queue_handler.dropped if _queue_handler else 0
+
+
+def should_log_bodies() -> bool:
+    """이번 요청의 프롬프트/답변 전문을 로그에 남길지 LOG_BODY_SAMPLE_RATE 비율로 결정합니다."""
+    return LOG_BODY_SAMPLE_RATE > 0 and random.random() < LOG_BODY_SAMPLE_RATE
+
+
+class StageTimer:
+    """요청 처리 단계별 소요 시간(ms)을 기록합니다."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.timings_ms = {}
+
+    def elapsed_seconds(self) -> float:
+        """타이머를 만든 뒤 지난 시간(초)입니다."""
+        return time.perf_counter() - self.started
+
+    @contextmanager
+    def stage(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - started)
+
+    def add(self, name: str, seconds: float):
+        self.timings_ms[name] = round(self.timings_ms.get(name, 0.0) + seconds * 1000, 3)
+
+
+class RequestIdMiddleware:
+    """
+    요청마다 ID를 부여하는 ASGI 미들웨어입니다.
+    클라이언트가 X-Request-ID 헤더를 보내면 그 값을 사용하고, 없으면 새로 만듭니다. 응답 헤더에도 같은 값을 넣습니다.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope["headers"]:
+            if name == REQUEST_ID_HEADER.encode():
+                request_id = value.decode("latin-1")[:128]
+                break
+        request_id = request_id or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (REQUEST_ID_HEADER.encode(), request_id.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
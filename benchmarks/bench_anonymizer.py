@@ -0,0 +1,87 @@
+"""
+비식별화(anonymizer) 마이크로 벤치마크
+
+긴 메일/리뷰 본문을 만들어 기존 방식(정규식 2개를 매번 컴파일해 두 번 치환)과
+data/scripts/anonymizer.py(미리 컴파일한 정규식 하나로 한 번에 치환)의 처리 속도(MB/s)를 비교합니다.
+기존 방식은 이메일/URL만 처리하므로, 새 방식은 더 많은 종류(전화번호, 주문 번호, UID)를 처리하면서 비교됩니다.
+일반 본문에서는 표준 re 엔진이 위치마다 패턴을 시도하는 비용이 대부분이라 기존과 비슷하고(0.9~1.2배),
+큰 차이는 @ 없는 긴 영문/숫자 토큰이 포함된 본문(기존 방식이 위치마다 다시 훑는 경우)에서 납니다.
+(목표를 조정한 내용은 README v2.11 참고)
+
+사용 예:
+    python benchmarks/bench_anonymizer.py
+    python benchmarks/bench_anonymizer.py --body-kb 64,512 --repeat 5
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+# 이 스크립트 파일의 위치를 기준으로 프로젝트 루트 디렉터리를 찾습니다.
+# (benchmarks/ -> project_root)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'data', 'scripts'))
+
+from anonymizer import anonymize_text  # noqa: E402
+
+# 개인정보가 드문드문 섞인 일반적인 문의 본문
+SAMPLE_PARAGRAPH = (
+    "안녕하세요, 결제 관련 문의드립니다. 어제 구매한 상품이 지급되지 않았어요. "
+    "주문 번호는 GPA.3371-2201-4478-91234 이고 UID: 81234567 입니다. "
+    "연락은 010-2345-6789 또는 cs.user_01@example.com 으로 부탁드려요. "
+    "스크린샷은 https://drive.example.com/file/d/abcDEF123/view?usp=sharing 에 올렸습니다. "
+)
+# 영문 문의 본문 (대부분의 위치가 패턴의 첫 글자 후보가 되는 경우)
+SAMPLE_ENGLISH = (
+    "Hello team, my account was charged twice for the same package. "
+    "Order GPA.3371-2201-4478-91234, UID: 81234567. Please call +82 10 2345 6789 "
+    "or mail john.doe@example.com. Screenshot: https://example.com/shot?id=42 Thanks! "
+)
+# 개인정보 없이 긴 영문/숫자 토큰이 이어지는 본문 (로그나 base64 첨부가 본문에 들어온 경우)
+SAMPLE_LONG_TOKENS = ("QmFzZTY0RW5jb2RlZERhdGFCbG9jaw" * 40 + " ") * 4
+
+
+def legacy_anonymize_text(text):
+    """비교용: 기존 mbox_converter.anonymize_text 구현"""
+    if not isinstance(text, str):
+        return ""
+    text = re.sub(r'[\w\.-]+@[\w\.-]+', '[email_address]', text)
+    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '[url]', text)
+    return text
+
+
+def build_body(size_kb: int, sample: str) -> str:
+    size = size_kb * 1024
+    return (sample * (size // len(sample) + 1))[:size]
+
+
+def measure(function, body: str, repeat: int) -> float:
+    """repeat번 실행한 것 중 가장 빠른 시간(초)을 반환합니다."""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function(body)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark for the shared PII anonymizer.")
+    parser.add_argument('--body-kb', default='16,128,1024', help="Comma-separated body sizes in KB.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per case (best time is reported).")
+    args = parser.parse_args()
+
+    cases = [('korean', SAMPLE_PARAGRAPH), ('english', SAMPLE_ENGLISH), ('long-tokens', SAMPLE_LONG_TOKENS)]
+    print(f"{'body':<12}{'size':>8}{'legacy MB/s':>14}{'new MB/s':>12}{'speedup':>10}")
+    for name, sample in cases:
+        for size_kb in (int(value) for value in args.body_kb.split(',')):
+            body = build_body(size_kb, sample)
+            megabytes = len(body.encode('utf-8')) / 1024 / 1024
+            legacy = measure(legacy_anonymize_text, body, args.repeat)
+            new = measure(anonymize_text, body, args.repeat)
+            print(f"{name:<12}{size_kb:>6}KB{megabytes / legacy:>14.1f}{megabytes / new:>12.1f}{legacy / new:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,370 @@
+"""
+API 서버 부하/지연 시간 벤치마크
+
+가짜 모델 백엔드(MODEL_BACKEND=fake)로 api_server를 구동하고, 동시성/프롬프트 크기/카테고리 조합별로
+처리량(req/s), p50/p95/p99 지연 시간, 워커당 메모리(RSS)를 측정합니다.
+결과는 표로 출력하고 --output을 지정하면 JSON으로 저장하여 실행 간 비교에 사용할 수 있습니다.
+
+사용 예:
+    python benchmarks/bench_api.py --mode inprocess --concurrency 1,10,50,200
+    python benchmarks/bench_api.py --mode uvicorn --workers 2 --output bench.json
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+# 이 스크립트 파일의 위치를 기준으로 프로젝트 루트 디렉터리를 찾습니다.
+# (benchmarks/ -> project_root)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SAMPLE_REVIEW = "모험 좋아하는 사람으로서 최고의 게임이에요! 근데 많이 플레이하다보면 맨날 똑같은 느낌도 있어요. 업데이트 주기가 좀 더 짧으면 좋을 것 같아요! "
+
+
+def build_prompt(index: int, prompt_chars: int) -> str:
+    """확장 프로그램과 같은 형식의 프롬프트를 만듭니다. 요청마다 내용이 달라 응답 캐시에 걸리지 않습니다."""
+    header = (
+        f"Author: bench-user-{index}\n"
+        "Package Name: com.banjihagames.seoul2033_backer\n"
+        "Review Submit Date and Time: 2025-07-13T10:00:00Z\n"
+        "Star Rating: 5\n"
+        "Review Text: "
+    )
+    body_chars = max(1, prompt_chars - len(header))
+    body = (SAMPLE_REVIEW * (body_chars // len(SAMPLE_REVIEW) + 1))[:body_chars]
+    return f"{header}{body} #{index}"
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """정렬된 값에서 nearest-rank 방식으로 백분위수를 구합니다."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize_ms(values: list) -> dict:
+    values = sorted(v * 1000 for v in values)
+    if not values:
+        return {}
+    return {
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "mean": round(statistics.fmean(values), 2),
+        "max": round(values[-1], 2),
+    }
+
+
+# --- 메모리 측정 ---
+def read_rss_mb(pid: int) -> float | None:
+    """프로세스의 상주 메모리(RSS, MB)를 읽습니다. psutil이 없으면 /proc을 사용하고, 둘 다 없으면 None입니다."""
+    try:
+        import psutil
+        return round(psutil.Process(pid).memory_info().rss / 1024 / 1024, 1)
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
+
+
+def is_worker_process(pid: int) -> bool:
+    """multiprocessing의 resource_tracker처럼 요청을 처리하지 않는 보조 프로세스를 제외합니다."""
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as f:
+            return b"resource_tracker" not in f.read()
+    except OSError:
+        return True
+
+
+def list_child_pids(pid: int) -> list:
+    """uvicorn --workers로 생성된 워커 프로세스의 pid 목록을 찾습니다."""
+    try:
+        import psutil
+        children = psutil.Process(pid).children(recursive=True)
+        return [child.pid for child in children if "resource_tracker" not in " ".join(child.cmdline())]
+    except ImportError:
+        pass
+    except Exception:
+        return []
+    children = []
+    if not os.path.isdir("/proc"):
+        return children
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # /proc/<pid>/stat의 4번째 필드가 부모 pid입니다. (2번째 필드는 괄호로 감싼 이름)
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if ppid == pid and is_worker_process(int(entry)):
+            children.append(int(entry))
+    return children
+
+
+# --- 부하 생성 ---
+async def run_load(client: httpx.AsyncClient, endpoint: str, concurrency: int, total_requests: int,
+                   prompt_chars: int, category: str | None, use_cache: bool) -> dict:
+    """동시에 concurrency개의 요청을 유지하면서 total_requests개의 요청을 보냅니다. (closed-loop)"""
+    latencies = []
+    first_token_latencies = []
+    errors = {}
+    next_index = 0
+
+    def take_index():
+        nonlocal next_index
+        if next_index >= total_requests:
+            return None
+        next_index += 1
+        return next_index - 1
+
+    async def send_one(index: int):
+        payload = {"prompt": build_prompt(index, prompt_chars), "category": category}
+        if not use_cache:
+            payload["cache"] = "bypass"
+        started = time.perf_counter()
+        try:
+            if endpoint == "stream":
+                async with client.stream("POST", "/generate-response/stream", json=payload) as response:
+                    first_token = None
+                    async for line in response.aiter_lines():
+                        if first_token is None and line.startswith("event: chunk"):
+                            first_token = time.perf_counter() - started
+                        if line.startswith("event: error"):
+                            raise RuntimeError("stream error event")
+                    response.raise_for_status()
+                    if first_token is not None:
+                        first_token_latencies.append(first_token)
+            else:
+                response = await client.post("/generate-response", json=payload)
+                response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+        except Exception as e:
+            name = type(e).__name__
+            errors[name] = errors.get(name, 0) + 1
+
+    async def worker():
+        while (index := take_index()) is not None:
+            await send_one(index)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    result = {
+        "requests": total_requests,
+        "completed": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "latency_ms": summarize_ms(latencies),
+    }
+    if endpoint == "stream":
+        result["first_token_ms"] = summarize_ms(first_token_latencies)
+    return result
+
+
+def iter_scenarios(args):
+    for category in args.categories:
+        for prompt_chars in args.prompt_sizes:
+            for concurrency in args.concurrency:
+                total = args.requests or max(50, concurrency * 10)
+                yield category, prompt_chars, concurrency, total
+
+
+# --- 실행 모드 ---
+async def bench_inprocess(args) -> list:
+    """uvicorn 없이 ASGI 앱을 같은 프로세스에서 직접 호출합니다. 네트워크 스택을 제외한 요청 경로만 측정합니다."""
+    sys.path.insert(0, PROJECT_ROOT)
+    import api_server
+
+    results = []
+    transport = httpx.ASGITransport(app=api_server.app)
+    async with api_server.app.router.lifespan_context(api_server.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=args.timeout) as client:
+            for category, prompt_chars, concurrency, total in iter_scenarios(args):
+                result = await run_load(client, args.endpoint, concurrency, total,
+                                        prompt_chars, category, args.use_cache)
+                result.update({
+                    "mode": "inprocess",
+                    "concurrency": concurrency,
+                    "prompt_chars": prompt_chars,
+                    "category": category,
+                    "rss_mb_per_worker": [read_rss_mb(os.getpid())],
+                })
+                results.append(result)
+                print_result(result)
+    return results
+
+
+def find_free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_until_ready(base_url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn이 종료되었습니다. (exit code {process.returncode})")
+            try:
+                if (await client.get("/")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+    raise TimeoutError("uvicorn 서버가 제한 시간 안에 시작되지 않았습니다.")
+
+
+async def bench_uvicorn(args, env: dict) -> list:
+    """uvicorn 서버를 별도 프로세스로 띄우고 HTTP로 부하를 줍니다. 워커별 메모리도 함께 측정합니다."""
+    port = find_free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    command = [
+        sys.executable, "-m", "uvicorn", "api_server:app",
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+    ]
+    process = subprocess.Popen(command, cwd=PROJECT_ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    results = []
+    try:
+        await wait_until_ready(base_url, process)
+        limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+        async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+            for category, prompt_chars, concurrency, total in iter_scenarios(args):
+                result = await run_load(client, args.endpoint, concurrency, total,
+                                        prompt_chars, category, args.use_cache)
+                # --workers 1이면 uvicorn이 직접 요청을 처리하고, 그 이상이면 자식 프로세스가 처리합니다.
+                worker_pids = list_child_pids(process.pid) if args.workers > 1 else [process.pid]
+                result.update({
+                    "mode": "uvicorn",
+                    "workers": args.workers,
+                    "concurrency": concurrency,
+                    "prompt_chars": prompt_chars,
+                    "category": category,
+                    "rss_mb_per_worker": [read_rss_mb(pid) for pid in worker_pids],
+                })
+                results.append(result)
+                print_result(result)
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return results
+
+
+# --- 출력 ---
+def print_result(result: dict):
+    latency = result["latency_ms"]
+    line = (
+        f"[{result['mode']}] category={result['category'] or '-':<26} prompt={result['prompt_chars']:>5}자 "
+        f"c={result['concurrency']:>4}  {result['rps']:>8.1f} req/s  "
+        f"p50={latency.get('p50', 0):>8.1f}ms p95={latency.get('p95', 0):>8.1f}ms p99={latency.get('p99', 0):>8.1f}ms"
+    )
+    if "first_token_ms" in result:
+        line += f"  ttft_p50={result['first_token_ms'].get('p50', 0):.1f}ms"
+    if result["errors"]:
+        line += f"  errors={result['errors']}"
+    print(line, file=sys.stderr)
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def parse_int_list(value: str) -> list:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def parse_categories(value: str) -> list:
+    # "none"은 카테고리 없이(기본 프롬프트) 보내는 경우입니다.
+    return [None if v.strip() == "none" else v.strip() for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="가짜 모델 백엔드로 API 서버의 처리량과 지연 시간을 측정합니다.")
+    parser.add_argument("--mode", choices=["inprocess", "uvicorn", "both"], default="inprocess")
+    parser.add_argument("--endpoint", choices=["generate", "stream"], default="generate",
+                        help="generate: /generate-response, stream: /generate-response/stream (첫 토큰 시간 포함)")
+    parser.add_argument("--concurrency", type=parse_int_list, default=[1, 10, 50, 200])
+    parser.add_argument("--prompt-sizes", type=parse_int_list, default=[200, 2000], help="프롬프트 길이(문자 수) 목록")
+    parser.add_argument("--categories", type=parse_categories, default=[None], help="예: none,review_5_star,bug_report")
+    parser.add_argument("--requests", type=int, default=0, help="시나리오당 요청 수 (0이면 max(50, 동시성×10))")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn 모드의 워커 프로세스 수")
+    parser.add_argument("--timeout", type=float, default=60.0, help="클라이언트 요청 타임아웃(초)")
+    parser.add_argument("--use-cache", action="store_true", help="응답 캐시를 사용합니다. (기본: cache=bypass)")
+    parser.add_argument("--fake-latency-ms", type=float, default=100.0)
+    parser.add_argument("--fake-latency-distribution", choices=["fixed", "uniform", "lognormal"], default="lognormal")
+    parser.add_argument("--fake-error-rate", type=float, default=0.0)
+    parser.add_argument("--fake-token-delay-ms", type=float, default=5.0)
+    parser.add_argument("--output", help="결과를 저장할 JSON 파일 경로")
+    args = parser.parse_args()
+
+    # 서버(같은 프로세스 또는 uvicorn 자식 프로세스)가 가짜 백엔드를 사용하도록 환경 변수를 설정합니다.
+    env_overrides = {
+        "MODEL_BACKEND": "fake",
+        "FAKE_LATENCY_MS": str(args.fake_latency_ms),
+        "FAKE_LATENCY_DISTRIBUTION": args.fake_latency_distribution,
+        "FAKE_ERROR_RATE": str(args.fake_error_rate),
+        "FAKE_TOKEN_DELAY_MS": str(args.fake_token_delay_ms),
+        "MAX_CONCURRENT_REQUESTS": os.getenv("MAX_CONCURRENT_REQUESTS", str(max(args.concurrency))),
+        # 로깅 파이프라인은 그대로 거치되, 출력이 측정 결과를 덮지 않도록 버립니다.
+        "LOG_FILE": os.getenv("LOG_FILE", os.devnull),
+    }
+    os.environ.update(env_overrides)
+
+    results = []
+    if args.mode in ("inprocess", "both"):
+        results += asyncio.run(bench_inprocess(args))
+    if args.mode in ("uvicorn", "both"):
+        results += asyncio.run(bench_uvicorn(args, dict(os.environ)))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "endpoint": args.endpoint,
+            "config": env_overrides,
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"결과를 '{args.output}'에 저장했습니다.", file=sys.stderr)
+    else:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
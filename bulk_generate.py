@@ -0,0 +1,287 @@
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+# 서버(api_server.py)와 같은 카테고리 선택, 프롬프트 압축, few-shot 예시, 모델 백엔드, 레이트 리밋을 사용합니다.
+from category_classifier import create_category_classifier_from_env
+from few_shot import create_few_shot_index_from_env
+from model_backend import create_backend_from_env
+from prompt_compaction import create_prompt_compactor_from_env
+from prompts import format_review_prompt
+from response_cache import create_response_cache_from_env
+from upstream_scheduler import PRIORITY_BATCH, create_scheduler_from_env
+
+project_root = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(project_root, 'data', 'scripts'))
+from columnar import CSV_ENCODING, CsvRowWriter, iter_processed, read_columns, to_text_columns  # noqa: E402
+
+default_input_path = os.path.join(project_root, 'data', 'processed_data', 'google_play_reviews_integrated.parquet')
+default_output_path = os.path.join(project_root, 'data', 'processed_data', 'bulk_replies.csv')
+
+KEY_COLUMN = 'Review Link'
+RATING_COLUMN = 'Star Rating'
+REVIEW_COLUMN = 'Review Text'
+REPLY_COLUMN = 'Developer Reply Text'
+# 프롬프트에 넣지 않는 열입니다. (학습 데이터와 같은 형식을 위해 build_training_jsonl.py와 같은 열을 제외)
+EXCLUDED_COLUMNS = [KEY_COLUMN, 'Review Title', REPLY_COLUMN]
+# 검토용 출력 파일의 열입니다. 상담원이 Excel에서 확인한 뒤 Play Console에 답변을 등록합니다.
+OUTPUT_COLUMNS = [KEY_COLUMN, RATING_COLUMN, REVIEW_COLUMN, 'category', 'category_source', 'reply',
+                  'prompt_tokens_before', 'prompt_tokens_after']
+ERROR_COLUMNS = [KEY_COLUMN, 'error']
+DEFAULT_CONCURRENCY = 32
+DEFAULT_CHECKPOINT_EVERY = 100
+DEFAULT_TIMEOUT_SECONDS = 60.0
+DEFAULT_CHUNKSIZE = 50_000
+
+
+def state_output_path(output_path):
+    stem, _ = os.path.splitext(output_path)
+    return f"{stem}.state.json"
+
+
+def errors_output_path(output_path):
+    stem, _ = os.path.splitext(output_path)
+    return f"{stem}_errors.csv"
+
+
+def load_state(state_path):
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state_path, state):
+    # 중간에 중단되어도 상태 파일이 깨지지 않도록 임시 파일에 쓴 뒤 교체합니다.
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, state_path)
+
+
+def read_done_keys(output_path):
+    """이전 실행에서 답변을 만든 리뷰의 Review Link 목록입니다. (출력 파일 자체가 진행 기록)"""
+    if not os.path.exists(output_path):
+        return set()
+    done = pd.read_csv(output_path, encoding=CSV_ENCODING, usecols=[KEY_COLUMN], dtype=str, keep_default_na=False)
+    return set(done[KEY_COLUMN])
+
+
+def iter_unanswered_reviews(input_path, done_keys, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    통합 리뷰에서 리뷰 텍스트는 있고 개발자 답변이 없는 행을 (키, 별점, 리뷰, 프롬프트)로 읽습니다.
+    이미 답변을 만든 키(done_keys)는 건너뜁니다. 파일 전체를 메모리에 올리지 않고 청크 단위로 읽습니다.
+    """
+    columns = read_columns(input_path) if input_path.endswith('.parquet') else None
+    if columns is not None:
+        columns = [column for column in columns if column != 'Review Title']
+    for chunk in iter_processed(input_path, columns, chunksize):
+        # 별점/날짜 열은 학습 데이터와 같은 문자열 형식으로 되돌려 프롬프트에 넣습니다.
+        chunk = to_text_columns(chunk)
+        chunk = chunk[(chunk[REVIEW_COLUMN].str.strip() != '') & (chunk[REPLY_COLUMN].str.strip() == '')]
+        context_columns = [column for column in chunk.columns if column not in EXCLUDED_COLUMNS + [REVIEW_COLUMN]]
+        for row in chunk.to_dict('records'):
+            # 링크가 없는 행은 리뷰 내용의 해시를 키로 사용하여 재개할 때 다시 생성하지 않습니다.
+            key = row.get(KEY_COLUMN) or 'sha1:' + hashlib.sha1(row[REVIEW_COLUMN].encode('utf-8')).hexdigest()[:16]
+            if key in done_keys:
+                continue
+            prompt = format_review_prompt({column: row[column] for column in context_columns}, row[REVIEW_COLUMN])
+            yield key, row.get(RATING_COLUMN, ''), row[REVIEW_COLUMN], prompt
+
+
+class BulkGenerator:
+    """
+    리뷰 프롬프트 하나에 대해 api_server의 /generate-response와 같은 순서로 답변을 만듭니다.
+    카테고리 선택(분류기) -> 프롬프트 압축 -> 응답 캐시 -> few-shot 예시 -> 레이트 리밋을 거친 모델 호출.
+    같은 (카테고리, 프롬프트)가 동시에 여러 번 나오면 모델은 한 번만 호출합니다.
+    """
+
+    def __init__(self, use_cache=True, rate_limit_rpm=None):
+        self.backend = create_backend_from_env()
+        self.scheduler = create_scheduler_from_env(self.backend.is_retryable, rate_limit_rpm)
+        self.classifier = create_category_classifier_from_env()
+        self.compactor = create_prompt_compactor_from_env()
+        self.few_shot_index = create_few_shot_index_from_env()
+        self.response_cache = create_response_cache_from_env() if use_cache else None
+        self.model_calls = 0
+        self._in_flight = {}
+
+    async def _call_model(self, category, prompt):
+        model_prompt = self.few_shot_index.augment(prompt)
+
+        async def attempt():
+            return await self.backend.generate(category, model_prompt)
+
+        self.model_calls += 1
+        return (await self.scheduler.run(attempt, PRIORITY_BATCH)).text
+
+    async def generate(self, prompt):
+        """(카테고리, 결정 방식, 압축한 프롬프트 정보, 답변)을 반환합니다."""
+        category, category_source = self.classifier.choose(None, prompt)
+        compacted = self.compactor.compact(category, prompt)
+        if self.response_cache is None:
+            return category, category_source, compacted, await self._call_model(category, compacted.prompt)
+
+        reply = await self.response_cache.get_async(category, compacted.prompt)
+        if reply is not None:
+            return category, category_source, compacted, reply
+        key = self.response_cache.key_for(category, compacted.prompt)
+        task = self._in_flight.get(key)
+        if task is None:
+            task = self._in_flight[key] = asyncio.ensure_future(self._call_model(category, compacted.prompt))
+        try:
+            reply = await asyncio.shield(task)
+        finally:
+            if task.done():
+                self._in_flight.pop(key, None)
+        await self.response_cache.set_async(category, compacted.prompt, reply)
+        return category, category_source, compacted, reply
+
+
+async def run_bulk(input_path, output_path, concurrency=DEFAULT_CONCURRENCY, checkpoint_every=DEFAULT_CHECKPOINT_EVERY,
+                   timeout_seconds=DEFAULT_TIMEOUT_SECONDS, limit=None, restart=False, use_cache=True,
+                   rate_limit_rpm=None, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    답변이 없는 리뷰의 답변을 concurrency개씩 동시에 생성하여 output_path(CSV)에 끝나는 순서대로 이어 씁니다.
+
+    checkpoint_every건마다 출력을 디스크에 반영하고 그 크기를 상태 파일(<output>.state.json)에 기록합니다.
+    중간에 중단되면 다음 실행에서 마지막 체크포인트 크기로 출력을 잘라낸 뒤, 출력에 있는 리뷰를 건너뛰고 이어서 처리합니다.
+    생성에 실패한 리뷰는 <output>_errors.csv에 기록하며, 출력에 없으므로 다음 실행에서 다시 시도합니다.
+    restart이면 상태 파일과 기존 출력을 무시하고 처음부터 다시 만듭니다.
+    """
+    state_path = state_output_path(output_path)
+    state = None if restart else load_state(state_path)
+    if state is not None and state.get('input') != os.path.abspath(input_path):
+        print(f"Previous run used {state.get('input')}; starting over with {input_path}.")
+        state = None
+
+    writer = CsvRowWriter(output_path, OUTPUT_COLUMNS, committed_size=state['committed']['size'] if state else None)
+    if state is None:
+        state = {'input': os.path.abspath(input_path), 'committed': writer.commit(), 'generated': 0}
+        save_state(state_path, state)
+    else:
+        print(f"Resuming from checkpoint in {state_path}")
+    done_keys = read_done_keys(output_path)
+    errors_writer = CsvRowWriter(errors_output_path(output_path), ERROR_COLUMNS)
+
+    generator = BulkGenerator(use_cache=use_cache, rate_limit_rpm=rate_limit_rpm)
+    queue = asyncio.Queue(maxsize=concurrency * 4)
+    stats = {'skipped': len(done_keys), 'generated': 0, 'failed': 0}
+    started = time.perf_counter()
+
+    generated_before = state['generated']
+
+    def checkpoint():
+        state['committed'] = writer.commit()
+        state['generated'] = generated_before + stats['generated']
+        errors_writer.commit()
+        save_state(state_path, state)
+        elapsed = time.perf_counter() - started
+        print(f"  - {stats['generated']} generated, {stats['failed']} failed "
+              f"({stats['generated'] / elapsed:.1f} reviews/s)")
+
+    async def produce():
+        count = 0
+        for review in iter_unanswered_reviews(input_path, done_keys, chunksize):
+            if limit is not None and count >= limit:
+                break
+            await queue.put(review)
+            count += 1
+        for _ in range(concurrency):
+            await queue.put(None)
+
+    async def work():
+        while (review := await queue.get()) is not None:
+            key, rating, review_text, prompt = review
+            try:
+                category, category_source, compacted, reply = await asyncio.wait_for(
+                    generator.generate(prompt), timeout=timeout_seconds)
+            except Exception as e:
+                stats['failed'] += 1
+                errors_writer.write([{KEY_COLUMN: key, 'error': f"{type(e).__name__}: {e}"}])
+                continue
+            writer.write([{
+                KEY_COLUMN: key, RATING_COLUMN: rating, REVIEW_COLUMN: review_text,
+                'category': category or '', 'category_source': category_source, 'reply': reply,
+                'prompt_tokens_before': compacted.tokens_before, 'prompt_tokens_after': compacted.tokens_after,
+            }])
+            stats['generated'] += 1
+            if stats['generated'] % checkpoint_every == 0:
+                checkpoint()
+
+    try:
+        await asyncio.gather(produce(), *(work() for _ in range(concurrency)))
+    finally:
+        # 중단(Ctrl+C)되어도 이미 쓴 행은 모두 완성된 행이므로 체크포인트에 포함합니다.
+        checkpoint()
+        writer.close()
+        errors_writer.close()
+        if generator.response_cache is not None:
+            generator.response_cache.close()
+
+    stats['elapsed_seconds'] = time.perf_counter() - started
+    stats['model_calls'] = generator.model_calls
+    stats['prompt_compaction'] = generator.compactor.stats()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate replies for unanswered Google Play reviews in bulk.")
+    parser.add_argument('--input', default=default_input_path,
+                        help="Integrated reviews (.parquet, or a .csv from older runs).")
+    parser.add_argument('--output', default=default_output_path,
+                        help="CSV file for review (progress is saved next to it as <output>.state.json).")
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help="Reviews generated at once.")
+    parser.add_argument('--rpm', type=float, default=None,
+                        help="Upstream requests per minute (default: UPSTREAM_RATE_LIMIT_RPM, 0 = unlimited).")
+    parser.add_argument('--checkpoint-every', type=int, default=DEFAULT_CHECKPOINT_EVERY,
+                        help="Save progress after this many generated replies.")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT_SECONDS,
+                        help="Seconds allowed per review, including rate-limit waits and retries.")
+    parser.add_argument('--limit', type=int, default=None, help="Generate at most this many replies in this run.")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Generate every review separately even if the same prompt was already answered.")
+    parser.add_argument('--restart', action='store_true', help="Ignore previous progress and start over.")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Rows read per chunk.")
+    args = parser.parse_args()
+
+    if args.concurrency < 1 or args.checkpoint_every < 1:
+        parser.error("--concurrency and --checkpoint-every must be at least 1.")
+    legacy_input = args.input[:-len('.parquet')] + '.csv' if args.input.endswith('.parquet') else None
+    if not os.path.exists(args.input) and not (legacy_input and os.path.exists(legacy_input)):
+        print(f"Input file not found: {args.input}")
+        return
+
+    try:
+        stats = asyncio.run(run_bulk(
+            args.input, args.output, concurrency=args.concurrency, checkpoint_every=args.checkpoint_every,
+            timeout_seconds=args.timeout, limit=args.limit, restart=args.restart, use_cache=not args.no_cache,
+            rate_limit_rpm=args.rpm, chunksize=args.chunksize,
+        ))
+    except ValueError as e:
+        # 예: GOOGLE_API_KEY가 설정되지 않음
+        print(f"Error: {e}")
+        return
+    except KeyboardInterrupt:
+        print("\nInterrupted. Progress was saved; run the same command again to resume.")
+        return
+
+    compaction = stats['prompt_compaction']
+    print(f"""
+Generated {stats['generated']} replies in {stats['elapsed_seconds']:.1f}s \
+({stats['generated'] / max(stats['elapsed_seconds'], 1e-9):.1f} reviews/s, {stats['model_calls']} model calls).
+Already done before this run: {stats['skipped']}
+Failed: {stats['failed']} (see {errors_output_path(args.output)}; rerun to retry them)
+Estimated prompt tokens: {compaction['tokens_before']} -> {compaction['tokens_after']}
+Output file saved to: {args.output}
+""")
+
+
+if __name__ == '__main__':
+    main()
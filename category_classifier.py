@@ -0,0 +1,205 @@
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+from few_shot import hash_buckets, ngram_hashes, review_text_from_prompt
+from prompts import SYSTEM_PROMPTS, resolve_category
+
+# --- 특징 설정 ---
+# 리뷰 텍스트의 글자 1~3-gram을 해시 칸(FEATURE_DIM개)으로 모은 TF-IDF 벡터에 별점 one-hot(STAR_SLOTS칸)을 이어 붙입니다.
+# 띄어쓰기나 맞춤법이 제각각인 짧은 리뷰에서도 "환불", "로그인", "렉" 같은 단서가 글자 n-gram으로 잡힙니다.
+FEATURE_DIM = 2 ** 14
+CLASSIFIER_NGRAM_SIZES = (1, 2, 3)
+# 0은 별점 없음, 1~5는 별점입니다.
+STAR_SLOTS = 6
+
+# 모델 파일 형식이 바뀌면 올립니다. 형식이 다른 모델은 불러오지 않습니다.
+MODEL_FORMAT_VERSION = 1
+
+_STAR_RATING_RE = re.compile(r"^Star Rating:[ \t]*(\d)", re.MULTILINE)
+
+
+def parse_star_rating(prompt: str) -> int:
+    """프롬프트의 "Star Rating:" 줄에서 별점(1~5)을 읽습니다. 없거나 범위를 벗어나면 0을 반환합니다."""
+    match = _STAR_RATING_RE.search(prompt)
+    star = int(match.group(1)) if match else 0
+    return star if 1 <= star <= 5 else 0
+
+
+def text_counts(text: str, dim: int = FEATURE_DIM) -> tuple[np.ndarray, np.ndarray]:
+    """텍스트의 n-gram 해시 칸 번호(오름차순, 중복 없음)와 칸별 등장 횟수를 반환합니다."""
+    buckets = hash_buckets(ngram_hashes(text, CLASSIFIER_NGRAM_SIZES), dim)
+    return np.unique(buckets, return_counts=True)
+
+
+def example_features(text: str, star: int, idf: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    (특징 번호, 값) 희소 벡터를 만듭니다.
+    텍스트 부분은 (1 + log tf) * idf를 L2 정규화한 값이고, 별점 칸(dim + star)은 1입니다.
+    """
+    dim = len(idf)
+    buckets, counts = text_counts(text, dim)
+    values = (1.0 + np.log(counts)) * idf[buckets]
+    norm = np.linalg.norm(values)
+    if norm:
+        values = values / norm
+    indices = np.append(buckets, dim + star)
+    return indices, np.append(values, 1.0)
+
+
+def save_model(path: str, weights: np.ndarray, bias: np.ndarray, idf: np.ndarray, classes: list[str], meta: dict):
+    """모델 배열을 .npz 한 파일로 저장합니다. 서버가 읽는 중에도 깨지지 않도록 임시 파일에 쓴 뒤 교체합니다."""
+    meta = {**meta, "format_version": MODEL_FORMAT_VERSION, "ngram_sizes": list(CLASSIFIER_NGRAM_SIZES)}
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(
+            f,
+            weights=weights.astype(np.float32),
+            bias=bias.astype(np.float32),
+            idf=idf.astype(np.float32),
+            classes=np.array(classes),
+            meta=np.array(json.dumps(meta, ensure_ascii=False)),
+        )
+    os.replace(tmp_path, path)
+
+
+class CategoryModel:
+    """학습된 다중 클래스 로지스틱 회귀 모델입니다. weights는 (특징 수, 클래스 수) 배열입니다."""
+
+    def __init__(self, path: str):
+        with np.load(path, allow_pickle=False) as data:
+            self.meta = json.loads(str(data["meta"]))
+            if self.meta.get("format_version") != MODEL_FORMAT_VERSION \
+                    or self.meta.get("ngram_sizes") != list(CLASSIFIER_NGRAM_SIZES):
+                raise ValueError(f"지원하지 않는 모델 형식입니다: {path}")
+            self.weights = data["weights"]
+            self.bias = data["bias"]
+            self.idf = data["idf"]
+            self.classes = [str(name) for name in data["classes"]]
+        if self.weights.shape != (len(self.idf) + STAR_SLOTS, len(self.classes)):
+            raise ValueError(f"모델 배열의 크기가 맞지 않습니다: {path}")
+
+    def probabilities(self, text: str, star: int) -> np.ndarray:
+        """클래스별 확률(softmax)을 반환합니다. 값이 있는 특징의 가중치 행만 읽습니다."""
+        indices, values = example_features(text, star, self.idf)
+        logits = values @ self.weights[indices] + self.bias
+        logits = np.exp(logits - logits.max())
+        return logits / logits.sum()
+
+
+class CategoryClassifier:
+    """
+    요청에 카테고리가 없을 때 리뷰 텍스트와 별점으로 SYSTEM_PROMPTS 카테고리를 고르는 로컬 분류기입니다.
+    모델은 data/scripts/train_category_classifier.py로 미리 학습하며, 새로 학습하면 reload_seconds 안에 자동으로 다시 불러옵니다.
+    """
+
+    def __init__(self, model_path: str | None, min_confidence: float = 0.5, reload_seconds: float = 60.0):
+        self.model_path = model_path
+        self.min_confidence = min_confidence
+        self.reload_seconds = reload_seconds
+        self.predictions = 0
+        self.selected = 0
+        self._model = None
+        self._model_mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        if model_path:
+            self.reload()
+
+    @property
+    def enabled(self) -> bool:
+        return self._model is not None
+
+    def reload(self) -> bool:
+        """모델 파일이 바뀌었으면 다시 불러옵니다. 불러왔으면 True를 반환합니다."""
+        try:
+            mtime = os.stat(self.model_path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._model_mtime:
+            return False
+        try:
+            model = CategoryModel(self.model_path)
+        except (OSError, ValueError, KeyError):
+            # 파일이 깨졌거나 형식이 다르면 이전 모델을 계속 사용합니다.
+            return False
+        with self._lock:
+            self._model, self._model_mtime = model, mtime
+        return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if self.model_path and self.reload_seconds > 0 and now - self._checked_at >= self.reload_seconds:
+            self._checked_at = now
+            self.reload()
+
+    def classify(self, prompt: str, top_n: int = 3) -> dict | None:
+        """
+        프롬프트를 분류하여 {"category", "confidence", "scores"}를 반환합니다. 모델이 없으면 None을 반환합니다.
+        category는 가장 확률이 높은 카테고리가 SYSTEM_PROMPTS에 있고 min_confidence 이상일 때만 채워지며, 아니면 None입니다.
+        scores는 확률이 높은 top_n개 카테고리의 확률입니다.
+        """
+        self._maybe_reload()
+        model = self._model
+        if model is None:
+            return None
+        probabilities = model.probabilities(review_text_from_prompt(prompt), parse_star_rating(prompt))
+        order = np.argsort(-probabilities, kind="stable")[:top_n]
+        best = model.classes[order[0]]
+        confidence = float(probabilities[order[0]])
+        self.predictions += 1
+        category = best if best in SYSTEM_PROMPTS and confidence >= self.min_confidence else None
+        if category:
+            self.selected += 1
+        return {
+            "category": category,
+            "confidence": round(confidence, 4),
+            "scores": {model.classes[i]: round(float(probabilities[i]), 4) for i in order},
+        }
+
+    def predict(self, prompt: str) -> str | None:
+        """프롬프트에 맞는 SYSTEM_PROMPTS 카테고리를 반환합니다. 모델이 없거나 확신이 낮으면 None(기본 프롬프트)입니다."""
+        result = self.classify(prompt, top_n=1)
+        return result["category"] if result else None
+
+    def choose(self, requested: str | None, prompt: str) -> tuple[str | None, str]:
+        """
+        시스템 프롬프트에 사용할 카테고리와 결정 방식을 반환합니다.
+        요청의 카테고리가 SYSTEM_PROMPTS에 있으면 그대로("request"), 없으면 분류 결과("classifier"),
+        모델이 없거나 확신이 낮으면 None("default", 기본 프롬프트)입니다.
+        """
+        category = resolve_category(requested)
+        if category is not None:
+            return category, "request"
+        category = self.predict(prompt)
+        return category, "classifier" if category else "default"
+
+    def stats(self) -> dict:
+        model = self._model
+        return {
+            "enabled": self.enabled,
+            "model_path": self.model_path,
+            "trained_at": model.meta.get("trained_at") if model else None,
+            "classes": model.classes if model else [],
+            "min_confidence": self.min_confidence,
+            "predictions": self.predictions,
+            "selected": self.selected,
+        }
+
+
+def create_category_classifier_from_env() -> CategoryClassifier:
+    """
+    환경 변수 설정으로 카테고리 분류기를 엽니다. CATEGORY_CLASSIFIER_PATH를 빈 값으로 두면 끕니다.
+    모델 파일이 아직 없으면 분류 없이(기본 프롬프트) 동작하다가, 모델이 만들어지면 자동으로 불러옵니다.
+    """
+    default_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "processed_data",
+                                "category_classifier.npz")
+    return CategoryClassifier(
+        model_path=os.getenv("CATEGORY_CLASSIFIER_PATH", default_path) or None,
+        min_confidence=float(os.getenv("CATEGORY_CLASSIFIER_MIN_CONFIDENCE", "0.5")),
+        reload_seconds=float(os.getenv("CATEGORY_CLASSIFIER_RELOAD_SECONDS", "60")),
+    )
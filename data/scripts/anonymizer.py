@@ -0,0 +1,57 @@
+import re
+
+# 개인정보(PII) 종류별 패턴입니다. 모두 하나의 정규식으로 합쳐 텍스트를 한 번만 훑습니다.
+# 앞에 있는 패턴이 우선합니다. (URL 안의 이메일, 주문 번호 안의 숫자가 다른 패턴으로 잘리지 않도록)
+PII_PATTERNS = (
+    # URL: 공백이나 따옴표/꺾쇠가 나올 때까지. (문자 범위 하나로 처리하여 긴 본문에서도 되돌아가지 않음)
+    ('url', r'https?://[^\s<>"\']+'),
+    # 이메일: 한글 등 유니코드 주소(홍길동@회사.com)와 점 없는 호스트(user@localhost)도 포함합니다. 끝의 마침표는 남깁니다.
+    # 아이디는 영문/숫자만이거나 유니코드 글자만인 경우로 나눕니다. ("메일은user@..."에서 "메일은"까지 가리지 않도록)
+    # 유니코드 아이디는 단어 첫 글자부터만 찾습니다. (한글 단어의 글자마다 다시 훑지 않도록)
+    ('email_address', r'(?:[A-Za-z0-9_.%+-]++|(?<!\w)[^\W\x00-\x7f]++)@[\w-]+(?:\.[\w-]+)*'),
+    # Google Play 주문 번호 (예: GPA.1234-5678-9012-34567, 정기 결제 갱신은 뒤에 ..0 등이 붙음)
+    ('order_id', r'GPA\.\d{4}-\d{4}-\d{4}-\d{5}(?:\.\.\d+)?'),
+    # 한국 전화번호: 휴대전화(010 등, +82 포함)와 지역 번호(02, 031 등)
+    ('phone_number', r'(?:\+82[-. ]?|0)(?:1[016789]|2|[3-6][1-5])[-. ]?\d{3,4}[-. ]?\d{4}(?!\d)'),
+    # 플레이어/계정 ID: "UID: 12345678", "회원번호 ABC123456"처럼 이름표가 붙은 값만 비식별화하고 이름표는 남깁니다.
+    ('uid', r'(?P<uid_label>(?:[Uu][Ii][Dd]|[Uu]ser\s*[Ii][Dd]|[Pp]layer\s*[Ii][Dd]|[Aa]ccount\s*[Ii][Dd]'
+            r'|유저\s*(?:[Ii][Dd]|아이디)|회원\s*번호|계정\s*(?:[Ii][Dd]|아이디))'
+            r'\s*(?:[:：#=]|은|는)?\s*)[A-Za-z0-9][A-Za-z0-9-]{5,}'),
+)
+
+# 위 패턴이 시작할 수 있는 위치입니다. 공백, 문장 부호, 한글 단어 중간(UID 이름표 첫 글자 제외)은 이 검사에서 바로 건너뜁니다.
+PII_FIRST_CHARS = r'[A-Za-z0-9_.%+\-유회계]|(?<!\w)[^\W\x00-\x7f]'
+# 영문/숫자 토큰의 중간에서는 매칭을 시도하지 않습니다. (긴 토큰에서 위치마다 다시 훑어 느려지는 것을 막음)
+# 한글 리뷰에서는 "연락처는010-1234-5678"처럼 개인정보가 한글에 바로 붙어 오므로 영문/숫자만 검사합니다.
+# URL은 "사이트https://..."나 "..https://"처럼 어디에 붙어 있어도 비식별화합니다.
+PII_TOKEN_CHARS = r'[A-Za-z0-9_.%+-]'
+
+# 비식별화한 자리에 넣는 표시입니다. (기존 [email_address], [url] 표시와 같은 형식)
+PII_TOKENS = {name: f'[{name}]' for name, _ in PII_PATTERNS}
+
+PII_PATTERN = re.compile(
+    f'(?={PII_FIRST_CHARS})(?:(?P<url>{dict(PII_PATTERNS)["url"]})|(?<!{PII_TOKEN_CHARS})(?:'
+    + '|'.join(f'(?P<{name}>{pattern})' for name, pattern in PII_PATTERNS if name != 'url')
+    + '))'
+)
+
+
+def _replace(match):
+    name = match.lastgroup
+    if name == 'uid':
+        return match.group('uid_label') + PII_TOKENS['uid']
+    return PII_TOKENS[name]
+
+
+def anonymize_text(text):
+    """
+    주어진 텍스트에서 URL, 이메일 주소, 주문 번호, 전화번호, 플레이어/계정 ID를 비식별화합니다.
+    """
+    if not isinstance(text, str):
+        return ""
+    return PII_PATTERN.sub(_replace, text)
+
+
+def find_pii(text):
+    """텍스트에서 찾은 개인정보를 (종류, 원문) 목록으로 반환합니다. 패턴 점검용입니다."""
+    return [(match.lastgroup, match.group()) for match in PII_PATTERN.finditer(text or "")]
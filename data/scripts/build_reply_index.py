@@ -0,0 +1,197 @@
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import numpy as np
+
+from anonymizer import anonymize_text
+from columnar import iter_processed, to_text_columns
+
+# 이 스크립트 파일의 위치를 기준으로 프로젝트 루트 디렉터리를 찾습니다.
+# (data/scripts/ -> project_root)
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+# 서버(api_server.py)와 같은 임베딩/색인 형식을 사용합니다.
+from few_shot import (  # noqa: E402
+    EMBEDDING_DIM, INDEX_FORMAT_VERSION, INDEX_META_FILENAME, NGRAM_SIZES,
+    IndexData, embed_text, index_files, read_index_meta,
+)
+
+default_input_path = os.path.join(project_root, 'data', 'processed_data', 'google_play_reviews_integrated.parquet')
+default_index_dir = os.path.join(project_root, 'data', 'processed_data', 'reply_index')
+
+KEY_COLUMN = 'Review Link'
+RATING_COLUMN = 'Star Rating'
+REVIEW_COLUMN = 'Review Text'
+REPLY_COLUMN = 'Developer Reply Text'
+SOURCE_COLUMNS = [KEY_COLUMN, RATING_COLUMN, REVIEW_COLUMN, REPLY_COLUMN]
+DEFAULT_CHUNKSIZE = 50_000
+# 검색용 차원 단위 배치를 만들 때 한 번에 옮기는 예시 수입니다.
+TRANSPOSE_BLOCK_ROWS = 65_536
+
+
+def content_hash(review, reply):
+    """원본 리뷰/답변의 해시입니다. 이전 색인과 같으면 비식별화와 임베딩을 건너뛰고 기존 결과를 재사용합니다."""
+    return hashlib.sha1(f"{review}\x00{reply}".encode('utf-8')).hexdigest()[:16]
+
+
+def iter_reply_pairs(input_path, chunksize=DEFAULT_CHUNKSIZE):
+    """통합 리뷰에서 리뷰와 답변이 모두 있는 행만 (키, 별점, 리뷰, 답변)으로 읽습니다. 필요한 4개 열만 읽습니다."""
+    for chunk in iter_processed(input_path, SOURCE_COLUMNS, chunksize):
+        chunk = to_text_columns(chunk)
+        chunk = chunk[(chunk[REVIEW_COLUMN].str.strip() != '') & (chunk[REPLY_COLUMN].str.strip() != '')]
+        yield from zip(chunk[KEY_COLUMN], chunk[RATING_COLUMN], chunk[REVIEW_COLUMN], chunk[REPLY_COLUMN])
+
+
+def load_previous_index(index_dir, dim):
+    """
+    이전 빌드를 열고 {키: (행 번호, 해시)}를 만듭니다.
+    색인이 없거나 임베딩 설정이 다르면 (None, {})를 반환하여 모든 행을 새로 임베딩합니다.
+    """
+    meta = read_index_meta(index_dir)
+    if meta is None or not meta['count'] or meta['dim'] != dim or meta['ngram_sizes'] != list(NGRAM_SIZES):
+        return None, {}
+    try:
+        data = IndexData(index_dir, meta)
+    except (OSError, ValueError):
+        return None, {}
+    rows = {}
+    for row in range(data.count):
+        example = data.example(row)
+        rows[example['key']] = (row, example['hash'])
+    return data, rows
+
+
+def write_columns(vectors_path, columns_path, count, dim):
+    """행 단위 벡터 파일을 블록씩 읽어 차원 단위(dim x count) 파일로 옮겨 씁니다."""
+    if not count:
+        open(columns_path, 'wb').close()
+        return
+    vectors = np.memmap(vectors_path, dtype=np.float32, mode='r', shape=(count, dim))
+    columns = np.memmap(columns_path, dtype=np.float32, mode='w+', shape=(dim, count))
+    for start in range(0, count, TRANSPOSE_BLOCK_ROWS):
+        end = min(start + TRANSPOSE_BLOCK_ROWS, count)
+        columns[:, start:end] = vectors[start:end].T
+    columns.flush()
+    del vectors, columns
+
+
+def remove_old_builds(index_dir, build_id):
+    """현재 빌드가 아닌 데이터 파일을 지웁니다. 서버가 아직 열고 있어 지울 수 없는 파일은 다음 빌드에서 다시 시도합니다."""
+    current = set(index_files(index_dir, build_id).values())
+    for pattern in ('vectors-*.f32', 'columns-*.f32', 'examples-*.jsonl', 'offsets-*.npy'):
+        for path in glob.glob(os.path.join(index_dir, pattern)):
+            if path not in current:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+def build_reply_index(input_path=default_input_path, index_dir=default_index_dir, dim=EMBEDDING_DIM,
+                      full_rebuild=False, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    통합 리뷰의 리뷰/답변 쌍으로 few-shot 색인을 만듭니다.
+    이전 색인에 같은 키와 같은 내용이 있으면 그 벡터와 예시를 그대로 복사하고, 새 행이나 바뀐 행만 비식별화/임베딩합니다.
+    새 빌드의 파일을 모두 쓴 뒤 index.json을 교체하므로, 서버는 빌드 중에도 이전 색인을 그대로 사용합니다.
+    """
+    os.makedirs(index_dir, exist_ok=True)
+    previous, previous_rows = (None, {}) if full_rebuild else load_previous_index(index_dir, dim)
+
+    build_id = f"{time.strftime('%Y%m%d%H%M%S')}-{os.getpid()}"
+    files = index_files(index_dir, build_id)
+    offsets = [0]
+    seen = set()
+    reused = 0
+    embedded = 0
+    try:
+        with open(files['vectors'], 'wb') as vectors_file, open(files['examples'], 'wb') as examples_file:
+            for key, rating, review, reply in iter_reply_pairs(input_path, chunksize):
+                digest = content_hash(review, reply)
+                key = key or digest
+                # 통합 결과는 이미 Review Link 기준으로 중복이 제거되어 있으므로, 같은 키는 처음 나온 행만 사용합니다.
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                old = previous_rows.get(key)
+                if old is not None and old[1] == digest:
+                    vector = previous.vectors[old[0]]
+                    line = previous.example_line(old[0])
+                    reused += 1
+                else:
+                    # 예시는 프롬프트에 그대로 들어가므로 개인정보를 비식별화한 뒤 저장합니다.
+                    review = anonymize_text(review)
+                    vector = embed_text(review, dim)
+                    example = {'key': key, 'hash': digest, 'star_rating': rating,
+                               'review': review, 'reply': anonymize_text(reply)}
+                    line = (json.dumps(example, ensure_ascii=False) + '\n').encode('utf-8')
+                    embedded += 1
+                vectors_file.write(np.asarray(vector, dtype=np.float32).tobytes())
+                examples_file.write(line)
+                offsets.append(offsets[-1] + len(line))
+        np.save(files['offsets'], np.array(offsets, dtype=np.int64))
+        write_columns(files['vectors'], files['columns'], len(offsets) - 1, dim)
+    except BaseException:
+        for path in files.values():
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+    finally:
+        if previous is not None:
+            previous.close()
+
+    meta = {
+        'format_version': INDEX_FORMAT_VERSION,
+        'build_id': build_id,
+        'count': len(offsets) - 1,
+        'dim': dim,
+        'ngram_sizes': list(NGRAM_SIZES),
+        'source': os.path.abspath(input_path),
+        'built_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    # 중간에 중단되어도 index.json이 깨지지 않도록 임시 파일에 쓴 뒤 교체합니다.
+    meta_path = os.path.join(index_dir, INDEX_META_FILENAME)
+    with open(meta_path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+    os.replace(meta_path + '.tmp', meta_path)
+    remove_old_builds(index_dir, build_id)
+
+    return {
+        'examples': meta['count'],
+        'reused': reused,
+        'embedded': embedded,
+        'removed': len(set(previous_rows) - seen),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the few-shot reply index from integrated Google Play reviews.")
+    parser.add_argument('--input', default=default_input_path,
+                        help="Integrated reviews (.parquet, or a .csv from older runs).")
+    parser.add_argument('--index-dir', default=default_index_dir, help="Index directory read by the API server.")
+    parser.add_argument('--dim', type=int, default=EMBEDDING_DIM, help="Embedding dimension.")
+    parser.add_argument('--full-rebuild', action='store_true',
+                        help="Ignore the previous index and embed every pair again.")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Rows read per chunk.")
+    args = parser.parse_args()
+
+    legacy_input = args.input[:-len('.parquet')] + '.csv' if args.input.endswith('.parquet') else None
+    if not os.path.exists(args.input) and not (legacy_input and os.path.exists(legacy_input)):
+        print(f"Input file not found: {args.input}")
+        return
+
+    started = time.perf_counter()
+    stats = build_reply_index(args.input, args.index_dir, dim=args.dim, full_rebuild=args.full_rebuild,
+                              chunksize=args.chunksize)
+    print(f"Indexed {stats['examples']} review/reply pairs in {time.perf_counter() - started:.1f}s "
+          f"(reused: {stats['reused']}, embedded: {stats['embedded']}, removed: {stats['removed']}).")
+    print(f"Index saved to: {args.index_dir}")
+
+
+if __name__ == '__main__':
+    main()
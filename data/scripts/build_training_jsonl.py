@@ -0,0 +1,195 @@
+import os
+import glob
+import json
+import argparse
+import pandas as pd
+
+from anonymizer import anonymize_text
+from columnar import iter_processed, read_columns, to_text_columns
+
+# 이 스크립트 파일의 위치를 기준으로 프로젝트 루트 디렉터리를 찾습니다.
+# (data/scripts/ -> project_root)
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+default_input_path = os.path.join(project_root, 'data', 'processed_data', 'google_play_reviews_integrated.parquet')
+default_output_path = os.path.join(project_root, 'data', 'processed_data', 'training_data.jsonl')
+
+REVIEW_COLUMN = 'Review Text'
+REPLY_COLUMN = 'Developer Reply Text'
+# 프롬프트 생성에 필요 없는 열입니다. ('Review Title'은 유의미한 데이터가 없음)
+EXCLUDED_COLUMNS = ['Review Link', 'Review Title']
+DEFAULT_CHUNKSIZE = 50_000
+
+
+def json_string(series):
+    """문자열 열을 JSON 문자열 리터럴(따옴표 포함)로 변환합니다."""
+    return series.map(lambda value: json.dumps(value, ensure_ascii=False))
+
+
+def build_training_lines(df):
+    """
+    리뷰 데이터프레임(청크)을 Gemini 튜닝 형식의 JSON 문자열로 변환합니다.
+    'Review Text', 'Developer Reply Text'를 제외한 열은 "열 이름: 값" 줄로 이어 붙여 user 내용의 앞부분(context)으로 사용합니다.
+    행마다 Series를 만들지 않도록 열 단위 문자열 연산으로 처리합니다.
+    """
+    df = df.drop(columns=[column for column in EXCLUDED_COLUMNS if column in df.columns])
+
+    # 'Review Text' 또는 'Developer Reply Text' 열이 비어있는 행은 학습에 사용할 수 없으므로 제거합니다.
+    df = df[(df[REVIEW_COLUMN].str.strip() != '') & (df[REPLY_COLUMN].str.strip() != '')]
+    if df.empty:
+        return pd.Series(dtype=object)
+
+    # 리뷰와 답변에 포함된 이메일, 전화번호, 주문 번호 등 개인정보를 비식별화합니다.
+    review = df[REVIEW_COLUMN].map(anonymize_text)
+    reply = df[REPLY_COLUMN].map(anonymize_text)
+
+    context_columns = [column for column in df.columns if column not in (REVIEW_COLUMN, REPLY_COLUMN)]
+    user_content = pd.Series('', index=df.index)
+    for column in context_columns:
+        user_content = user_content + f"{column}: " + df[column] + '\n'
+    # 컨텍스트와 실제 리뷰 텍스트를 합쳐서 user의 content로 만듭니다.
+    user_content = user_content.str[:-1] + f"\n\n{REVIEW_COLUMN}: " + review
+
+    # json.dumps({"contents": [...]}, ensure_ascii=False)와 같은 형식입니다.
+    return ('{"contents": [{"role": "user", "parts": [{"text": ' + json_string(user_content)
+            + '}]}, {"role": "model", "parts": [{"text": ' + json_string(reply) + '}]}]}')
+
+
+def validation_mask(lines, validation_fraction, seed):
+    """
+    내용의 해시값으로 검증 세트에 넣을 행을 고릅니다.
+    같은 행은 청크 크기나 실행 순서와 관계없이 항상 같은 세트에 들어갑니다.
+    """
+    if validation_fraction <= 0:
+        return pd.Series(False, index=lines.index)
+    hashes = pd.util.hash_pandas_object(lines, index=False, hash_key=f"{seed:016d}"[-16:])
+    return (hashes % 1_000_000) < int(validation_fraction * 1_000_000)
+
+
+class JsonlShardWriter:
+    """
+    JSON 문자열을 줄 단위로 씁니다.
+    max_bytes가 0보다 크면 파일 크기가 max_bytes를 넘지 않도록 name-00000.jsonl, name-00001.jsonl ... 로 나눠 씁니다.
+    """
+
+    def __init__(self, output_path, max_bytes=0):
+        self.output_path = output_path
+        self.max_bytes = max_bytes
+        self.paths = []
+        self.lines = 0
+        self._file = None
+        self._size = 0
+        if max_bytes > 0:
+            # 이전 실행에서 더 많은 조각 파일을 만들었다면 남지 않도록 지웁니다.
+            stem, ext = os.path.splitext(output_path)
+            for path in glob.glob(f"{glob.escape(stem)}-[0-9][0-9][0-9][0-9][0-9]{ext}"):
+                os.remove(path)
+
+    def _open_next(self):
+        if self._file is not None:
+            self._file.close()
+        if self.max_bytes > 0:
+            stem, ext = os.path.splitext(self.output_path)
+            path = f"{stem}-{len(self.paths):05d}{ext}"
+        else:
+            path = self.output_path
+        self._file = open(path, 'wb')
+        self._size = 0
+        self.paths.append(path)
+
+    def write(self, lines):
+        if self._file is None:
+            self._open_next()
+        if self.max_bytes <= 0:
+            data = ''.join(line + '\n' for line in lines).encode('utf-8')
+            self._file.write(data)
+        else:
+            for line in lines:
+                data = (line + '\n').encode('utf-8')
+                if self._size and self._size + len(data) > self.max_bytes:
+                    self._open_next()
+                self._file.write(data)
+                self._size += len(data)
+        self.lines += len(lines)
+
+    def close(self):
+        if self._file is None:
+            # 학습 데이터가 없어도 빈 파일을 만들어 이전 실행의 결과가 남지 않도록 합니다.
+            self._open_next()
+        self._file.close()
+
+
+def validation_output_path(output_path):
+    stem, ext = os.path.splitext(output_path)
+    return f"{stem}_validation{ext}"
+
+
+def build_training_jsonl(input_path=default_input_path, output_path=default_output_path, validation_fraction=0.0,
+                         shard_size_mb=0, seed=0, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    통합 리뷰(Parquet, 없으면 CSV)를 청크 단위로 읽어 Gemini 튜닝용 JSONL 파일을 만듭니다.
+    전체 데이터를 메모리에 올리지 않고, 변환한 청크를 바로 파일에 씁니다.
+    Parquet 파일에서는 프롬프트에 쓰는 열만 읽습니다.
+    validation_fraction만큼의 행은 검증용 파일(이름_validation.jsonl)로 나눕니다.
+    """
+    max_bytes = int(shard_size_mb * 1024 * 1024)
+    train_writer = JsonlShardWriter(output_path, max_bytes)
+    validation_writer = JsonlShardWriter(validation_output_path(output_path), max_bytes) if validation_fraction > 0 else None
+    rows_read = 0
+    try:
+        columns = read_columns(input_path) if input_path.endswith('.parquet') else None
+        if columns is not None:
+            columns = [column for column in columns if column not in EXCLUDED_COLUMNS]
+        for chunk in iter_processed(input_path, columns, chunksize):
+            rows_read += len(chunk)
+            # 별점/날짜 열은 원본 CSV와 같은 문자열 형식으로 되돌려 프롬프트에 넣습니다.
+            lines = build_training_lines(to_text_columns(chunk))
+            if lines.empty:
+                continue
+            is_validation = validation_mask(lines, validation_fraction, seed)
+            train_writer.write(lines[~is_validation].tolist())
+            if validation_writer is not None:
+                validation_writer.write(lines[is_validation].tolist())
+    finally:
+        train_writer.close()
+        if validation_writer is not None:
+            validation_writer.close()
+
+    return {
+        'rows_read': rows_read,
+        'train_examples': train_writer.lines,
+        'validation_examples': validation_writer.lines if validation_writer else 0,
+        'train_files': train_writer.paths,
+        'validation_files': validation_writer.paths if validation_writer else [],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the Gemini tuning JSONL file from integrated Google Play reviews.")
+    parser.add_argument('--input', default=default_input_path, help="Integrated reviews (.parquet, or a .csv from older runs).")
+    parser.add_argument('--output', default=default_output_path, help="Training JSONL path.")
+    parser.add_argument('--validation-fraction', type=float, default=0.0,
+                        help="Fraction of examples written to <output>_validation.jsonl (0 = no split).")
+    parser.add_argument('--shard-size-mb', type=float, default=0,
+                        help="Split output into files of at most this size (0 = single file).")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the train/validation split.")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE, help="Rows read per chunk.")
+    args = parser.parse_args()
+
+    if not 0 <= args.validation_fraction < 1:
+        parser.error("--validation-fraction must be in [0, 1).")
+    legacy_input = args.input[:-len('.parquet')] + '.csv' if args.input.endswith('.parquet') else None
+    if not os.path.exists(args.input) and not (legacy_input and os.path.exists(legacy_input)):
+        print(f"Input file not found: {args.input}")
+        return
+
+    stats = build_training_jsonl(args.input, args.output, validation_fraction=args.validation_fraction,
+                                 shard_size_mb=args.shard_size_mb, seed=args.seed, chunksize=args.chunksize)
+
+    print(f"Rows read: {stats['rows_read']}")
+    print(f"Training examples: {stats['train_examples']} -> {', '.join(stats['train_files'])}")
+    if stats['validation_files']:
+        print(f"Validation examples: {stats['validation_examples']} -> {', '.join(stats['validation_files'])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# 처리 결과의 기본 형식은 Parquet입니다. CSV는 Excel 사용자를 위한 선택적인 부가 출력입니다.
+# Excel에서 한글이 깨지지 않도록 CSV는 'utf-8-sig' 인코딩으로 저장합니다.
+CSV_ENCODING = 'utf-8-sig'
+DEFAULT_BATCH_SIZE = 50_000
+
+# Google Play 리뷰 CSV에서 타입을 지정할 열입니다. 나머지 열은 문자열로 저장합니다.
+REVIEW_INTEGER_COLUMNS = (
+    'App Version Code',
+    'Star Rating',
+    'Review Submit Millis Since Epoch',
+    'Review Last Update Millis Since Epoch',
+    'Developer Reply Millis Since Epoch',
+)
+REVIEW_TIMESTAMP_COLUMNS = (
+    'Review Submit Date and Time',
+    'Review Last Update Date and Time',
+    'Developer Reply Date and Time',
+)
+# Google Play Console 내보내기 파일의 날짜 형식 (예: 2025-07-13T10:00:00Z)
+TIMESTAMP_TEXT_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+TIMESTAMP_TYPE = pa.timestamp('ms', tz='UTC')
+
+
+def review_schema(columns):
+    """리뷰 열 목록에 맞는 Arrow 스키마를 만듭니다."""
+    fields = []
+    for column in columns:
+        if column in REVIEW_INTEGER_COLUMNS:
+            fields.append((column, pa.int64()))
+        elif column in REVIEW_TIMESTAMP_COLUMNS:
+            fields.append((column, TIMESTAMP_TYPE))
+        else:
+            fields.append((column, pa.string()))
+    return pa.schema(fields)
+
+
+def string_schema(columns):
+    return pa.schema([(column, pa.string()) for column in columns])
+
+
+def to_review_types(df):
+    """문자열로 읽은 리뷰 청크의 숫자/날짜 열을 타입이 있는 열로 변환합니다. 변환할 수 없는 값은 빈 값(null)이 됩니다."""
+    df = df.copy()
+    for column in REVIEW_INTEGER_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_numeric(df[column], errors='coerce').astype('Int64')
+    for column in REVIEW_TIMESTAMP_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], errors='coerce', utc=True, format='ISO8601')
+    return df
+
+
+def to_pandas(data):
+    """Arrow 테이블/배치를 DataFrame으로 바꿉니다. 빈 값이 있는 정수 열도 실수가 아닌 정수(Int64)로 유지합니다."""
+    return data.to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+
+
+def to_text_columns(df):
+    """
+    타입이 있는 리뷰 열을 원본 CSV와 같은 문자열 형식으로 되돌립니다.
+    프롬프트를 만들 때 확장 프로그램이 보내는 형식(원본 CSV 형식)과 맞추기 위해 사용합니다.
+    """
+    df = df.copy()
+    for column in df.columns:
+        series = df[column]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            series = series.dt.strftime(TIMESTAMP_TEXT_FORMAT)
+        elif pd.api.types.is_integer_dtype(series):
+            series = series.astype('string')
+        df[column] = series.astype(object).where(series.notna(), '')
+    return df
+
+
+class ParquetAppender:
+    """DataFrame 청크를 하나의 Parquet 파일에 행 그룹으로 이어 씁니다."""
+
+    def __init__(self, path, schema):
+        self.path = path
+        self.schema = schema
+        self.rows = 0
+        self._writer = pq.ParquetWriter(path, schema)
+
+    def write(self, df):
+        if df.empty:
+            return
+        table = pa.Table.from_pandas(df[self.schema.names], schema=self.schema, preserve_index=False)
+        self._writer.write_table(table)
+        self.rows += len(df)
+
+    def write_batch(self, batch):
+        self._writer.write_batch(batch)
+        self.rows += batch.num_rows
+
+    def close(self):
+        self._writer.close()
+
+
+class CsvRowWriter:
+    """
+    행(dict 목록)을 CSV 파일 끝에 이어 쓰는 재개 가능한 출력입니다. (mbox 변환, 대량 답변 생성에서 사용)
+    committed_size를 주면 기존 파일을 그 크기로 잘라낸 뒤(마지막 체크포인트 이후에 쓴 행 제거) 이어 쓰고,
+    주지 않으면 새 파일에 머리글부터 씁니다.
+    """
+
+    def __init__(self, path, columns, committed_size=None):
+        self.path = path
+        self.columns = columns
+        if committed_size is not None and os.path.exists(path):
+            self.file = open(path, 'r+b')
+            self.file.truncate(committed_size)
+            self.file.seek(committed_size)
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(pd.DataFrame(columns=columns).to_csv(index=False).encode(CSV_ENCODING))
+
+    def write(self, rows):
+        df = pd.DataFrame(rows, columns=self.columns)
+        self.file.write(df.to_csv(header=False, index=False).encode('utf-8'))
+
+    def commit(self):
+        """지금까지 쓴 내용을 디스크에 반영하고, 재개할 때 필요한 상태({'size': 잘라낼 크기})를 반환합니다."""
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        return {'size': self.file.tell()}
+
+    def close(self):
+        self.file.close()
+
+    def write_head(self, head_path, rows=10):
+        write_head(self.path, head_path, rows)
+
+
+def hash_keys(values):
+    """문자열 키 배열을 64비트 해시(uint64) 배열로 바꿉니다. 같은 키는 실행마다 항상 같은 해시가 됩니다."""
+    return pd.util.hash_array(np.asarray(values, dtype=object), categorize=False)
+
+
+class KeyCounts:
+    """
+    키(예: Review Link)별 등장 횟수를 문자열 대신 64비트 해시로 세는 카운터입니다.
+    키 하나에 12바이트(해시 8 + 횟수 4)만 쓰므로 문자열 Counter보다 메모리를 10배 이상 적게 씁니다.
+    (해시가 우연히 겹칠 확률은 키 1천만 개에서 약 100만분의 3이라 무시합니다.)
+    """
+
+    def __init__(self):
+        self.hashes = np.empty(0, dtype=np.uint64)
+        self.counts = np.empty(0, dtype=np.int32)
+        self._pending = []
+        self._pending_size = 0
+
+    def add(self, values):
+        """빈 값을 제외한 키를 셉니다. 청크마다 중복을 먼저 줄이고, 모인 청크가 기존 크기만큼 쌓이면 합칩니다."""
+        values = np.asarray(values, dtype=object)
+        values = values[values != '']
+        if not len(values):
+            return
+        hashes, counts = np.unique(hash_keys(values), return_counts=True)
+        self._pending.append((hashes, counts))
+        self._pending_size += len(hashes)
+        if self._pending_size >= max(len(self.hashes), DEFAULT_BATCH_SIZE):
+            self._merge()
+
+    def _merge(self):
+        if not self._pending:
+            return
+        hashes = np.concatenate([self.hashes] + [hashes for hashes, _ in self._pending])
+        counts = np.concatenate([self.counts] + [counts for _, counts in self._pending])
+        self.hashes, inverse = np.unique(hashes, return_inverse=True)
+        self.counts = np.bincount(inverse, weights=counts, minlength=len(self.hashes)).astype(np.int32)
+        self._pending = []
+        self._pending_size = 0
+
+    def _find(self, values):
+        # 키마다 self.hashes에서의 위치와, 센 적이 있는 키인지 여부를 반환합니다.
+        self._merge()
+        values = np.asarray(values, dtype=object)
+        hashes = hash_keys(values)
+        positions = np.searchsorted(self.hashes, hashes)
+        found = positions < len(self.hashes)
+        found[found] = self.hashes[positions[found]] == hashes[found]
+        return np.where(found, positions, 0), found & (values != '')
+
+    def contains(self, values):
+        """키마다 센 적이 있으면 True인 배열입니다."""
+        return self._find(values)[1]
+
+    def keep_last_mask(self, values):
+        """
+        같은 키의 마지막 등장 행만 True인 배열을 반환합니다. 빈 값이나 센 적이 없는 키는 항상 True입니다.
+        센 횟수를 차감하면서 판단하므로, add에 넘긴 키를 같은 순서로 청크마다 한 번씩 넘겨야 합니다.
+        """
+        positions, found = self._find(values)
+        mask = np.ones(len(positions), dtype=bool)
+        rows = np.flatnonzero(found)
+        positions = positions[rows]
+        # 청크 안에서 같은 키가 여러 번 나오면 앞에서부터 0, 1, 2... 번째 등장으로 번호를 매깁니다.
+        order = np.argsort(positions, kind='stable')
+        sorted_positions = positions[order]
+        starts = np.flatnonzero(np.r_[True, sorted_positions[1:] != sorted_positions[:-1]])
+        group_sizes = np.diff(np.r_[starts, len(positions)])
+        occurrence = np.empty(len(positions), dtype=np.int64)
+        occurrence[order] = np.arange(len(positions)) - np.repeat(starts, group_sizes)
+        mask[rows] = self.counts[positions] - occurrence == 1
+        np.subtract.at(self.counts, positions, 1)
+        return mask
+
+    def __len__(self):
+        self._merge()
+        return len(self.hashes)
+
+
+def read_schema(path):
+    """Parquet 파일의 스키마를 읽습니다. 파일이 없거나 읽을 수 없으면 None을 반환합니다."""
+    if not os.path.exists(path):
+        return None
+    try:
+        return pq.read_schema(path)
+    except Exception:
+        return None
+
+
+def read_columns(path):
+    schema = read_schema(path)
+    return None if schema is None else list(schema.names)
+
+
+def merge_into_parquet(path, key_column, replaced_keys, write_new_rows, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    기존 Parquet 파일을 행 그룹 단위로 다시 쓰면서 key_column 값이 replaced_keys(집합 또는 KeyCounts)에 있는 행을 빼고,
+    마지막에 write_new_rows(appender)로 새 행을 이어 씁니다.
+    임시 파일에 쓴 뒤 교체하므로, 중간에 실패해도 기존 결과는 그대로 남습니다.
+    (남긴 기존 행 수, write_new_rows의 반환값)을 반환합니다.
+    """
+    source = pq.ParquetFile(path)
+    tmp_path = path + '.tmp'
+    appender = ParquetAppender(tmp_path, source.schema_arrow)
+    kept_rows = 0
+    try:
+        if isinstance(replaced_keys, KeyCounts):
+            replaced = replaced_keys if len(replaced_keys) else None
+        else:
+            replaced = pa.array(list(replaced_keys), type=pa.string()) if replaced_keys else None
+        for batch in source.iter_batches(batch_size=batch_size):
+            if isinstance(replaced, KeyCounts):
+                keys = batch.column(key_column).fill_null('').to_numpy(zero_copy_only=False)
+                batch = batch.filter(pa.array(~replaced.contains(keys)))
+            elif replaced is not None:
+                batch = batch.filter(pc.invert(pc.is_in(batch.column(key_column), value_set=replaced)))
+            appender.write_batch(batch)
+            kept_rows += batch.num_rows
+        new_rows = write_new_rows(appender)
+    except BaseException:
+        appender.close()
+        os.remove(tmp_path)
+        raise
+    appender.close()
+    os.replace(tmp_path, path)
+    return kept_rows, new_rows
+
+
+def export_csv(parquet_path, csv_path, batch_size=DEFAULT_BATCH_SIZE, text=False):
+    """
+    Parquet 파일을 행 그룹 단위로 읽어 CSV로 저장합니다. (Excel 사용자를 위한 부가 출력)
+    text이면 숫자/날짜 열을 원본 CSV와 같은 문자열 형식으로 저장합니다.
+    """
+    parquet_file = pq.ParquetFile(parquet_path)
+    with open(csv_path, 'w', encoding=CSV_ENCODING, newline='') as f:
+        pd.DataFrame(columns=parquet_file.schema_arrow.names).to_csv(f, index=False)
+        for batch in parquet_file.iter_batches(batch_size=batch_size):
+            df = to_pandas(batch)
+            if text:
+                df = to_text_columns(df)
+            df.to_csv(f, header=False, index=False)
+
+
+def write_head(path, head_path, rows=10, text=False):
+    """처리 결과(Parquet 또는 CSV)의 앞부분만 읽어 _head.csv 파일로 저장합니다."""
+    if path.endswith('.parquet'):
+        batch = next(pq.ParquetFile(path).iter_batches(batch_size=rows), None)
+        head_df = to_pandas(batch) if batch is not None else pd.DataFrame(columns=read_columns(path))
+        if text:
+            head_df = to_text_columns(head_df)
+    else:
+        head_df = pd.read_csv(path, encoding=CSV_ENCODING, dtype=str, keep_default_na=False, nrows=rows)
+    head_df.to_csv(head_path, index=False, encoding=CSV_ENCODING)
+
+
+def read_processed(path, columns=None):
+    """
+    처리 결과를 필요한 열만 읽습니다.
+    path가 .parquet이면 Parquet 파일을 읽고, 파일이 없으면 같은 이름의 .csv 파일(이전 형식)을 읽습니다.
+    """
+    if path.endswith('.parquet'):
+        if os.path.exists(path):
+            return to_pandas(pq.read_table(path, columns=columns))
+        path = path[:-len('.parquet')] + '.csv'
+    return pd.read_csv(path, encoding=CSV_ENCODING, usecols=columns)
+
+
+def iter_processed(path, columns=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    처리 결과를 batch_size 행씩 DataFrame으로 읽습니다. (큰 파일을 일정한 메모리로 처리할 때 사용)
+    read_processed와 같이 Parquet 파일이 없으면 같은 이름의 .csv 파일을 문자열로 읽습니다.
+    """
+    if path.endswith('.parquet'):
+        if os.path.exists(path):
+            for batch in pq.ParquetFile(path).iter_batches(batch_size=batch_size, columns=columns):
+                yield to_pandas(batch)
+            return
+        path = path[:-len('.parquet')] + '.csv'
+    yield from pd.read_csv(path, encoding=CSV_ENCODING, dtype=str, keep_default_na=False,
+                           usecols=columns, chunksize=batch_size)
@@ -1,7 +1,11 @@
 import os
+import argparse
 import pandas as pd
 import glob
 
+from columnar import KeyCounts, ParquetAppender, export_csv, merge_into_parquet, read_columns, review_schema, to_review_types, write_head
+from pipeline_manifest import Manifest
+
 # 이 스크립트 파일의 위치를 기준으로 프로젝트 루트 디렉터리를 찾습니다.
 # (data/scripts/ -> project_root)
 project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -9,46 +13,236 @@ project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(_
 # 입력 및 출력 디렉터리 경로를 설정합니다.
 input_dir = os.path.join(project_root, 'data', 'raw_data', 'google_play')
 output_dir = os.path.join(project_root, 'data', 'processed_data')
-output_filepath = os.path.join(output_dir, 'google_play_reviews_integrated.csv')
+# 통합 결과는 타입이 있는 Parquet 파일로 저장합니다. (--csv를 지정하면 Excel용 CSV도 함께 저장)
+output_filepath = os.path.join(output_dir, 'google_play_reviews_integrated.parquet')
+csv_output_filepath = os.path.join(output_dir, 'google_play_reviews_integrated.csv')
+head_output_filepath = os.path.join(output_dir, 'google_play_reviews_integrated_head.csv')
+# 이미 통합한 입력 파일 목록입니다. (증분 처리용)
+manifest_filepath = os.path.join(output_dir, 'google_play_reviews_integrated.manifest.json')
 
-# 출력 디렉터리가 없으면 생성합니다.
-os.makedirs(output_dir, exist_ok=True)
+# Google Play Console에서 내려받은 리뷰 CSV의 인코딩입니다.
+INPUT_ENCODING = 'utf-16'
+HEAD_ROWS = 10
+DEFAULT_CHUNKSIZE = 50_000
+# 같은 리뷰를 구분하는 열입니다. 리뷰가 수정되면 이후 월별 파일에 다시 나오므로, 마지막에 나온 행만 남깁니다.
+DEDUP_COLUMN = 'Review Link'
 
-# 입력 디렉터리에서 모든 CSV 파일 목록을 가져옵니다.
-csv_files = glob.glob(os.path.join(input_dir, '*.csv'))
 
-if not csv_files:
-    print(f"No CSV files found in {input_dir}")
-else:
-    # 각 CSV 파일을 담을 리스트를 생성합니다.
-    df_list = []
-    print("Starting to read CSV files...")
+def read_header(file_path):
+    """CSV 파일의 헤더(열 이름)만 읽습니다."""
+    return list(pd.read_csv(file_path, encoding=INPUT_ENCODING, nrows=0).columns)
+
+
+def build_schema(csv_files):
+    """
+    모든 입력 파일의 헤더를 먼저 읽어 통합 스키마(열 이름 목록)를 만듭니다.
+    처음 등장한 순서를 유지하며, 파일마다 열이 다르면 합집합을 사용합니다. (pd.concat과 같은 결과)
+    헤더를 읽을 수 없는 파일은 건너뜁니다.
+    """
+    schema = []
+    headers = {}
     for file_path in csv_files:
         filename = os.path.basename(file_path)
         try:
-            # UTF-16 인코딩으로 CSV 파일을 읽습니다.
-            df = pd.read_csv(file_path, encoding='utf-16')
-            df_list.append(df)
-            print(f"  - Successfully read: {filename}")
+            columns = read_header(file_path)
+        except Exception as e:
+            print(f"  - Failed to read header of {filename}. Error: {e}")
+            continue
+        headers[file_path] = columns
+        for column in columns:
+            if column not in schema:
+                schema.append(column)
+    return schema, headers
+
+
+def read_chunks(file_path, chunksize, usecols=None):
+    return pd.read_csv(file_path, encoding=INPUT_ENCODING, dtype=str, keep_default_na=False,
+                       chunksize=chunksize, usecols=usecols)
+
+
+def count_review_links(headers, chunksize):
+    """
+    중복 제거를 위해 Review Link 열만 읽어 링크별 등장 횟수를 셉니다.
+    링크 문자열 대신 64비트 해시로 세므로, 메모리는 고유 링크 수에 비례하지만 링크 하나에 12바이트입니다.
+    """
+    counts = KeyCounts()
+    for file_path, columns in headers.items():
+        if DEDUP_COLUMN not in columns:
+            continue
+        for chunk in read_chunks(file_path, chunksize, usecols=[DEDUP_COLUMN]):
+            counts.add(chunk[DEDUP_COLUMN])
+    return counts
+
+
+def write_files(headers, schema, appender, link_counts, manifest, chunksize):
+    """
+    각 CSV 파일을 chunksize 행씩 읽어 별점/날짜 등의 타입을 지정한 뒤 Parquet 파일(appender)에 이어 씁니다.
+    전체 데이터를 메모리에 올리지 않으므로 입력 파일 수와 크기에 관계없이 메모리 사용량이 거의 일정합니다.
+    (중복 제거를 위한 링크별 등장 횟수(link_counts)만 메모리에 두며, 쓰는 동안 횟수를 차감합니다.)
+    읽기 오류는 그대로 올려 보내 호출한 쪽에서 전체 작업을 취소합니다.
+    link_counts는 모든 파일을 끝까지 읽는다고 보고 센 값이므로, 읽다 만 파일을 건너뛰고 계속하면
+    그 파일의 새 버전 때문에 앞에서 빠진 이전 버전의 리뷰가 결과에서 사라집니다.
+    """
+    file_count = 0
+    written_rows = 0
+    for file_path, columns in headers.items():
+        filename = os.path.basename(file_path)
+        missing = [column for column in schema if column not in columns]
+        if missing:
+            print(f"  - Schema mismatch in {filename}: missing columns {missing} will be left empty.")
+        file_rows = 0
+        try:
+            for chunk in read_chunks(file_path, chunksize):
+                file_rows += len(chunk)
+                # 열 순서를 통합 스키마에 맞추고, 없는 열은 빈 값으로 채웁니다.
+                chunk = chunk.reindex(columns=schema, fill_value='')
+                if DEDUP_COLUMN in schema:
+                    chunk = chunk[link_counts.keep_last_mask(chunk[DEDUP_COLUMN])]
+                appender.write(to_review_types(chunk))
+                written_rows += len(chunk)
+        except Exception as e:
+            print(f"  - Failed to read {filename} after {file_rows} rows. Error: {e}")
+            raise
+        file_count += 1
+        manifest.update(file_path, file_rows)
+        print(f"  - Successfully read: {filename} ({file_rows} rows)")
+    return file_count, written_rows
+
+
+def integrate_full(csv_files, manifest, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    모든 입력 파일로 통합 결과를 처음부터 다시 만듭니다.
+    읽기 오류가 나면 기존 결과와 매니페스트를 그대로 두고 오류를 올려 보냅니다.
+    """
+    schema, headers = build_schema(csv_files)
+    if not schema:
+        return 0, 0
+
+    manifest.clear()
+    link_counts = count_review_links(headers, chunksize)
+    # 중간에 실패해도 기존 결과가 남도록 임시 파일에 쓴 뒤 교체합니다.
+    tmp_path = output_filepath + '.tmp'
+    appender = ParquetAppender(tmp_path, review_schema(schema))
+    try:
+        file_count, total_rows = write_files(headers, schema, appender, link_counts, manifest, chunksize)
+    except Exception:
+        appender.close()
+        os.remove(tmp_path)
+        raise
+    appender.close()
+    if not file_count:
+        os.remove(tmp_path)
+        return 0, 0
+    os.replace(tmp_path, output_filepath)
+    manifest.save()
+    return file_count, total_rows
+
+
+def integrate_incremental(csv_files, manifest, output_columns, chunksize=DEFAULT_CHUNKSIZE):
+    """
+    매니페스트와 비교하여 새 파일이나 내용이 바뀐 파일만 읽어 기존 통합 결과에 합칩니다.
+    새로 읽은 리뷰와 Review Link가 같은 기존 행은 새 행으로 대체됩니다.
+    기존 결과에 없는 열이 새 파일에 있으면 None을 반환하여 전체 재생성이 필요함을 알립니다.
+    """
+    removed = manifest.missing(csv_files)
+    if removed:
+        print(f"  - {len(removed)} previously integrated files are gone (e.g. {removed[0]}). "
+              f"Their rows are kept; run with --full-rebuild to drop them.")
+
+    changed = [file_path for file_path in csv_files if manifest.is_changed(file_path)]
+    if not changed:
+        manifest.save()
+        return 0, 0
+
+    print(f"Found {len(changed)} new or changed files (of {len(csv_files)}).")
+    schema, headers = build_schema(changed)
+    new_columns = [column for column in schema if column not in output_columns]
+    if new_columns:
+        print(f"  - New columns {new_columns} are not in the existing output.")
+        return None
+
+    link_counts = count_review_links(headers, chunksize)
+    replaced = link_counts if DEDUP_COLUMN in output_columns else set()
+
+    def write_new_rows(appender):
+        return write_files(headers, output_columns, appender, link_counts, manifest, chunksize)
+
+    _, (file_count, new_rows) = merge_into_parquet(output_filepath, DEDUP_COLUMN, replaced, write_new_rows, chunksize)
+    manifest.save()
+    return file_count, new_rows
+
+
+def write_outputs(csv_output):
+    """상위 10개 행을 별도의 _head.csv 파일로 저장하고, csv_output이면 Excel용 CSV도 함께 저장합니다."""
+    write_head(output_filepath, head_output_filepath, HEAD_ROWS, text=True)
+    if csv_output:
+        export_csv(output_filepath, csv_output_filepath, text=True)
+        print(f"CSV copy saved to: {csv_output_filepath}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Integrate Google Play review exports into a single Parquet file.")
+    parser.add_argument('--full-rebuild', action='store_true',
+                        help="Ignore the manifest and rebuild the output from every input file.")
+    parser.add_argument('--chunksize', type=int, default=DEFAULT_CHUNKSIZE,
+                        help="Rows per chunk.")
+    parser.add_argument('--csv', action='store_true',
+                        help="Also write the integrated reviews as a UTF-8 CSV for Excel.")
+    args = parser.parse_args()
+
+    # 출력 디렉터리가 없으면 생성합니다.
+    os.makedirs(output_dir, exist_ok=True)
+
+    # 입력 디렉터리에서 모든 CSV 파일 목록을 가져옵니다. (월별 파일이 항상 같은 순서로 합쳐지도록 정렬)
+    csv_files = sorted(glob.glob(os.path.join(input_dir, '*.csv')))
+
+    if not csv_files:
+        print(f"No CSV files found in {input_dir}")
+        return
+
+    manifest = Manifest.load(manifest_filepath, input_dir)
+    output_columns = read_columns(output_filepath)
+
+    # 이전 결과와 매니페스트가 모두 있으면 새 파일이나 바뀐 파일만 처리합니다.
+    if not args.full_rebuild and output_columns is not None and manifest.files:
+        print("Checking for new or changed CSV files...")
+        try:
+            result = integrate_incremental(csv_files, manifest, output_columns, chunksize=args.chunksize)
         except Exception as e:
-            print(f"  - Failed to read {filename}. Error: {e}")
-
-    if df_list:
-        # ���든 데이터프레임을 하나로 합칩니다.
-        integrated_df = pd.concat(df_list, ignore_index=True)
-        
-        # 통합된 데이터프레임을 UTF-8 인코딩으로 저장합니다.
-        integrated_df.to_csv(output_filepath, index=False, encoding='utf-8-sig')
-        
-        # 상위 10개 행을 별도의 _head.csv 파일로 저장합니다.
-        head_output_filepath = os.path.join(output_dir, 'google_play_reviews_integrated_head.csv')
-        integrated_df.head(10).to_csv(head_output_filepath, index=False, encoding='utf-8-sig')
+            print(f"\nIncremental update failed, existing output was left unchanged. Error: {e}")
+            return
+        if result == (0, 0):
+            print("\nNo new or changed files. Output is up to date.")
+            return
+        if result is not None:
+            file_count, new_rows = result
+            write_outputs(args.csv)
+            print(f"""
+Successfully merged {file_count} new or changed files.
+New rows: {new_rows}
+Output file saved to: {output_filepath}
+""")
+            return
+        print("Falling back to a full rebuild.")
+
+    print("Starting to read CSV files...")
+    try:
+        file_count, total_rows = integrate_full(csv_files, manifest, chunksize=args.chunksize)
+    except Exception as e:
+        print(f"\nFull rebuild failed, existing output was left unchanged. Error: {e}")
+        return
 
+    if file_count:
+        write_outputs(args.csv)
         print(f"""
-Successfully integrated {len(df_list)} files.
-Total rows: {len(integrated_df)}
+Successfully integrated {file_count} files.
+Total rows: {total_rows}
 Output file saved to: {output_filepath}
-Head file (first 10 rows) saved to: {head_output_filepath}
+Head file (first {HEAD_ROWS} rows) saved to: {head_output_filepath}
 """)
     else:
         print("\nNo dataframes were created. Could not generate output file.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,11 +1,32 @@
 import os
 import glob
 import re
-import email
+import gzip
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from email import policy
 from email.parser import BytesParser
 from tqdm import tqdm
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from anonymizer import anonymize_text
+from columnar import (CSV_ENCODING, CsvRowWriter, ParquetAppender, export_csv, merge_into_parquet, read_columns,
+                      string_schema, write_head)
+from pipeline_manifest import Manifest
+
+# 출력 파일의 열 순서입니다.
+EMAIL_COLUMNS = ['source_file', 'date', 'subject', 'message_id', 'in_reply_to', 'references', 'language', 'body_anonymized']
+# 같은 메일을 구분하는 열입니다. 같은 메일이 여러 파일로 저장된 경우 마지막에 처리한 행만 남깁니다.
+DEDUP_COLUMN = 'message_id'
+
+# mbox 파일에서 메일 사이를 구분하는 줄의 시작입니다.
+MBOX_SEPARATOR = b'From '
+# mboxrd 형식에서 본문의 "From "으로 시작하는 줄은 앞에 '>'를 붙여 저장하므로, 읽을 때 하나를 떼어냅니다.
+MBOXRD_ESCAPED_FROM = re.compile(rb'^>(>*From )')
+MBOX_PATTERNS = ('*.mbox', '*.mbox.gz')
 
 def get_email_body(msg):
     """
@@ -44,22 +65,373 @@ def get_email_body(msg):
                 body = "[Body Decode Error]"
     return body
 
-def anonymize_text(text):
+def message_to_row(msg, source):
+    """
+    파싱한 메일 메시지를 출력 행(dict)으로 변환합니다.
+    답변 메일(제목에 'Re:'가 포함된 메일)이 아니면 None을 반환합니다.
+    """
+    date = msg.get('Date', 'N/A')
+    subject = msg.get('Subject', 'N/A')
+
+    # 답변 메일인지 확인 (제목에 'Re:'가 포함되어 있는지)
+    if not (subject and 're:' in subject.lower()):
+        return None
+
+    body = get_email_body(msg)
+    return {
+        'source_file': source,
+        'date': date,
+        'subject': subject,
+        'message_id': msg.get('Message-ID', 'N/A'),
+        'in_reply_to': msg.get('In-Reply-To', 'N/A'),
+        'references': msg.get('References', 'N/A'),
+        'language': msg.get('Content-Language', 'N/A'),
+        'body_anonymized': anonymize_text(body)
+    }
+
+def process_email_file(file_path):
+    """.eml 파일 하나를 파싱하여 출력 행(dict)을 반환합니다. 답변 메일이 아니면 None을 반환합니다."""
+    with open(file_path, 'rb') as f:
+        msg = BytesParser(policy=policy.default).parse(f)
+    return message_to_row(msg, os.path.basename(file_path))
+
+def process_email_file_safe(file_path):
+    """
+    프로세스 풀에서 실행하는 작업 단위입니다. 예외를 밖으로 던지지 않고 (파일 경로, 행, 오류 메시지)로 돌려줍니다.
+    """
+    try:
+        return file_path, process_email_file(file_path), None
+    except Exception as e:
+        return file_path, None, f"{type(e).__name__}: {e}"
+
+def parse_email_files(file_paths, workers=1, chunksize=None):
     """
-    주어진 텍스트에서 이메일 주소와 URL을 비식별화합니다.
+    .eml 파일들을 파싱하여 (파일 경로, 행, 오류 메시지)를 입력 순서대로 내보냅니다.
+    파싱과 비식별화는 CPU 작업이므로 workers가 2 이상이면 프로세스 풀에 나눠 맡깁니다.
+    파일을 chunksize개씩 묶어 보내 프로세스 간 통신 비용을 줄이며, 결과 순서는 workers와 관계없이 같습니다.
     """
-    if not isinstance(text, str):
-        return ""
-    # 이메일 주소 비식별화
-    text = re.sub(r'[\w\.-]+@[\w\.-]+', '[email_address]', text)
-    # URL 비식별화
-    text = re.sub(r'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\\(\\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', '[url]', text)
-    return text
+    if workers <= 1 or len(file_paths) <= 1:
+        for file_path in file_paths:
+            yield process_email_file_safe(file_path)
+        return
+
+    if chunksize is None:
+        # 워커마다 4번 정도 나눠 받도록 하여, 처리 시간이 고르지 않아도 놀고 있는 워커가 없게 합니다.
+        chunksize = max(1, min(256, len(file_paths) // (workers * 4)))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(process_email_file_safe, file_paths, chunksize=chunksize)
+
+def drop_duplicate_messages(df):
+    """Message-ID가 같은 행은 마지막 행만 남깁니다. Message-ID가 없는('N/A') 행은 모두 남깁니다."""
+    duplicated = df[DEDUP_COLUMN].duplicated(keep='last') & (df[DEDUP_COLUMN] != 'N/A')
+    return df[~duplicated]
+
+def open_mbox(path):
+    """mbox 파일을 바이너리 모드로 엽니다. .gz 파일은 압축을 풀면서 읽습니다."""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+def iter_mbox_messages(path, start_offset=0):
+    """
+    mbox 파일에서 메일을 하나씩 꺼내 (시작 위치, 다음 메일의 시작 위치, 메일 바이트)로 내보냅니다.
+    한 번에 메일 하나만 메모리에 두므로 수 GB 크기의 파일도 일정한 메모리로 읽을 수 있습니다.
+    위치는 압축을 푼 기준의 바이트 오프셋이며, start_offset부터 읽기 시작합니다.
+    start_offset이 메일 경계가 아니면 다음 메일부터 읽습니다. (.gz 파일은 처음부터 압축을 풀며 건너뛰므로 시간이 걸립니다.)
+    """
+    with open_mbox(path) as f:
+        offset = start_offset
+        if start_offset:
+            f.seek(start_offset - 1)
+            if f.read(1) != b'\n':
+                # 줄 중간이면 그 줄의 나머지를 건너뜁니다.
+                offset += len(f.readline())
+
+        message_start = None
+        lines = []
+        for line in f:
+            if line.startswith(MBOX_SEPARATOR):
+                if message_start is not None:
+                    yield message_start, offset, b''.join(lines)
+                message_start = offset
+                lines = []
+            elif message_start is not None:
+                lines.append(MBOXRD_ESCAPED_FROM.sub(rb'\1', line))
+            offset += len(line)
+        if message_start is not None:
+            yield message_start, offset, b''.join(lines)
+
+
+class ParquetRowWriter:
+    """
+    행을 Parquet 파일로 씁니다. path는 디렉터리이며, 체크포인트마다 part-00000.parquet 형식의 파일을 하나씩 완성합니다.
+    (Parquet 파일은 닫아야 읽을 수 있으므로, 완성된 파일만 재개 상태에 기록하고 나머지는 재개할 때 지웁니다.)
+    pandas.read_parquet(path)로 디렉터리 전체를 한 번에 읽을 수 있습니다.
+    """
+
+    def __init__(self, path, columns, committed_parts=None):
+        self.path = path
+        self.columns = columns
+        self.schema = string_schema(columns)
+        self.parts = list(committed_parts or [])
+        self._writer = None
+
+        os.makedirs(path, exist_ok=True)
+        for file_path in glob.glob(os.path.join(path, 'part-*.parquet')):
+            if os.path.basename(file_path) not in self.parts:
+                os.remove(file_path)
+
+    def _part_name(self):
+        return f"part-{len(self.parts):05d}.parquet"
+
+    def write(self, rows):
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(os.path.join(self.path, self._part_name()), self.schema)
+        table = pa.Table.from_pylist(
+            [{column: row.get(column) for column in self.columns} for row in rows], schema=self.schema)
+        self._writer.write_table(table)
+
+    def commit(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+            self.parts.append(self._part_name())
+        return {'parts': list(self.parts)}
+
+    def close(self):
+        self.commit()
+
+    def write_head(self, head_path, rows=10):
+        if not self.parts:
+            return
+        write_head(os.path.join(self.path, self.parts[0]), head_path, rows)
+
+def load_mbox_state(state_path):
+    if not os.path.exists(state_path):
+        return None
+    with open(state_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_mbox_state(state_path, state):
+    # 중간에 중단되어도 상태 파일이 깨지지 않도록 임시 파일에 쓴 뒤 교체합니다.
+    tmp_path = state_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, state_path)
+
+def convert_mbox_files(mbox_paths, output_path, head_path, state_path, output_format='parquet',
+                       restart=False, start_offset=None, batch_size=1000, checkpoint_every=10000):
+    """
+    mbox(.mbox, .mbox.gz) 파일에서 메일을 스트리밍으로 읽어, 답변 메일을 batch_size개씩 출력 파일에 씁니다.
+
+    checkpoint_every개의 메일마다 출력을 디스크에 반영하고 "다음에 읽을 위치"를 상태 파일에 기록합니다.
+    중간에 중단되면 다음 실행에서 상태 파일을 읽어 마지막 체크포인트 위치부터 이어서 처리합니다.
+    (체크포인트 이후에 쓴 행은 지우고 다시 쓰므로 중복되지 않습니다.)
+    restart이면 상태 파일을 무시하고 처음부터 다시 만듭니다.
+    start_offset을 주면 (파일이 하나일 때) 그 바이트 위치부터 읽습니다.
+    """
+    state = None if restart else load_mbox_state(state_path)
+    if state is not None and state.get('format') != output_format:
+        print(f"Previous run used {state.get('format')} output; starting over with {output_format}.")
+        state = None
+
+    if output_format == 'parquet':
+        writer = ParquetRowWriter(output_path, EMAIL_COLUMNS,
+                                  committed_parts=state['committed'].get('parts') if state else None)
+    else:
+        writer = CsvRowWriter(output_path, EMAIL_COLUMNS,
+                              committed_size=state['committed'].get('size') if state else None)
+    if state is None:
+        state = {'format': output_format, 'committed': writer.commit(), 'files': {}}
+        save_mbox_state(state_path, state)
+    else:
+        print(f"Resuming from checkpoint in {state_path}")
+
+    total_rows = 0
+    errors = []
+    try:
+        for mbox_path in mbox_paths:
+            name = os.path.basename(mbox_path)
+            stat = os.stat(mbox_path)
+            entry = state['files'].get(name)
+            if entry is not None and (entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime):
+                print(f"  - {name} changed since the last run. Run with --restart to rebuild the output.")
+                continue
+            if entry is None:
+                entry = state['files'][name] = {'size': stat.st_size, 'mtime': stat.st_mtime,
+                                                'offset': 0, 'messages': 0, 'rows': 0, 'done': False}
+            if start_offset is not None:
+                entry['offset'] = start_offset
+                entry['done'] = False
+            if entry['done']:
+                print(f"  - {name} was already converted. Skipping.")
+                continue
+
+            rows = []
+            since_checkpoint = 0
+            last_offset = entry['offset']
+
+            def checkpoint(next_offset):
+                if rows:
+                    writer.write(rows)
+                    rows.clear()
+                state['committed'] = writer.commit()
+                entry['offset'] = next_offset
+                save_mbox_state(state_path, state)
+
+            progress = tqdm(desc=f"Processing {name}", unit='msg', initial=entry['messages'])
+            for message_start, next_offset, raw in iter_mbox_messages(mbox_path, entry['offset']):
+                entry['messages'] += 1
+                progress.update()
+                try:
+                    row = message_to_row(BytesParser(policy=policy.default).parsebytes(raw),
+                                         f"{name}:{message_start}")
+                except Exception as e:
+                    errors.append({'source_file': f"{name}:{message_start}", 'error': f"{type(e).__name__}: {e}"})
+                    row = None
+                if row is not None:
+                    rows.append(row)
+                    entry['rows'] += 1
+                    total_rows += 1
+                    if len(rows) >= batch_size:
+                        writer.write(rows)
+                        rows.clear()
+                since_checkpoint += 1
+                if since_checkpoint >= checkpoint_every:
+                    checkpoint(next_offset)
+                    since_checkpoint = 0
+                last_offset = next_offset
+            progress.close()
+            entry['done'] = True
+            checkpoint(last_offset)
+    finally:
+        writer.close()
+
+    writer.write_head(head_path)
+    return total_rows, errors
+
+def convert_eml_files(eml_files, input_dir, output_dir, full_rebuild=False, workers=1, chunksize=None, csv_output=False):
+    """
+    .eml 파일들을 처리하여 emails_processed.parquet를 만들거나, 새 파일/바뀐 파일만 기존 결과에 합칩니다.
+    csv_output이면 Excel 사용자를 위해 같은 내용을 emails_processed.csv로도 저장합니다.
+    """
+    output_filepath = os.path.join(output_dir, 'emails_processed.parquet')
+    csv_output_filepath = os.path.join(output_dir, 'emails_processed.csv')
+    head_output_filepath = os.path.join(output_dir, 'emails_processed_head.csv')
+    # 이미 처리한 .eml 파일 목록입니다. (증분 처리용)
+    manifest_filepath = os.path.join(output_dir, 'emails_processed.manifest.json')
+    errors_filepath = os.path.join(output_dir, 'emails_processed_errors.csv')
+
+    # 이전 결과와 매니페스트가 모두 있으면 새 파일이나 바뀐 파일만 처리합니다.
+    manifest = Manifest.load(manifest_filepath, input_dir)
+    incremental = (not full_rebuild and manifest.files
+                   and read_columns(output_filepath) == EMAIL_COLUMNS)
+    if incremental:
+        target_files = [file_path for file_path in eml_files if manifest.is_changed(file_path)]
+        if not target_files:
+            manifest.save()
+            print("No new or changed .eml files. Output is up to date.")
+            return
+        print(f"Found {len(target_files)} new or changed .eml files (of {len(eml_files)}). Starting processing...")
+    else:
+        manifest.clear()
+        target_files = eml_files
+        print(f"Found {len(eml_files)} .eml files. Starting processing...")
+
+    processed_data = []
+    errors = []
+
+    # tqdm을 사용하여 진행률 표시
+    results = parse_email_files(target_files, workers=workers, chunksize=chunksize)
+    for file_path, row, error in tqdm(results, total=len(target_files), desc="Processing emails"):
+        if error is not None:
+            # 실패한 파일은 매니페스트에 기록하지 않아 다음 실행에서 다시 시도합니다.
+            errors.append({'source_file': os.path.basename(file_path), 'error': error})
+            continue
+        if row is not None:
+            processed_data.append(row)
+        manifest.update(file_path, 0 if row is None else 1)
+
+    if errors:
+        # 오류는 진행률 표시를 어지럽히지 않도록 모아서 파일로 저장하고 요약만 출력합니다.
+        pd.DataFrame(errors).to_csv(errors_filepath, index=False, encoding=CSV_ENCODING)
+        print(f"\n{len(errors)} files failed to process. Details saved to: {errors_filepath}")
+        for item in errors[:5]:
+            print(f"  - {item['source_file']}: {item['error']}")
+    elif os.path.exists(errors_filepath):
+        # 이전 실행의 오류 목록이 남아 있으면 혼동되지 않도록 지웁니다.
+        os.remove(errors_filepath)
+
+    df = pd.DataFrame(processed_data, columns=EMAIL_COLUMNS)
+    df = drop_duplicate_messages(df)
+
+    if incremental:
+        if not df.empty:
+            replaced = set(df.loc[df[DEDUP_COLUMN] != 'N/A', DEDUP_COLUMN])
+
+            def write_new_rows(appender):
+                appender.write(df)
+                return len(df)
+
+            merge_into_parquet(output_filepath, DEDUP_COLUMN, replaced, write_new_rows)
+            write_head(output_filepath, head_output_filepath)
+            if csv_output:
+                export_csv(output_filepath, csv_output_filepath)
+        manifest.save()
+        print(f"\nSuccessfully merged {len(df)} new rows.")
+        print(f"Output file saved to: {output_filepath}")
+        return
+
+    if df.empty:
+        print("No data was processed. Output file will not be created.")
+        return
+
+    # 데이터프레임을 Parquet 파일로 저장 (중간에 실패해도 기존 결과가 남도록 임시 파일에 쓴 뒤 교체)
+    tmp_path = output_filepath + '.tmp'
+    appender = ParquetAppender(tmp_path, string_schema(EMAIL_COLUMNS))
+    try:
+        appender.write(df)
+    finally:
+        appender.close()
+    os.replace(tmp_path, output_filepath)
+    manifest.save()
+
+    # 상위 10개 행을 별도의 _head.csv 파일로 저장합니다.
+    df.head(10).to_csv(head_output_filepath, index=False, encoding=CSV_ENCODING)
+    if csv_output:
+        # Excel에서 한글이 깨지지 않도록 'utf-8-sig' 인코딩 사용
+        df.to_csv(csv_output_filepath, index=False, encoding=CSV_ENCODING)
+        print(f"CSV copy saved to: {csv_output_filepath}")
+
+    print(f"\nSuccessfully processed {len(df)} files.")
+    print(f"Output file saved to: {output_filepath}")
+    print(f"Head file (first 10 rows) saved to: {head_output_filepath}")
 
 def main():
     """
     메인 실행 함수
     """
+    parser = argparse.ArgumentParser(description="Convert support .eml/.mbox files into anonymized Parquet files.")
+    parser.add_argument('--full-rebuild', action='store_true',
+                        help="Ignore the manifest and reprocess every .eml file.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Number of parser processes (1 = no process pool). Defaults to the CPU count.")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="Files sent to a worker at a time. Chosen from the file count by default.")
+    parser.add_argument('--mbox', nargs='+', default=None,
+                        help="Convert these .mbox/.mbox.gz files. Defaults to the ones in raw_data/email.")
+    parser.add_argument('--format', choices=('csv', 'parquet'), default='parquet',
+                        help="Output format for mbox conversion.")
+    parser.add_argument('--csv', action='store_true',
+                        help="Also write the .eml output as a UTF-8 CSV for Excel.")
+    parser.add_argument('--restart', action='store_true',
+                        help="Ignore the mbox checkpoint and convert from the beginning.")
+    parser.add_argument('--start-offset', type=int, default=None,
+                        help="Byte offset (uncompressed) to start reading a single mbox file from.")
+    parser.add_argument('--checkpoint-every', type=int, default=10000,
+                        help="Messages between mbox checkpoints.")
+    args = parser.parse_args()
+
     # 이 스크립트 파일의 위치를 기준으로 프로젝트 루트 디렉터리를 찾습니다.
     script_dir = os.path.dirname(os.path.abspath(__file__))
     project_root = os.path.dirname(os.path.dirname(script_dir))
@@ -67,70 +439,42 @@ def main():
     # 입력 및 출력 디렉터리 경로를 설정합니다.
     input_dir = os.path.join(project_root, 'data', 'raw_data', 'email')
     output_dir = os.path.join(project_root, 'data', 'processed_data')
-    output_filepath = os.path.join(output_dir, 'emails_processed.csv')
 
     # 출력 디렉터리가 없으면 생성합니다.
     os.makedirs(output_dir, exist_ok=True)
 
-    # 입력 디렉터리에서 모든 .eml 파일 목록을 가져옵니다.
-    eml_files = glob.glob(os.path.join(input_dir, '*.eml'))
+    # 입력 디렉터리에서 모든 .eml, .mbox 파일 목록을 가져옵니다. (항상 같은 순서로 처리되도록 정렬)
+    eml_files = [] if args.mbox else sorted(glob.glob(os.path.join(input_dir, '*.eml')))
+    mbox_files = args.mbox or sorted(
+        file_path for pattern in MBOX_PATTERNS for file_path in glob.glob(os.path.join(input_dir, pattern)))
 
-    if not eml_files:
-        print(f"No .eml files found in {input_dir}")
+    if not eml_files and not mbox_files:
+        print(f"No .eml or .mbox files found in {input_dir}")
         return
+    if args.start_offset is not None and len(mbox_files) != 1:
+        parser.error("--start-offset requires exactly one mbox file.")
 
-    processed_data = []
-    
-    print(f"Found {len(eml_files)} .eml files. Starting processing...")
+    if eml_files:
+        convert_eml_files(eml_files, input_dir, output_dir, full_rebuild=args.full_rebuild,
+                          workers=args.workers, chunksize=args.chunksize, csv_output=args.csv)
 
-    # tqdm을 사용하여 진행률 표시
-    for file_path in tqdm(eml_files, desc="Processing emails"):
-        try:
-            with open(file_path, 'rb') as f:
-                msg = BytesParser(policy=policy.default).parse(f)
-
-            date = msg.get('Date', 'N/A')
-            subject = msg.get('Subject', 'N/A')
-
-            # 답변 메일인지 확인 (제목에 'Re:'가 포함되어 있는지)
-            if subject and 're:' in subject.lower():
-                message_id = msg.get('Message-ID', 'N/A')
-                in_reply_to = msg.get('In-Reply-To', 'N/A')
-                references = msg.get('References', 'N/A')
-                language = msg.get('Content-Language', 'N/A')
-                
-                body = get_email_body(msg)
-                anonymized_body = anonymize_text(body)
-
-                processed_data.append({
-                    'source_file': os.path.basename(file_path),
-                    'date': date,
-                    'subject': subject,
-                    'message_id': message_id,
-                    'in_reply_to': in_reply_to,
-                    'references': references,
-                    'language': language,
-                    'body_anonymized': anonymized_body
-                })
-        except Exception as e:
-            print(f"Error processing file {file_path}: {e}")
-
-    if not processed_data:
-        print("No data was processed. Output file will not be created.")
-        return
-
-    # 데이터프레임으로 변환 후 CSV로 저장
-    df = pd.DataFrame(processed_data)
-    # Excel에서 한글이 깨지지 않도록 'utf-8-sig' 인코딩 사용
-    df.to_csv(output_filepath, index=False, encoding='utf-8-sig')
-
-    # 상위 10개 행을 별도의 _head.csv 파일로 저장합니다.
-    head_output_filepath = os.path.join(output_dir, 'emails_processed_head.csv')
-    df.head(10).to_csv(head_output_filepath, index=False, encoding='utf-8-sig')
+    if mbox_files:
+        extension = 'parquet' if args.format == 'parquet' else 'csv'
+        output_path = os.path.join(output_dir, f'emails_mbox_processed.{extension}')
+        head_path = os.path.join(output_dir, 'emails_mbox_processed_head.csv')
+        state_path = os.path.join(output_dir, 'emails_mbox_processed.state.json')
+        errors_path = os.path.join(output_dir, 'emails_mbox_processed_errors.csv')
 
-    print(f"\nSuccessfully processed {len(df)} files.")
-    print(f"Output file saved to: {output_filepath}")
-    print(f"Head file (first 10 rows) saved to: {head_output_filepath}")
+        print(f"Converting {len(mbox_files)} mbox files...")
+        total_rows, errors = convert_mbox_files(
+            mbox_files, output_path, head_path, state_path, output_format=args.format,
+            restart=args.restart, start_offset=args.start_offset, checkpoint_every=args.checkpoint_every)
+        if errors:
+            pd.DataFrame(errors).to_csv(errors_path, index=False, encoding=CSV_ENCODING)
+            print(f"\n{len(errors)} messages failed to process. Details saved to: {errors_path}")
+        print(f"\nSuccessfully wrote {total_rows} rows from mbox files.")
+        print(f"Output saved to: {output_path}")
+        print(f"Head file (first 10 rows) saved to: {head_path}")
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,84 @@
+import os
+import json
+import hashlib
+import datetime
+
+MANIFEST_VERSION = 1
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(file_path):
+    """파일 내용의 SHA-256 해시를 1MB씩 읽어 계산합니다."""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class Manifest:
+    """
+    이미 처리한 입력 파일의 목록(경로, 크기, 수정 시각, 내용 해시, 행 수)을 JSON 파일로 관리합니다.
+    다음 실행에서는 새 파일이나 내용이 바뀐 파일만 다시 처리할 수 있습니다.
+
+    크기와 수정 시각이 같으면 해시를 계산하지 않고 변경되지 않은 것으로 봅니다.
+    둘 중 하나가 다르면 해시를 비교하므로, 복사 등으로 수정 시각만 바뀐 파일은 다시 처리하지 않습니다.
+    """
+
+    def __init__(self, manifest_path, base_dir):
+        self.manifest_path = manifest_path
+        self.base_dir = base_dir
+        self.files = {}
+
+    @classmethod
+    def load(cls, manifest_path, base_dir):
+        manifest = cls(manifest_path, base_dir)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                manifest.files = data.get('files', {})
+        return manifest
+
+    def _key(self, file_path):
+        return os.path.relpath(file_path, self.base_dir).replace(os.sep, '/')
+
+    def is_changed(self, file_path):
+        """매니페스트에 없거나 내용이 바뀐 파일이면 True를 반환합니다."""
+        entry = self.files.get(self._key(file_path))
+        if entry is None:
+            return True
+        stat = os.stat(file_path)
+        if stat.st_size == entry['size'] and stat.st_mtime == entry['mtime']:
+            return False
+        if stat.st_size == entry['size'] and file_sha256(file_path) == entry['sha256']:
+            # 내용은 같고 수정 시각만 바뀐 경우, 다음 실행에서 해시를 다시 계산하지 않도록 시각만 갱신합니다.
+            entry['mtime'] = stat.st_mtime
+            return False
+        return True
+
+    def update(self, file_path, rows):
+        """처리를 마친 파일의 현재 상태를 기록합니다."""
+        stat = os.stat(file_path)
+        self.files[self._key(file_path)] = {
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            'sha256': file_sha256(file_path),
+            'rows': rows,
+            'processed_at': datetime.datetime.now().isoformat(timespec='seconds'),
+        }
+
+    def missing(self, file_paths):
+        """매니페스트에는 있지만 입력 디렉터리에서 사라진 파일 목록입니다."""
+        current = {self._key(file_path) for file_path in file_paths}
+        return sorted(key for key in self.files if key not in current)
+
+    def clear(self):
+        self.files = {}
+
+    def save(self):
+        # 중간에 중단되어도 매니페스트가 깨지지 않도록 임시 파일에 쓴 뒤 교체합니다.
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'files': self.files}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.manifest_path)
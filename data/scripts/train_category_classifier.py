@@ -0,0 +1,292 @@
+import os
+import sys
+import json
+import time
+import hashlib
+import argparse
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+# 이 스크립트 파일의 위치를 기준으로 프로젝트 루트 디렉터리를 찾습니다.
+# (data/scripts/ -> project_root)
+project_root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, project_root)
+
+# 서버(api_server.py)와 같은 특징 추출과 모델 형식을 사용합니다.
+from category_classifier import (  # noqa: E402
+    FEATURE_DIM, STAR_SLOTS, example_features, parse_star_rating, save_model, text_counts,
+)
+from few_shot import review_text_from_prompt  # noqa: E402
+from prompts import SYSTEM_PROMPTS  # noqa: E402
+
+default_output_path = os.path.join(project_root, 'data', 'processed_data', 'category_classifier.npz')
+
+CATEGORY_COLUMN = 'category'
+PROMPT_COLUMN = 'prompt'
+REVIEW_COLUMN = 'Review Text'
+RATING_COLUMN = 'Star Rating'
+# 서버 로그에서 학습에 사용하는 이벤트입니다. 분류기가 고른 카테고리는 다시 학습하지 않도록 제외합니다.
+LOG_EVENT = 'generation_completed'
+CLASSIFIER_SOURCE = 'classifier'
+# 한 번에 계산하는 예시 수입니다. (특징 수 x 클래스 수 배열이 메모리에 올라가는 단위)
+BLOCK_ROWS = 20_000
+
+
+def star_value(value):
+    """별점 값(숫자 또는 문자열)을 0~5 정수로 바꿉니다. 읽을 수 없으면 0(별점 없음)입니다."""
+    try:
+        star = int(float(value))
+    except (TypeError, ValueError):
+        return 0
+    return star if 1 <= star <= 5 else 0
+
+
+def user_prompt(record):
+    """Gemini 튜닝 형식({"contents": [...]}) 레코드이면 첫 user 메시지를 반환합니다."""
+    for content in record.get('contents') or []:
+        if content.get('role') == 'user':
+            return ''.join(part.get('text', '') for part in content.get('parts', []))
+    return None
+
+
+def label_examples(records):
+    """
+    레이블 레코드(dict)를 (카테고리, 리뷰 텍스트, 별점)으로 바꿉니다.
+    prompt 열(또는 튜닝 형식의 user 메시지)이 있으면 서버와 같은 방식으로 리뷰와 별점을 꺼내고,
+    없으면 'Review Text'와 'Star Rating' 열을 사용합니다.
+    """
+    for record in records:
+        category = record.get(CATEGORY_COLUMN)
+        if not isinstance(category, str) or not category:
+            continue
+        prompt = record.get(PROMPT_COLUMN) or user_prompt(record)
+        if isinstance(prompt, str) and prompt:
+            yield category, review_text_from_prompt(prompt), parse_star_rating(prompt)
+        elif isinstance(record.get(REVIEW_COLUMN), str) and record[REVIEW_COLUMN]:
+            yield category, record[REVIEW_COLUMN], star_value(record.get(RATING_COLUMN))
+
+
+def read_label_file(path):
+    """레이블 파일(.csv, .parquet, .jsonl)을 읽습니다."""
+    if path.endswith('.jsonl'):
+        with open(path, 'r', encoding='utf-8') as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    elif path.endswith('.parquet'):
+        records = pd.read_parquet(path).to_dict('records')
+    else:
+        records = pd.read_csv(path, encoding='utf-8-sig', dtype=str, keep_default_na=False).to_dict('records')
+    return list(label_examples(records))
+
+
+def read_log_file(path):
+    """
+    서버 로그(LOG_FILE)에서 상담원이 카테고리를 지정한 generation_completed 기록을 읽습니다.
+    프롬프트 전문은 LOG_BODY_SAMPLE_RATE로 샘플링된 요청에만 있으므로, 프롬프트가 있는 기록만 사용합니다.
+    """
+    records = []
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if record.get('event') != LOG_EVENT or record.get('category_source') == CLASSIFIER_SOURCE:
+                continue
+            records.append(record)
+    return list(label_examples(records))
+
+
+def is_validation(text, star, validation_fraction, seed):
+    """내용의 해시값으로 검증 세트를 고릅니다. 같은 예시는 항상 같은 세트에 들어갑니다."""
+    if validation_fraction <= 0:
+        return False
+    digest = hashlib.sha1(f"{seed}\x00{star}\x00{text}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') / 2 ** 64 < validation_fraction
+
+
+def compute_idf(examples, dim):
+    """학습 예시에서 n-gram 칸별 문서 빈도로 smooth idf(log((1 + n) / (1 + df)) + 1)를 계산합니다."""
+    df = np.zeros(dim, dtype=np.int64)
+    for _, text, _ in examples:
+        df[text_counts(text, dim)[0]] += 1
+    return np.log((1 + len(examples)) / (1 + df)) + 1.0
+
+
+class SparseRows:
+    """예시별 희소 특징 벡터를 CSR 형식(행 시작 위치, 특징 번호, 값)으로 모은 행렬입니다."""
+
+    def __init__(self, examples, idf):
+        indices, values, starts = [], [], [0]
+        for _, text, star in examples:
+            row_indices, row_values = example_features(text, star, idf)
+            indices.append(row_indices)
+            values.append(row_values)
+            starts.append(starts[-1] + len(row_indices))
+        self.indices = np.concatenate(indices) if indices else np.zeros(0, dtype=np.int64)
+        self.values = np.concatenate(values) if values else np.zeros(0)
+        self.starts = np.array(starts, dtype=np.int64)
+        self.rows = len(examples)
+
+    def blocks(self, block_rows=BLOCK_ROWS):
+        """(시작 행, 끝 행, 블록 내 행 번호, 특징 번호, 값)을 block_rows 행씩 반환합니다."""
+        for start in range(0, self.rows, block_rows):
+            end = min(start + block_rows, self.rows)
+            lo, hi = self.starts[start], self.starts[end]
+            row_ids = np.repeat(np.arange(end - start), np.diff(self.starts[start:end + 1]))
+            yield start, end, row_ids, self.indices[lo:hi], self.values[lo:hi]
+
+
+def predict_logits(rows, weights, bias):
+    logits = np.tile(bias, (rows.rows, 1))
+    for start, end, row_ids, indices, values in rows.blocks():
+        contributions = values[:, None] * weights[indices]
+        for c in range(weights.shape[1]):
+            logits[start:end, c] += np.bincount(row_ids, weights=contributions[:, c], minlength=end - start)
+    return logits
+
+
+def softmax(logits):
+    logits = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return logits / logits.sum(axis=1, keepdims=True)
+
+
+def train(rows, labels, feature_count, class_count, epochs, learning_rate, l2):
+    """
+    다중 클래스 로지스틱 회귀를 전체 배치 경사 하강법(Adam)으로 학습합니다.
+    가중치 기울기는 예시의 특징 번호별로 bincount하여 희소 행렬 라이브러리 없이 계산합니다.
+    """
+    weights = np.zeros((feature_count, class_count))
+    bias = np.zeros(class_count)
+    targets = np.eye(class_count)[labels]
+    moments = [np.zeros_like(weights), np.zeros_like(weights), np.zeros_like(bias), np.zeros_like(bias)]
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    for step in range(1, epochs + 1):
+        errors = (softmax(predict_logits(rows, weights, bias)) - targets) / rows.rows
+        grad_weights = l2 * weights
+        for start, end, row_ids, indices, values in rows.blocks():
+            block_errors = errors[start:end]
+            for c in range(class_count):
+                grad_weights[:, c] += np.bincount(indices, weights=values * block_errors[row_ids, c],
+                                                  minlength=feature_count)
+        grad_bias = errors.sum(axis=0)
+        for param, grad, m, v in ((weights, grad_weights, moments[0], moments[1]),
+                                  (bias, grad_bias, moments[2], moments[3])):
+            m *= beta1
+            m += (1 - beta1) * grad
+            v *= beta2
+            v += (1 - beta2) * grad * grad
+            param -= learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+    return weights, bias
+
+
+def accuracy(rows, labels, weights, bias):
+    if not rows.rows:
+        return None
+    return float((predict_logits(rows, weights, bias).argmax(axis=1) == labels).mean())
+
+
+def train_category_classifier(label_paths, log_paths, output_path=default_output_path, dim=FEATURE_DIM,
+                              validation_fraction=0.1, epochs=100, learning_rate=0.05, l2=1e-4, seed=0):
+    """
+    레이블 파일과 서버 로그의 (카테고리, 리뷰, 별점)으로 분류기를 학습하여 output_path에 저장합니다.
+    SYSTEM_PROMPTS에 없는 카테고리는 제외하고, 같은 (리뷰, 별점)이 여러 번 나오면 마지막 레이블을 사용합니다.
+    """
+    latest = {}
+    for path in label_paths:
+        for category, text, star in read_label_file(path):
+            latest[(text, star)] = category
+    for path in log_paths:
+        for category, text, star in read_log_file(path):
+            latest[(text, star)] = category
+
+    unknown = Counter(category for category in latest.values() if category not in SYSTEM_PROMPTS)
+    examples = [(category, text, star) for (text, star), category in latest.items() if category in SYSTEM_PROMPTS]
+    classes = sorted({category for category, _, _ in examples})
+    if len(classes) < 2:
+        raise ValueError(f"학습하려면 SYSTEM_PROMPTS 카테고리가 두 개 이상 필요합니다. (찾은 카테고리: {classes})")
+
+    train_examples, validation_examples = [], []
+    for example in examples:
+        target = validation_examples if is_validation(example[1], example[2], validation_fraction, seed) else train_examples
+        target.append(example)
+
+    class_ids = {category: i for i, category in enumerate(classes)}
+    idf = compute_idf(train_examples, dim)
+    train_rows = SparseRows(train_examples, idf)
+    train_labels = np.array([class_ids[category] for category, _, _ in train_examples], dtype=np.int64)
+    weights, bias = train(train_rows, train_labels, dim + STAR_SLOTS, len(classes), epochs, learning_rate, l2)
+
+    validation_rows = SparseRows(validation_examples, idf)
+    validation_labels = np.array([class_ids[category] for category, _, _ in validation_examples], dtype=np.int64)
+    stats = {
+        'examples': len(examples),
+        'train_examples': train_rows.rows,
+        'validation_examples': validation_rows.rows,
+        'train_accuracy': accuracy(train_rows, train_labels, weights, bias),
+        'validation_accuracy': accuracy(validation_rows, validation_labels, weights, bias),
+        'class_counts': dict(sorted(Counter(category for category, _, _ in examples).items())),
+        'unknown_categories': dict(unknown),
+    }
+    meta = {
+        'trained_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'dim': dim,
+        'examples': stats['train_examples'],
+        'validation_accuracy': stats['validation_accuracy'],
+    }
+    save_model(output_path, weights, bias, idf, classes, meta)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the local category classifier used when a request has no category.")
+    parser.add_argument('--labels', action='append', default=[],
+                        help="Labelled reviews (.csv, .parquet or .jsonl) with a 'category' column and either "
+                             "'prompt' or 'Review Text' (+ optional 'Star Rating'). Can be given more than once.")
+    parser.add_argument('--logs', action='append', default=[],
+                        help="API server log file (LOG_FILE). Sampled generation_completed records whose category "
+                             "was chosen by an agent are used as labels. Can be given more than once.")
+    parser.add_argument('--output', default=default_output_path, help="Model file read by the API server.")
+    parser.add_argument('--dim', type=int, default=FEATURE_DIM, help="Number of hashed n-gram features.")
+    parser.add_argument('--validation-fraction', type=float, default=0.1,
+                        help="Fraction of examples held out to report accuracy.")
+    parser.add_argument('--epochs', type=int, default=100, help="Full-batch training steps.")
+    parser.add_argument('--learning-rate', type=float, default=0.05, help="Adam learning rate.")
+    parser.add_argument('--l2', type=float, default=1e-4, help="L2 regularization strength.")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the train/validation split.")
+    args = parser.parse_args()
+
+    if not args.labels and not args.logs:
+        parser.error("Give at least one --labels or --logs file.")
+    if not 0 <= args.validation_fraction < 1:
+        parser.error("--validation-fraction must be in [0, 1).")
+    missing = [path for path in args.labels + args.logs if not os.path.exists(path)]
+    if missing:
+        print(f"Input file not found: {missing[0]}")
+        return
+
+    started = time.perf_counter()
+    try:
+        stats = train_category_classifier(args.labels, args.logs, args.output, dim=args.dim,
+                                          validation_fraction=args.validation_fraction, epochs=args.epochs,
+                                          learning_rate=args.learning_rate, l2=args.l2, seed=args.seed)
+    except ValueError as e:
+        print(f"Training failed: {e}")
+        return
+
+    print(f"Trained on {stats['train_examples']} examples in {time.perf_counter() - started:.1f}s "
+          f"(validation: {stats['validation_examples']}).")
+    print("\nExamples per category:")
+    for category, count in stats['class_counts'].items():
+        print(f"  {category:<28}{count:>10}")
+    if stats['unknown_categories']:
+        print(f"\nSkipped categories not in SYSTEM_PROMPTS: {stats['unknown_categories']}")
+    print(f"\nTrain accuracy: {stats['train_accuracy']:.3f}")
+    if stats['validation_accuracy'] is not None:
+        print(f"Validation accuracy: {stats['validation_accuracy']:.3f}")
+    print(f"Model saved to: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
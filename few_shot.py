@@ -0,0 +1,246 @@
+import json
+import mmap
+import os
+import re
+import threading
+import time
+import unicodedata
+
+import numpy as np
+
+from prompts import format_few_shot_prompt
+
+# --- 임베딩 설정 ---
+# 리뷰 텍스트의 글자 n-gram을 부호 있는 해시(feature hashing)로 고정 길이 벡터에 더한 임베딩입니다.
+# 서로 다른 n-gram이 같은 칸에 들어가도 부호가 무작위라 유사도가 한쪽으로 치우치지 않습니다.
+# 외부 모델 없이 로컬에서 계산하므로 요청마다 네트워크 호출이 없고, 같은 텍스트는 항상 같은 벡터가 됩니다.
+EMBEDDING_DIM = 512
+NGRAM_SIZES = (2, 3)
+_HASH_MULTIPLIER = np.uint64(1_000_003)
+_HASH_MIXER = np.uint64(0x9E3779B97F4A7C15)
+_BUCKET_SHIFT = np.uint64(32)
+_SIGN_SHIFT = np.uint64(63)
+
+# 색인 형식이 바뀌면 올립니다. 형식이 다른 색인은 불러오지 않고 다시 만들어야 합니다.
+INDEX_FORMAT_VERSION = 1
+INDEX_META_FILENAME = "index.json"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_DIGITS_RE = re.compile(r"\d+")
+# 확장 프로그램과 학습 데이터의 프롬프트는 "필드명: 값" 줄 뒤에 "Review Text: 리뷰" 형식으로 리뷰가 들어갑니다.
+_REVIEW_TEXT_RE = re.compile(r"^Review Text:[ \t]*", re.MULTILINE)
+
+
+def normalize_text(text: str) -> str:
+    """임베딩 전에 유니코드(NFC), 대소문자, 공백을 통일하고 숫자는 하나의 기호로 바꿉니다. (주문 번호, 버전 등은 말투와 무관)"""
+    text = _DIGITS_RE.sub("0", unicodedata.normalize("NFC", text))
+    return _WHITESPACE_RE.sub(" ", text).strip().lower()
+
+
+def ngram_hashes(text: str, ngram_sizes: tuple = NGRAM_SIZES) -> np.ndarray:
+    """정규화한 텍스트의 글자 n-gram마다 64비트 해시를 계산합니다. (uint64 배열)"""
+    codes = np.frombuffer(normalize_text(text).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    parts = []
+    for size in ngram_sizes:
+        count = len(codes) - size + 1
+        if count <= 0:
+            continue
+        hashes = np.zeros(count, dtype=np.uint64)
+        for offset in range(size):
+            hashes = hashes * _HASH_MULTIPLIER + codes[offset:offset + count]
+        parts.append(hashes * _HASH_MIXER)
+    return np.concatenate(parts) if parts else np.zeros(0, dtype=np.uint64)
+
+
+def hash_buckets(hashes: np.ndarray, dim: int) -> np.ndarray:
+    """n-gram 해시를 [0, dim) 범위의 칸 번호로 바꿉니다."""
+    return ((hashes >> _BUCKET_SHIFT) % np.uint64(dim)).astype(np.int64)
+
+
+def embed_text(text: str, dim: int = EMBEDDING_DIM) -> np.ndarray:
+    """텍스트를 L2 정규화된 float32 벡터로 변환합니다. 두 벡터의 내적이 코사인 유사도입니다."""
+    hashes = ngram_hashes(text)
+    signs = 1.0 - 2.0 * (hashes >> _SIGN_SHIFT).astype(np.float64)
+    vector = np.bincount(hash_buckets(hashes, dim), weights=signs, minlength=dim).astype(np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def review_text_from_prompt(prompt: str) -> str:
+    """프롬프트에서 리뷰 본문만 꺼냅니다. "Review Text:" 줄이 없으면 프롬프트 전체를 사용합니다."""
+    match = _REVIEW_TEXT_RE.search(prompt)
+    return prompt[match.end():] if match else prompt
+
+
+# --- 색인 파일 ---
+def index_files(index_dir: str, build_id: str) -> dict:
+    """
+    빌드별 데이터 파일 경로입니다. 서버가 파일을 연 채로 새 빌드를 쓸 수 있도록 파일 이름에 빌드 ID를 붙입니다.
+    벡터는 행(예시) 단위(vectors, 증분 빌드에서 재사용)와 차원 단위(columns, 검색용) 두 가지 배치로 저장합니다.
+    """
+    return {
+        "vectors": os.path.join(index_dir, f"vectors-{build_id}.f32"),
+        "columns": os.path.join(index_dir, f"columns-{build_id}.f32"),
+        "examples": os.path.join(index_dir, f"examples-{build_id}.jsonl"),
+        "offsets": os.path.join(index_dir, f"offsets-{build_id}.npy"),
+    }
+
+
+def read_index_meta(index_dir: str) -> dict | None:
+    """색인 메타데이터(index.json)를 읽습니다. 없거나 형식이 다르면 None을 반환합니다."""
+    path = os.path.join(index_dir, INDEX_META_FILENAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if meta.get("format_version") != INDEX_FORMAT_VERSION:
+        return None
+    return meta
+
+
+class IndexData:
+    """
+    한 빌드의 색인 데이터입니다. 벡터(float32)와 예시 텍스트는 메모리 매핑으로 열어
+    서버 메모리에 복사하지 않고, 운영체제의 페이지 캐시를 여러 워커가 함께 사용합니다.
+    """
+
+    def __init__(self, index_dir: str, meta: dict):
+        self.meta = meta
+        self.count = meta["count"]
+        self.dim = meta["dim"]
+        files = index_files(index_dir, meta["build_id"])
+        # vectors[row]는 예시 하나의 벡터, columns[d]는 모든 예시의 d번째 차원 값입니다.
+        self.vectors = np.memmap(files["vectors"], dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        self.columns = np.memmap(files["columns"], dtype=np.float32, mode="r", shape=(self.dim, self.count))
+        self.offsets = np.load(files["offsets"], mmap_mode="r")
+        self._file = open(files["examples"], "rb")
+        self._examples = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def example_line(self, row: int) -> bytes:
+        """row번째 예시의 JSON 한 줄(줄바꿈 포함)을 그대로 반환합니다."""
+        return self._examples[int(self.offsets[row]):int(self.offsets[row + 1])]
+
+    def example(self, row: int) -> dict:
+        return json.loads(self.example_line(row))
+
+    def close(self):
+        self._examples.close()
+        self._file.close()
+
+
+class FewShotIndex:
+    """
+    과거 리뷰/답변 쌍의 최근접 이웃 색인입니다.
+    요청의 리뷰와 비슷한 과거 리뷰 top-k를 찾아, 실제 답변을 few-shot 예시로 프롬프트 앞에 붙입니다.
+    색인은 data/scripts/build_reply_index.py로 미리 만들며, 새로 만들면 reload_seconds 안에 자동으로 다시 불러옵니다.
+    """
+
+    def __init__(self, index_dir: str | None, top_k: int = 3, min_score: float = 0.2,
+                 max_example_chars: int = 500, reload_seconds: float = 60.0):
+        self.index_dir = index_dir
+        self.top_k = top_k
+        self.min_score = min_score
+        self.max_example_chars = max_example_chars
+        self.reload_seconds = reload_seconds
+        self.lookups = 0
+        self.injected = 0
+        self._data = None
+        self._meta_mtime = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        if index_dir and top_k > 0:
+            self.reload()
+
+    @property
+    def enabled(self) -> bool:
+        return self._data is not None and self._data.count > 0
+
+    def reload(self) -> bool:
+        """index.json이 바뀌었으면 새 빌드를 불러옵니다. 불러왔으면 True를 반환합니다."""
+        meta_path = os.path.join(self.index_dir, INDEX_META_FILENAME)
+        try:
+            mtime = os.stat(meta_path).st_mtime_ns
+        except OSError:
+            return False
+        if mtime == self._meta_mtime:
+            return False
+        meta = read_index_meta(self.index_dir)
+        if meta is None or meta.get("ngram_sizes") != list(NGRAM_SIZES):
+            return False
+        try:
+            data = IndexData(self.index_dir, meta) if meta["count"] else None
+        except (OSError, ValueError):
+            # 데이터 파일이 없거나 크기가 맞지 않으면 이전 빌드를 계속 사용합니다.
+            return False
+        with self._lock:
+            old, self._data, self._meta_mtime = self._data, data, mtime
+        # 이전 빌드의 매핑은 닫지 않고 참조가 사라질 때 정리되도록 둡니다. (진행 중인 조회가 있을 수 있음)
+        del old
+        return True
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if self.index_dir and self.reload_seconds > 0 and now - self._checked_at >= self.reload_seconds:
+            self._checked_at = now
+            self.reload()
+
+    def search(self, text: str, top_k: int | None = None) -> list[tuple[float, dict]]:
+        """text와 비슷한 과거 예시를 (유사도, 예시 dict) 목록으로 유사도가 높은 순서대로 반환합니다."""
+        self._maybe_reload()
+        data = self._data
+        top_k = self.top_k if top_k is None else top_k
+        if data is None or not data.count or top_k <= 0:
+            return []
+        query = embed_text(text, data.dim)
+        # 리뷰 하나의 n-gram은 일부 차원에만 들어가므로, 값이 있는 차원의 행만 읽어 내적을 계산합니다.
+        dims = np.flatnonzero(query)
+        scores = query[dims] @ data.columns[dims]
+        if top_k < data.count:
+            rows = np.argpartition(scores, -top_k)[-top_k:]
+        else:
+            rows = np.arange(data.count)
+        rows = rows[np.argsort(-scores[rows], kind="stable")]
+        return [(float(scores[row]), data.example(int(row))) for row in rows if scores[row] >= self.min_score]
+
+    def augment(self, prompt: str) -> str:
+        """비슷한 과거 답변을 few-shot 예시로 붙인 프롬프트를 반환합니다. 예시가 없으면 prompt를 그대로 반환합니다."""
+        if not self.index_dir or self.top_k <= 0:
+            return prompt
+        self.lookups += 1
+        examples = [
+            (example["review"][:self.max_example_chars], example["reply"][:self.max_example_chars])
+            for _, example in self.search(review_text_from_prompt(prompt))
+        ]
+        if not examples:
+            return prompt
+        self.injected += 1
+        return format_few_shot_prompt(prompt, examples)
+
+    def stats(self) -> dict:
+        data = self._data
+        return {
+            "enabled": self.enabled,
+            "index_dir": self.index_dir,
+            "build_id": data.meta["build_id"] if data else None,
+            "examples": data.count if data else 0,
+            "top_k": self.top_k,
+            "min_score": self.min_score,
+            "lookups": self.lookups,
+            "injected": self.injected,
+        }
+
+
+def create_few_shot_index_from_env() -> FewShotIndex:
+    """
+    환경 변수 설정으로 few-shot 색인을 엽니다. FEW_SHOT_TOP_K=0이면 끕니다.
+    색인 디렉터리(FEW_SHOT_INDEX_DIR)가 아직 없으면 예시 없이 동작하다가, 색인이 만들어지면 자동으로 불러옵니다.
+    """
+    default_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "processed_data", "reply_index")
+    return FewShotIndex(
+        index_dir=os.getenv("FEW_SHOT_INDEX_DIR", default_dir),
+        top_k=int(os.getenv("FEW_SHOT_TOP_K", "3")),
+        min_score=float(os.getenv("FEW_SHOT_MIN_SCORE", "0.2")),
+        max_example_chars=int(os.getenv("FEW_SHOT_MAX_EXAMPLE_CHARS", "500")),
+        reload_seconds=float(os.getenv("FEW_SHOT_RELOAD_SECONDS", "60")),
+    )
@@ -0,0 +1,229 @@
+import bisect
+import math
+import threading
+
+# 요청/업스트림 지연 시간(초)에 사용하는 기본 히스토그램 구간입니다.
+DEFAULT_LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape_label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: tuple = ()) -> str:
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+class _Metric:
+    """라벨 조합별 값을 보관하는 메트릭의 공통 부분입니다."""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+
+
+class Counter(_Metric):
+    """
+    증가만 하는 누적 카운터입니다.
+    다른 객체가 이미 세고 있는 누적 값은 set_function으로 수집 시점에 읽을 수도 있습니다. (라벨 없는 카운터 전용)
+    """
+
+    type_name = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._function = None
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def set_function(self, function):
+        self._function = function
+
+    def collect(self) -> list:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(_Metric):
+    """
+    현재 값을 나타내는 게이지입니다.
+    set_function으로 수집 시점에 값을 계산하는 함수를 등록할 수도 있습니다. (라벨 없는 게이지 전용)
+    """
+
+    type_name = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {}
+        self._function = None
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def set_function(self, function):
+        self._function = function
+
+    def collect(self) -> list:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Histogram(_Metric):
+    """구간별 누적 개수와 합계를 기록하는 히스토그램입니다. observe는 이진 탐색 한 번으로 끝납니다."""
+
+    type_name = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # 라벨 조합별 [구간별 개수..., +Inf 개수], 합계
+        self._counts = {}
+        self._sums = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    def collect(self) -> list:
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for upper, count in zip((*self.buckets, math.inf), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, (("le", _format_value(upper)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """메트릭을 등록하고 Prometheus 텍스트 형식(0.0.4)으로 내보냅니다."""
+
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines += metric.header()
+            lines += metric.collect()
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+registry = MetricsRegistry()
+
+# --- 서버 메트릭 정의 ---
+REQUESTS = registry.counter(
+    "cs_ai_requests_total", "처리한 답변 생성 요청 수", ("endpoint", "category", "status"))
+REQUEST_LATENCY = registry.histogram(
+    "cs_ai_request_duration_seconds", "답변 생성 요청의 전체 처리 시간", ("endpoint", "category"))
+STAGE_LATENCY = registry.histogram(
+    "cs_ai_stage_duration_seconds", "요청 처리 단계별 소요 시간", ("endpoint", "stage"))
+REQUESTS_IN_FLIGHT = registry.gauge(
+    "cs_ai_requests_in_flight", "처리 중인 HTTP 요청 수", ("endpoint",))
+UPSTREAM_LATENCY = registry.histogram(
+    "cs_ai_upstream_duration_seconds", "모델 백엔드(Gemini) 호출 시간", ("backend", "category"))
+UPSTREAM_IN_FLIGHT = registry.gauge(
+    "cs_ai_upstream_in_flight", "진행 중인 모델 백엔드 호출 수")
+TOKENS = registry.counter(
+    "cs_ai_tokens_total", "usage_metadata 기준 토큰 사용량", ("category", "type"))
+ERRORS = registry.counter(
+    "cs_ai_errors_total", "예외 종류별 오류 수", ("endpoint", "error_type"))
+PROMPT_TOKENS = registry.counter(
+    "cs_ai_prompt_tokens_estimated_total", "프롬프트 압축 전후의 예상 입력 토큰 수 (stage: before, after)", ("category", "stage"))
+CATEGORY_SELECTIONS = registry.counter(
+    "cs_ai_category_selections_total", "카테고리 결정 방식별 요청 수 (request, classifier, default)", ("source",))
+RESPONSE_CACHE_HIT_RATIO = registry.gauge(
+    "cs_ai_response_cache_hit_ratio", "응답 캐시 적중률")
+RESPONSE_CACHE_HITS = registry.counter(
+    "cs_ai_response_cache_hits_total", "응답 캐시 적중 수")
+RESPONSE_CACHE_MISSES = registry.counter(
+    "cs_ai_response_cache_misses_total", "응답 캐시 미적중 수")
+MODEL_REGISTRY_HIT_RATIO = registry.gauge(
+    "cs_ai_model_registry_hit_ratio", "모델 레지스트리 적중률 (gemini 백엔드)")
+
+
+class InFlightMiddleware:
+    """경로별로 처리 중인 HTTP 요청 수를 세는 ASGI 미들웨어입니다. 라벨 수가 늘지 않도록 지정한 경로만 셉니다."""
+
+    def __init__(self, app, paths: tuple):
+        self.app = app
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path") if scope["type"] == "http" else None
+        if path not in self.paths:
+            await self.app(scope, receive, send)
+            return
+        endpoint = path.lstrip("/")
+        REQUESTS_IN_FLIGHT.inc(endpoint=endpoint)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            REQUESTS_IN_FLIGHT.dec(endpoint=endpoint)
@@ -0,0 +1,312 @@
+import asyncio
+import hashlib
+import os
+import random
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from prompts import SYSTEM_PROMPTS, get_system_prompt
+
+# --- 모델 설정 ---
+MODEL_NAME = "gemini-2.0-flash-lite"
+# 레지스트리에 보관할 GenerativeModel 인스턴스의 최대 개수입니다.
+MODEL_REGISTRY_SIZE = int(os.getenv("MODEL_REGISTRY_SIZE", "32"))
+
+
+@dataclass
+class GenerationResult:
+    """모델 백엔드의 생성 결과입니다. usage는 토큰 사용량(dict) 또는 None입니다."""
+    text: str
+    usage: dict | None = None
+
+
+class UpstreamUnavailableError(Exception):
+    """업스트림 모델이 일시적으로 응답할 수 없을 때(429/503 등) 발생합니다."""
+
+
+# --- 백엔드 인터페이스 ---
+class ModelBackend:
+    """
+    api_server가 사용하는 모델 백엔드의 공통 인터페이스입니다.
+    MODEL_BACKEND 환경 변수로 구현을 선택합니다. (gemini | fake)
+    """
+
+    name = "base"
+
+    def warm_up(self):
+        """서버 시작 시 한 번 호출됩니다. 필요한 객체를 미리 준비합니다."""
+
+    async def generate(self, category: str | None, prompt: str) -> GenerationResult:
+        raise NotImplementedError
+
+    async def generate_stream(self, category: str | None, prompt: str):
+        """
+        답변을 조각 단위로 생성합니다.
+        ("text", 텍스트 조각)을 순서대로 내보낸 뒤, 마지막에 ("usage", 사용량 dict 또는 None)을 내보냅니다.
+        스트리밍을 지원하지 않는 백엔드는 generate()의 결과를 한 조각으로 내보냅니다.
+        """
+        result = await self.generate(category, prompt)
+        yield ("text", result.text)
+        yield ("usage", result.usage)
+
+    def is_retryable(self, error: Exception) -> bool:
+        """재시도하면 성공할 수 있는 일시적인 오류인지 판단합니다."""
+        return isinstance(error, UpstreamUnavailableError)
+
+    def stats(self) -> dict:
+        return {"name": self.name}
+
+
+# --- Gemini 백엔드 ---
+def usage_to_dict(usage_metadata) -> dict | None:
+    """Gemini 응답의 usage_metadata를 JSON으로 보낼 수 있는 dict로 변환합니다."""
+    if usage_metadata is None:
+        return None
+    return {
+        "prompt_token_count": usage_metadata.prompt_token_count,
+        "candidates_token_count": usage_metadata.candidates_token_count,
+        "total_token_count": usage_metadata.total_token_count,
+    }
+
+
+class ModelRegistry:
+    """
+    (모델 이름, 카테고리, 생성 설정) 조합별로 GenerativeModel 인스턴스를 보관하는 LRU 레지스트리입니다.
+    요청마다 모델 객체를 새로 만들지 않도록 하며, 모든 인스턴스는 genai의 기본 클라이언트(HTTP/gRPC 채널)를 공유합니다.
+    """
+
+    def __init__(self, genai, max_size: int = MODEL_REGISTRY_SIZE):
+        self.genai = genai
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _make_key(model_name: str, category: str | None, generation_config: dict | None):
+        config_key = tuple(sorted(generation_config.items())) if generation_config else None
+        return (model_name, category, config_key)
+
+    def get(self, category: str | None, model_name: str = MODEL_NAME, generation_config: dict | None = None):
+        """캐시된 모델을 반환하고, 없으면 생성하여 등록합니다."""
+        key = self._make_key(model_name, category, generation_config)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self.hits += 1
+                self._models.move_to_end(key)
+                return model
+
+            self.misses += 1
+            model = self.genai.GenerativeModel(
+                model_name=model_name,
+                system_instruction=get_system_prompt(category),
+                generation_config=generation_config,
+            )
+            self._models[key] = model
+            if len(self._models) > self.max_size:
+                self._models.popitem(last=False)
+            return model
+
+    def warm_up(self, model_name: str = MODEL_NAME):
+        """모든 카테고리와 기본 프롬프트용 모델을 미리 생성합니다. 워밍업 조회는 hit/miss에 집계하지 않습니다."""
+        hits, misses = self.hits, self.misses
+        for category in [None, *SYSTEM_PROMPTS]:
+            self.get(category, model_name=model_name)
+        self.hits, self.misses = hits, misses
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._models),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+class GeminiBackend(ModelBackend):
+    """google.generativeai SDK로 Gemini API를 호출하는 백엔드입니다."""
+
+    name = "gemini"
+
+    def __init__(self, api_key: str | None = None, model_name: str = MODEL_NAME):
+        # Gemini 백엔드를 선택한 경우에만 SDK를 불러오고 API 키를 확인합니다.
+        import google.generativeai as genai
+
+        # 환경 변수에서 API 키를 가져옵니다.
+        # GOOGLE_API_KEY라는 이름의 환경 변수를 설정해야 합니다.
+        # 예: export GOOGLE_API_KEY='당신의 API 키'
+        api_key = api_key or os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY 환경 변수가 설정되지 않았습니다.")
+        genai.configure(api_key=api_key)
+
+        self.model_name = model_name
+        self.registry = ModelRegistry(genai)
+
+    def warm_up(self):
+        self.registry.warm_up(self.model_name)
+
+    def is_retryable(self, error: Exception) -> bool:
+        # 429(쿼터 초과), 500/503(일시적 서버 오류), 504(업스트림 타임아웃)만 재시도합니다.
+        from google.api_core import exceptions as core_exceptions
+
+        return isinstance(error, (
+            UpstreamUnavailableError,
+            core_exceptions.TooManyRequests,
+            core_exceptions.ResourceExhausted,
+            core_exceptions.InternalServerError,
+            core_exceptions.ServiceUnavailable,
+            core_exceptions.DeadlineExceeded,
+        ))
+
+    async def generate(self, category: str | None, prompt: str) -> GenerationResult:
+        model = self.registry.get(category, model_name=self.model_name)
+        response = await model.generate_content_async(prompt)
+        return GenerationResult(text=response.text, usage=usage_to_dict(response.usage_metadata))
+
+    async def generate_stream(self, category: str | None, prompt: str):
+        model = self.registry.get(category, model_name=self.model_name)
+        response = await model.generate_content_async(prompt, stream=True)
+        async for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # 텍스트 파트가 없는 조각(종료 신호 등)은 건너뜁니다.
+                continue
+            if text:
+                yield ("text", text)
+        yield ("usage", usage_to_dict(response.usage_metadata))
+
+    def stats(self) -> dict:
+        return {"name": self.name, "model": self.model_name, "model_registry": self.registry.stats()}
+
+
+# --- 오프라인 가짜 백엔드 ---
+FAKE_REPLY_TEMPLATES = [
+    "소중한 의견 남겨주셔서 감사합니다. 말씀해주신 내용은 담당 부서에 전달하여 꼼꼼히 확인하겠습니다. 앞으로도 더 나은 게임이 될 수 있도록 노력하겠습니다.",
+    "안녕하세요, 고객님. 불편을 드려 죄송합니다. 자세한 확인을 위해 고객센터로 기기 정보와 발생 시각을 보내주시면 빠르게 도와드리겠습니다.",
+    "따뜻한 리뷰 감사합니다! 즐겁게 플레이해주셔서 개발팀 모두 큰 힘을 얻고 있습니다. 다가올 업데이트도 기대해주세요.",
+]
+
+
+def estimate_token_count(text: str) -> int:
+    """네트워크 호출 없이 계산하는 대략적인 토큰 수입니다. (한글 기준 약 2자당 1토큰) 가짜 백엔드의 사용량 보고와 프롬프트 토큰 예산에 사용합니다."""
+    return max(1, len(text) // 2)
+
+
+class FakeBackend(ModelBackend):
+    """
+    네트워크 없이 동작하는 결정적(deterministic) 가짜 백엔드입니다.
+    지연 시간 분포, 오류율, 토큰 단위 스트리밍을 흉내 내어 서버 자체의 처리량과 지연 시간을 측정할 때 사용합니다.
+
+    - 같은 (카테고리, 프롬프트)에는 항상 같은 답변을 돌려줍니다.
+    - 지연 시간과 오류 발생은 seed로 초기화된 난수열을 따르므로, 같은 요청 순서라면 실행마다 재현됩니다.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency_ms: float = 800.0,
+        latency_distribution: str = "lognormal",
+        latency_sigma: float = 0.5,
+        error_rate: float = 0.0,
+        token_delay_ms: float = 20.0,
+        seed: int = 0,
+    ):
+        if latency_distribution not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"지원하지 않는 지연 시간 분포입니다: {latency_distribution}")
+        self.latency_ms = latency_ms
+        self.latency_distribution = latency_distribution
+        self.latency_sigma = latency_sigma
+        self.error_rate = error_rate
+        self.token_delay_ms = token_delay_ms
+        self.seed = seed
+        self._random = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+
+    def _sample_latency_seconds(self) -> float:
+        """설정된 분포에서 첫 토큰까지의 지연 시간을 뽑습니다. latency_ms는 중앙값입니다."""
+        if self.latency_distribution == "fixed":
+            latency_ms = self.latency_ms
+        elif self.latency_distribution == "uniform":
+            latency_ms = self._random.uniform(0, 2 * self.latency_ms)
+        else:
+            latency_ms = self._random.lognormvariate(0, self.latency_sigma) * self.latency_ms
+        return latency_ms / 1000
+
+    def _make_reply(self, category: str | None, prompt: str) -> str:
+        digest = hashlib.sha256(f"{category or ''}\x00{prompt}".encode("utf-8")).digest()
+        return FAKE_REPLY_TEMPLATES[digest[0] % len(FAKE_REPLY_TEMPLATES)]
+
+    def _make_usage(self, category: str | None, prompt: str, reply: str) -> dict:
+        prompt_tokens = estimate_token_count(get_system_prompt(category) + prompt)
+        reply_tokens = estimate_token_count(reply)
+        return {
+            "prompt_token_count": prompt_tokens,
+            "candidates_token_count": reply_tokens,
+            "total_token_count": prompt_tokens + reply_tokens,
+        }
+
+    async def _simulate_upstream(self):
+        self.calls += 1
+        latency = self._sample_latency_seconds()
+        fail = self._random.random() < self.error_rate
+        await asyncio.sleep(latency)
+        if fail:
+            self.errors += 1
+            raise UpstreamUnavailableError("가짜 백엔드가 설정된 오류율에 따라 실패를 발생시켰습니다. (429/503 흉내)")
+
+    async def generate(self, category: str | None, prompt: str) -> GenerationResult:
+        await self._simulate_upstream()
+        reply = self._make_reply(category, prompt)
+        # 비스트리밍 호출도 전체 답변이 만들어질 때까지의 시간을 반영합니다.
+        await asyncio.sleep(self.token_delay_ms / 1000 * len(reply.split()))
+        return GenerationResult(text=reply, usage=self._make_usage(category, prompt, reply))
+
+    async def generate_stream(self, category: str | None, prompt: str):
+        await self._simulate_upstream()
+        reply = self._make_reply(category, prompt)
+        words = reply.split(" ")
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(self.token_delay_ms / 1000)
+            yield ("text", word if i == len(words) - 1 else word + " ")
+        yield ("usage", self._make_usage(category, prompt, reply))
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "latency_ms": self.latency_ms,
+            "latency_distribution": self.latency_distribution,
+            "error_rate": self.error_rate,
+            "calls": self.calls,
+            "errors": self.errors,
+        }
+
+
+def create_backend_from_env() -> ModelBackend:
+    """
+    MODEL_BACKEND 환경 변수에 따라 백엔드를 생성합니다. 기본값은 gemini입니다.
+    fake 백엔드는 FAKE_LATENCY_MS, FAKE_LATENCY_DISTRIBUTION, FAKE_LATENCY_SIGMA,
+    FAKE_ERROR_RATE, FAKE_TOKEN_DELAY_MS, FAKE_SEED 환경 변수로 설정합니다.
+    """
+    backend_name = os.getenv("MODEL_BACKEND", "gemini").lower()
+    if backend_name == "gemini":
+        return GeminiBackend()
+    if backend_name == "fake":
+        return FakeBackend(
+            latency_ms=float(os.getenv("FAKE_LATENCY_MS", "800")),
+            latency_distribution=os.getenv("FAKE_LATENCY_DISTRIBUTION", "lognormal"),
+            latency_sigma=float(os.getenv("FAKE_LATENCY_SIGMA", "0.5")),
+            error_rate=float(os.getenv("FAKE_ERROR_RATE", "0")),
+            token_delay_ms=float(os.getenv("FAKE_TOKEN_DELAY_MS", "20")),
+            seed=int(os.getenv("FAKE_SEED", "0")),
+        )
+    raise ValueError(f"지원하지 않는 MODEL_BACKEND 값입니다: {backend_name} (gemini 또는 fake)")
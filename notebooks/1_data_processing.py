@@ -1,6 +1,6 @@
 # # 1. 데이터 처리 (Data Processing)
 #
-# **목표:** `google_play_reviews_integrated.csv` 원본 데이터를 탐색하고, AI 모델 학습에 적합한 'prompt'와 'completion' 형식의 `training_data.csv`를 생성합니다.
+# **목표:** `google_play_reviews_integrated.parquet` 통합 데이터를 탐색하고, AI 모델 학습에 적합한 Gemini 튜닝 형식의 `training_data.jsonl`을 생성합니다.
 
 # ## 1.1. 라이브러리 임포트 및 설정
 
@@ -18,14 +18,19 @@ plt.rcParams['axes.unicode_minus'] = False
 # ## 1.2. 데이터 불러오기
 
 import os
+import sys
 
 # 스크립트 파일의 디렉터리를 기준으로 경로 설정
 script_dir = os.path.dirname(__file__)
-input_file_path = os.path.join(script_dir, '../data/processed_data/google_play_reviews_integrated.csv')
+input_file_path = os.path.join(script_dir, '../data/processed_data/google_play_reviews_integrated.parquet')
 output_file_path = os.path.join(script_dir, '../data/processed_data/training_data.jsonl')
 
+sys.path.append(os.path.join(script_dir, '../data/scripts'))
+from columnar import read_processed
+
 try:
-    df = pd.read_csv(input_file_path)
+    # 별점, 날짜 등은 타입이 있는 그대로 불러옵니다. (Parquet 파일이 없으면 이전 형식의 CSV를 읽음)
+    df = read_processed(input_file_path)
     print(f"'{input_file_path}' 파일을 성공적으로 불러왔습니다.")
 except FileNotFoundError:
     print(f"오류: 파일을 찾을 수 없습니다. 경로를 확인하세요: {input_file_path}")
@@ -55,62 +60,25 @@ plt.ylabel('리뷰 수')
 plt.show()
 
 # ## 1.4. 데이터 전처리 및 학습 데이터셋 생성
+#
+# 불필요한 열('Review Link', 'Review Title') 제거, 리뷰/답변이 비어 있는 행 제거, 개인정보 비식별화, JSONL 변환은
+# `data/scripts/build_training_jsonl.py`에서 청크 단위로 처리합니다.
+# 명령줄에서도 실행할 수 있습니다: `python data/scripts/build_training_jsonl.py --validation-fraction 0.1 --shard-size-mb 100`
 
-print(f"원본 데이터 크기: {df.shape}")
-
-# 'Review Link' 열은 프롬프트 생성에 필요 없으므로 제거합니다.
-if 'Review Link' in df.columns:
-    df.drop(columns=['Review Link'], inplace=True)
-    print("'Review Link' 열을 제거했습니다.")
+from build_training_jsonl import build_training_jsonl
 
-# 'Review Title' 열은 유의미한 데이터가 없으므로 제거합니다.
-if 'Review Title' in df.columns:
-    df.drop(columns=['Review Title'], inplace=True)
-    print("'Review Title' 열을 제거했습니다.")
-
-# 'Review Text' 또는 'Developer Reply Text' 열이 비어있는 행은 학습에 사용할 수 없으므로 제거합니다.
-df.dropna(subset=['Review Text', 'Developer Reply Text'], inplace=True)
-df = df[df['Review Text'].str.strip() != '']
-df = df[df['Developer Reply Text'].str.strip() != '']
-print(f"전처리 후 최종 데이터 크기: {df.shape}")
-
-import json
-
-def create_gemini_jsonl(row):
-    # 'Review Text'와 'Developer Reply Text'를 제외한 모든 열을 context로 구성
-    context_cols = row.drop(['Review Text', 'Developer Reply Text'])
-    context = '\n'.join([f"{col}: {val}" for col, val in context_cols.items()])
-    
-    # 컨텍스트와 실제 리뷰 텍스트를 합쳐서 user의 content로 만듭니다.
-    user_content = f"{context}\n\nReview Text: {row['Review Text']}"
-    model_content = row['Developer Reply Text']
-    
-    # Gemini 튜닝 형식에 맞는 contents 필드 구성
-    contents = {
-        "contents": [
-            {"role": "user", "parts": [{"text": user_content}]},
-            {"role": "model", "parts": [{"text": model_content}]}
-        ]
-    }
-    
-    return json.dumps(contents, ensure_ascii=False)
-
-# JSONL 형식의 문자열 리스트 생성
-jsonl_data = df.apply(create_gemini_jsonl, axis=1)
+print(f"원본 데이터 크기: {df.shape}")
+stats = build_training_jsonl(input_file_path, output_file_path)
 
 print("학습 데이터셋 생성 완료.")
 
-# ## 1.5. 생성된 데이터셋 확인 및 저장
+# ## 1.5. 생성된 데이터셋 확인
 
-print(f"최종 데이터셋 크기: {len(jsonl_data)}")
+print(f"최종 데이터셋 크기: {stats['train_examples']}")
 print("\n--- 생성된 데이터 샘플 ---")
-for i in range(min(3, len(jsonl_data))):
-    print(jsonl_data.iloc[i])
-    print("------------------------------------\n")
-
-# .jsonl 파일로 저장
-with open(output_file_path, 'w', encoding='utf-8') as f:
-    for line in jsonl_data:
-        f.write(line + '\n')
+with open(output_file_path, 'r', encoding='utf-8') as f:
+    for _, line in zip(range(3), f):
+        print(line.rstrip('\n'))
+        print("------------------------------------\n")
 
 print(f"학습 데이터가 성공적으로 '{output_file_path}' 에 저장되었습니다.")
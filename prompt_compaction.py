@@ -0,0 +1,183 @@
+import os
+import re
+from dataclasses import dataclass
+
+from model_backend import estimate_token_count
+
+# --- 압축 설정 ---
+# 답변 내용에 도움이 되지 않아 모델에 보내지 않는 메타데이터 필드입니다.
+# 확장 프로그램(App.js)과 학습 데이터(build_training_jsonl.py)가 "필드명: 값" 형식으로 프롬프트에 넣습니다.
+# 작성자(Author)와 별점(Star Rating)은 답변의 호칭과 말투에 쓰이므로 남깁니다.
+# 기기(Device)는 버그 신고 답변에 쓰이고, 리뷰 제목(Review Title)은 사용자가 쓴 내용이므로 남깁니다.
+DEFAULT_DROP_FIELDS = (
+    "Package Name",
+    "App Version Code",
+    "App Version Name",
+    "Reviewer Language",
+    "Review Submit Date and Time",
+    "Review Submit Millis Since Epoch",
+    "Review Last Update Date and Time",
+    "Review Last Update Millis Since Epoch",
+    "Developer Reply Date and Time",
+    "Developer Reply Millis Since Epoch",
+    "Review Link",
+)
+DEFAULT_TOKEN_BUDGET = 1000
+TRUNCATION_MARKER = "\n(이하 생략)"
+
+_REVIEW_TEXT_RE = re.compile(r"^Review Text:[ \t]*", re.MULTILINE)
+# 스토어 리뷰에는 항상 1~5점 별점이 있습니다. Gmail 문의(확장 프로그램은 별점 0)와 메일 데이터에는 없습니다.
+_STORE_RATING_RE = re.compile(r"^Star Rating:[ \t]*[1-5]\b", re.MULTILINE)
+# 이메일 답장에 붙는 이전 메일 인용의 시작 줄입니다. 이 줄부터 끝까지는 이미 주고받은 내용이므로 보내지 않습니다.
+_QUOTE_HEADER_RE = re.compile(
+    r"^[ \t]*(?:"
+    r"On .+wrote:"                                   # Gmail (영문)
+    r"|.+님이 작성:"                                   # Gmail (한국어)
+    r"|-{2,}[ \t]*(?:Original Message|원본 메시지)[ \t]*-{2,}"  # Outlook 등
+    r"|(?:From|보낸 사람):.*\n[ \t]*(?:Sent|Date|보낸 날짜|날짜):.*"  # Outlook 머리글 (From + Sent 두 줄)
+    r")[ \t]*$",
+    re.MULTILINE,
+)
+# 인용 표시(">", "> ", ">>")로 시작하는 줄입니다. ">_<", ">.<" 같은 이모티콘으로 시작하는 줄은 해당하지 않습니다.
+_QUOTED_LINE_RE = re.compile(r"^[ \t]*>(?:[ \t>].*)?(?:\n|$)", re.MULTILINE)
+# 서명의 시작 줄입니다. ("-- " 구분선, 모바일 메일 앱의 기본 서명)
+_SIGNATURE_RE = re.compile(r"^(?:--[ \t]*|Sent from my .{1,40}|.{1,40}에서 보냄)[ \t]*$", re.MULTILINE)
+_BLANK_LINES_RE = re.compile(r"\n{3,}")
+
+
+def _parse_field_list(raw: str | None, default: tuple) -> tuple:
+    # PROMPT_DROP_FIELDS="Package Name,Device" 처럼 쉼표로 구분하여 덮어쓸 수 있습니다.
+    if raw is None:
+        return default
+    return tuple(field.strip() for field in raw.split(",") if field.strip())
+
+
+def _parse_budgets(raw: str | None) -> dict:
+    # PROMPT_TOKEN_BUDGETS="bug_report=1500,review_5_star=300" 처럼 카테고리별 예산을 지정합니다.
+    budgets = {}
+    for item in (raw or "").split(","):
+        name, _, value = item.partition("=")
+        if name.strip() and value.strip():
+            budgets[name.strip()] = int(value)
+    return budgets
+
+
+def strip_quoted_history(text: str) -> str:
+    """
+    이메일 본문에서 인용된 이전 메일과 서명을 제거합니다.
+    인용 표시(>) 줄은 인용 머리글("On ... wrote:" 등)이 있는 메일 답장에서만 제거합니다.
+    (리뷰의 "> 업데이트 후 렉" 같은 줄이나 화살표, 이모티콘은 리뷰 내용이므로 남깁니다.)
+    """
+    match = _QUOTE_HEADER_RE.search(text)
+    if match:
+        # 머리글 뒤의 인용은 잘라내고, 머리글 앞에 답장 사이사이 인용한 줄도 뺍니다.
+        text = _QUOTED_LINE_RE.sub("", text[:match.start()])
+    match = _SIGNATURE_RE.search(text)
+    if match:
+        text = text[:match.start()]
+    return _BLANK_LINES_RE.sub("\n\n", text).strip()
+
+
+@dataclass
+class CompactedPrompt:
+    """압축한 프롬프트와 압축 전후의 예상 토큰 수입니다."""
+    prompt: str
+    tokens_before: int
+    tokens_after: int
+    truncated: bool = False
+
+    def log_fields(self) -> dict:
+        return {
+            "prompt_tokens_before": self.tokens_before,
+            "prompt_tokens_after": self.tokens_after,
+            "prompt_truncated": self.truncated,
+        }
+
+
+class PromptCompactor:
+    """
+    모델에 보내기 전에 프롬프트를 줄입니다.
+    1. "Review Text:" 앞의 메타데이터 줄 중 drop_fields에 해당하는 줄을 뺍니다.
+    2. 메일 본문(별점이 없거나 0인 프롬프트)에서 인용된 이전 메일과 서명을 뺍니다. 스토어 리뷰 본문은 그대로 둡니다.
+    3. 그래도 카테고리별 토큰 예산을 넘으면 본문 뒷부분을 잘라냅니다. (메타데이터 줄과 본문 앞부분은 유지)
+    """
+
+    def __init__(self, drop_fields: tuple = DEFAULT_DROP_FIELDS, token_budget: int = DEFAULT_TOKEN_BUDGET,
+                 category_budgets: dict | None = None, enabled: bool = True):
+        self.drop_fields = drop_fields
+        self.token_budget = token_budget
+        self.category_budgets = category_budgets or {}
+        self.enabled = enabled
+        self._drop_prefixes = tuple(f"{field}:" for field in drop_fields)
+        self.requests = 0
+        self.truncated = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    def budget_for(self, category: str | None) -> int:
+        """카테고리의 토큰 예산입니다. 0 이하이면 제한하지 않습니다."""
+        return self.category_budgets.get(category or "default", self.token_budget)
+
+    def _split(self, prompt: str) -> tuple[str, str]:
+        """프롬프트를 메타데이터 부분("Review Text: " 포함)과 본문으로 나눕니다. 형식이 다르면 전체가 본문입니다."""
+        match = _REVIEW_TEXT_RE.search(prompt)
+        if not match:
+            return "", prompt
+        header = "\n".join(
+            line for line in prompt[:match.start()].split("\n") if not line.startswith(self._drop_prefixes)
+        )
+        return header + prompt[match.start():match.end()], prompt[match.end():]
+
+    def _fit(self, header: str, body: str, budget: int) -> tuple[str, bool]:
+        """header + body가 예산 안에 들어가도록 body의 뒷부분을 잘라냅니다."""
+        if budget <= 0 or estimate_token_count(header + body) <= budget:
+            return header + body, False
+        while body:
+            excess = estimate_token_count(header + body + TRUNCATION_MARKER) - budget
+            if excess <= 0:
+                break
+            # 넘친 토큰 비율만큼 글자를 줄입니다. 추정기가 글자 수에 비례하므로 보통 한두 번이면 맞습니다.
+            cut = max(1, len(body) * excess // max(1, estimate_token_count(body)))
+            body = body[:max(0, len(body) - cut)].rstrip()
+        return header + body + TRUNCATION_MARKER, True
+
+    def compact(self, category: str | None, prompt: str) -> CompactedPrompt:
+        tokens_before = estimate_token_count(prompt)
+        if not self.enabled:
+            return CompactedPrompt(prompt, tokens_before, tokens_before)
+        header, body = self._split(prompt)
+        if not _STORE_RATING_RE.search(header):
+            body = strip_quoted_history(body)
+        compacted, truncated = self._fit(header, body, self.budget_for(category))
+        result = CompactedPrompt(compacted, tokens_before, estimate_token_count(compacted), truncated)
+        self.requests += 1
+        self.truncated += int(truncated)
+        self.tokens_before += result.tokens_before
+        self.tokens_after += result.tokens_after
+        return result
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "token_budget": self.token_budget,
+            "category_budgets": self.category_budgets,
+            "requests": self.requests,
+            "truncated": self.truncated,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "saved_ratio": 1 - self.tokens_after / self.tokens_before if self.tokens_before else 0.0,
+        }
+
+
+def create_prompt_compactor_from_env() -> PromptCompactor:
+    """
+    환경 변수 설정으로 프롬프트 압축기를 만듭니다. PROMPT_COMPACTION_ENABLED=false이면 프롬프트를 그대로 보냅니다.
+    예산은 PROMPT_TOKEN_BUDGET(기본값, 0이면 제한 없음)과 카테고리별 PROMPT_TOKEN_BUDGETS로 지정합니다.
+    카테고리가 없는 요청의 예산은 PROMPT_TOKEN_BUDGETS의 "default" 항목으로 따로 지정할 수 있습니다.
+    """
+    return PromptCompactor(
+        drop_fields=_parse_field_list(os.getenv("PROMPT_DROP_FIELDS"), DEFAULT_DROP_FIELDS),
+        token_budget=int(os.getenv("PROMPT_TOKEN_BUDGET", str(DEFAULT_TOKEN_BUDGET))),
+        category_budgets=_parse_budgets(os.getenv("PROMPT_TOKEN_BUDGETS")),
+        enabled=os.getenv("PROMPT_COMPACTION_ENABLED", "true").lower() in ("1", "true", "yes"),
+    )
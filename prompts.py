@@ -0,0 +1,50 @@
+# --- 카테고리별 시스템 프롬프트 정의 ---
+SYSTEM_PROMPTS = {
+    "bug_report": "당신은 모바일 게임의 기술적인 문제를 해결하는 '버그 리포트 분석 전문가'입니다. 사용자가 버그를 신고했습니다. 문제 상황을 명확히 이해하고, 필요하다면 추가 정보(기기 종류, OS 버전 등)를 요청하는 답변을 생성해주세요.",
+    "account_issue": "당신은 '계정 문제 해결 전문가'입니다. 사용자가 계정(로그인, 분실, 연동 등)과 관련된 문제를 겪고 있습니다. 친절하게 안심시키고, 계정 복구를 위한 절차를 안내하는 답변을 생성해주세요.",
+    "billing_inquiry": "당신은 '결제 및 환불 정책 전문가'입니다. 사용자가 결제 또는 환불에 대해 문의했습니다. 회사의 정책에 기반하여 명확하고 정확한 답변을 생성해주세요.",
+    "gameplay_question": "당신은 게임의 모든 것을 알고 있는 '마스터 게이머'입니다. 사용자가 게임 플레이에 대해 질문했습니다. 친절하고 상세하게 게임 공략법이나 팁을 알려주는 답변을 생성해주세요.",
+    "event_reward_inquiry": "당신은 게임의 '이벤트 및 보상 담당자'입니다. 사용자가 이벤트 참여나 보상 지급에 대해 문의했습니다. 이벤트 내용을 확인하고, 보상 지급 조건과 상태를 안내하는 답변을 생성해주세요.",
+    "content_suggestion": "당신은 게임의 미래를 기획하는 '게임 기획자'입니다. 사용자가 게임에 대한 새로운 아이디어를 제안했습니다. 소중한 의견에 감사하고, 긍정적으로 검토하겠다는 답변을 생성해주세요.",
+    "review_5_star": "당신은 커뮤니티 매니저입니다. 사용자가 5점 만점의 긍정적인 리뷰를 남겼습니다. 진심 어린 감사를 표현하고, 게임을 계속 즐겨달라는 따뜻한 답변을 작성해주세요.",
+    "review_4_star_no_complaint": "당신은 고객 경험 개선 담당자입니다. 사용자가 4점 이하의 리뷰를 남겼지만, 구체적인 불만 내용은 없습니다. 아쉬운 점이 있었는지 구체적인 피드백을 정중하게 요청하여, 게임을 개선할 기회를 만드는 답변을 작성해주세요.",
+    "etc": "당신은 모든 종류의 문의에 대응하는 '만능 고객 지원 담당자'입니다. 사용자의 문의에 대해 최대한 친절하고 상세하게 답변해주세요."
+}
+DEFAULT_SYSTEM_PROMPT = "당신은 모바일 게임 회사의 고객 지원 담당자입니다. 다음 문의에 대해 친절하고 도움이 되는 답변을 생성해주세요."
+
+
+def resolve_category(category: str | None) -> str | None:
+    """요청의 카테고리가 SYSTEM_PROMPTS에 정의되어 있으면 그대로, 아니면 None(기본 프롬프트)을 반환합니다."""
+    if category and category in SYSTEM_PROMPTS:
+        return category
+    return None
+
+
+def get_system_prompt(category: str | None) -> str:
+    """카테고리에 맞는 시스템 프롬프트를 반환합니다. 없으면 DEFAULT_SYSTEM_PROMPT를 사용합니다."""
+    return SYSTEM_PROMPTS.get(category, DEFAULT_SYSTEM_PROMPT) if category else DEFAULT_SYSTEM_PROMPT
+
+
+# --- few-shot 예시 ---
+# 비슷한 과거 리뷰에 실제로 작성한 답변을 프롬프트 앞에 붙여, 시스템 프롬프트만으로는 전달하기 어려운 말투와 형식을 맞춥니다.
+FEW_SHOT_HEADER = "다음은 비슷한 리뷰에 실제로 작성했던 답변 예시입니다. 내용을 그대로 복사하지 말고 말투와 형식만 참고하세요."
+FEW_SHOT_SEPARATOR = "\n\n---\n\n"
+
+
+def format_few_shot_prompt(prompt: str, examples: list[tuple[str, str]]) -> str:
+    """(리뷰, 답변) 예시 목록을 사용자 프롬프트 앞에 붙입니다."""
+    blocks = [
+        f"[예시 {index}]\n리뷰: {review}\n답변: {reply}"
+        for index, (review, reply) in enumerate(examples, start=1)
+    ]
+    return FEW_SHOT_HEADER + "\n\n" + "\n\n".join(blocks) + FEW_SHOT_SEPARATOR + prompt
+
+
+# --- 리뷰 프롬프트 ---
+def format_review_prompt(context: dict, review_text: str) -> str:
+    """
+    "필드명: 값" 줄들 뒤에 빈 줄과 "Review Text: 리뷰"를 붙인 사용자 프롬프트를 만듭니다.
+    학습 데이터(data/scripts/build_training_jsonl.py)의 user 내용과 같은 형식입니다.
+    """
+    lines = "".join(f"{name}: {value}\n" for name, value in context.items())
+    return f"{lines[:-1]}\n\nReview Text: {review_text}"
@@ -0,0 +1,277 @@
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+# --- 정규화 설정 ---
+# 프롬프트에 포함되지만 답변 내용에는 영향을 주지 않는 메타데이터 필드입니다.
+# 확장 프로그램(App.js)과 notebooks/1_data_processing.py가 "필드명: 값" 형식으로 프롬프트에 넣습니다.
+# 기기(Device)는 버그 신고 답변이 달라지므로 키에 남깁니다. (RESPONSE_CACHE_IGNORED_FIELDS로 무시하도록 바꿀 수 있음)
+DEFAULT_VOLATILE_FIELDS = (
+    "App Version Code",
+    "App Version Name",
+    "Review Submit Date and Time",
+    "Review Submit Millis Since Epoch",
+    "Review Last Update Date and Time",
+    "Review Last Update Millis Since Epoch",
+    "Developer Reply Date and Time",
+    "Developer Reply Millis Since Epoch",
+    "Review Link",
+)
+
+_WHITESPACE_RE = re.compile(r"[ \t\u00a0\u3000]+")
+
+
+def _load_volatile_fields() -> tuple:
+    # RESPONSE_CACHE_IGNORED_FIELDS="Author,Device" 처럼 쉼표로 구분하여 덮어쓸 수 있습니다.
+    raw = os.getenv("RESPONSE_CACHE_IGNORED_FIELDS")
+    if raw is None:
+        return DEFAULT_VOLATILE_FIELDS
+    return tuple(field.strip() for field in raw.split(",") if field.strip())
+
+
+def normalize_prompt(prompt: str, volatile_fields: tuple = DEFAULT_VOLATILE_FIELDS) -> str:
+    """
+    캐시 키 생성을 위해 프롬프트를 정규화합니다.
+    휘발성 메타데이터 줄을 제거하고, 유니코드(NFC)와 공백을 통일합니다.
+    """
+    prefixes = tuple(f"{field}:" for field in volatile_fields)
+    lines = []
+    for line in unicodedata.normalize("NFC", prompt).splitlines():
+        line = _WHITESPACE_RE.sub(" ", line).strip()
+        if not line or line.startswith(prefixes):
+            continue
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def make_cache_key(category: str | None, prompt: str, volatile_fields: tuple = DEFAULT_VOLATILE_FIELDS) -> str:
+    """(카테고리, 정규화된 프롬프트)로부터 고정 길이 캐시 키를 만듭니다."""
+    normalized = normalize_prompt(prompt, volatile_fields)
+    return hashlib.sha256(f"{category or ''}\x00{normalized}".encode("utf-8")).hexdigest()
+
+
+# --- 저장소 구현 ---
+class MemoryCacheBackend:
+    """TTL과 최대 크기를 가진 메모리 LRU 저장소입니다."""
+
+    # 디스크 I/O가 없으므로 이벤트 루프에서 바로 호출합니다.
+    blocking = False
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._items[key] = (time.time() + self.ttl_seconds, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+
+    def close(self):
+        pass
+
+    def __len__(self):
+        return len(self._items)
+
+
+class SqliteCacheBackend:
+    """
+    서버를 재시작해도 유지되는 SQLite 저장소입니다.
+    마지막 접근 시각을 기준으로 LRU 방식으로 오래된 항목을 제거합니다.
+    적중할 때마다 마지막 접근 시각을 쓰지 않고 모아 두었다가 touch_flush_size개가 쌓이거나
+    touch_flush_seconds가 지나거나 항목을 저장할 때 한 번에 씁니다.
+    """
+
+    # 디스크 I/O가 있으므로 ResponseCache가 별도 스레드에서 호출합니다.
+    blocking = True
+
+    def __init__(self, path: str, max_size: int, ttl_seconds: float,
+                 touch_flush_size: int = 256, touch_flush_seconds: float = 5.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.touch_flush_size = touch_flush_size
+        self.touch_flush_seconds = touch_flush_seconds
+        self._touched = {}
+        self._touch_flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS response_cache ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_response_cache_last_access ON response_cache (last_access)"
+        )
+        # 재시작 시 만료된 항목을 정리합니다.
+        self._conn.execute("DELETE FROM response_cache WHERE expires_at < ?", (time.time(),))
+        self._size = self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                self._size -= 1
+                return None
+            self._touched[key] = now
+            if len(self._touched) >= self.touch_flush_size \
+                    or time.monotonic() - self._touch_flushed_at >= self.touch_flush_seconds:
+                self._flush_touched()
+            return value
+
+    def _flush_touched(self):
+        # self._lock을 잡은 상태에서 호출합니다. 모아 둔 마지막 접근 시각을 트랜잭션 하나로 씁니다.
+        self._touch_flushed_at = time.monotonic()
+        if not self._touched:
+            return
+        touched, self._touched = self._touched, {}
+        with self._conn:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE response_cache SET last_access = ? WHERE key = ?",
+                [(last_access, key) for key, last_access in touched.items()],
+            )
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute(
+                "SELECT 1 FROM response_cache WHERE key = ?", (key,)
+            ).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl_seconds, now),
+            )
+            self._touched.pop(key, None)
+            if not exists:
+                self._size += 1
+            overflow = self._size - self.max_size
+            if overflow > 0:
+                # 제거할 항목을 고르기 전에 모아 둔 접근 시각을 반영합니다.
+                self._flush_touched()
+                self._conn.execute(
+                    "DELETE FROM response_cache WHERE key IN ("
+                    " SELECT key FROM response_cache ORDER BY last_access LIMIT ?)",
+                    (overflow,),
+                )
+                self._size -= overflow
+
+    def close(self):
+        """모아 둔 접근 시각을 쓰고 연결을 닫습니다."""
+        with self._lock:
+            self._flush_touched()
+            self._conn.close()
+
+    def __len__(self):
+        return self._size
+
+
+# --- 응답 캐시 ---
+class ResponseCache:
+    """
+    (카테고리, 정규화된 프롬프트)를 키로 모델 답변을 저장하는 캐시입니다.
+    반복되는 리뷰("최고의 게임이에요!" 등)에 대해 Gemini 호출을 생략하기 위해 사용합니다.
+    """
+
+    def __init__(self, max_size: int = 1000, ttl_seconds: float = 86400, sqlite_path: str | None = None):
+        self.enabled = max_size > 0
+        self.volatile_fields = _load_volatile_fields()
+        # 캐시를 끈 경우에는 SQLite 파일을 만들지 않습니다.
+        if sqlite_path and self.enabled:
+            self.backend = SqliteCacheBackend(sqlite_path, max_size, ttl_seconds)
+        else:
+            self.backend = MemoryCacheBackend(max_size, ttl_seconds)
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    def key_for(self, category: str | None, prompt: str) -> str:
+        return make_cache_key(category, prompt, self.volatile_fields)
+
+    def get(self, category: str | None, prompt: str) -> str | None:
+        if not self.enabled:
+            return None
+        return self._count(self.backend.get(self.key_for(category, prompt)))
+
+    def _count(self, value: str | None) -> str | None:
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, category: str | None, prompt: str, reply: str):
+        if self.enabled:
+            self.backend.set(self.key_for(category, prompt), reply)
+
+    async def get_async(self, category: str | None, prompt: str) -> str | None:
+        """get과 같지만, SQLite 저장소는 이벤트 루프를 막지 않도록 별도 스레드에서 조회합니다."""
+        if not self.enabled or not self.backend.blocking:
+            return self.get(category, prompt)
+        return self._count(await asyncio.to_thread(self.backend.get, self.key_for(category, prompt)))
+
+    async def set_async(self, category: str | None, prompt: str, reply: str):
+        """set과 같지만, SQLite 저장소는 이벤트 루프를 막지 않도록 별도 스레드에서 저장합니다."""
+        if not self.enabled or not self.backend.blocking:
+            self.set(category, prompt, reply)
+        else:
+            await asyncio.to_thread(self.backend.set, self.key_for(category, prompt), reply)
+
+    def close(self):
+        self.backend.close()
+
+    def record_bypass(self):
+        self.bypasses += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "backend": "sqlite" if isinstance(self.backend, SqliteCacheBackend) else "memory",
+            "size": len(self.backend),
+            "max_size": self.backend.max_size,
+            "ttl_seconds": self.backend.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+def create_response_cache_from_env() -> ResponseCache:
+    """환경 변수 설정으로 응답 캐시를 생성합니다. RESPONSE_CACHE_SIZE=0이면 캐시를 끕니다."""
+    return ResponseCache(
+        max_size=int(os.getenv("RESPONSE_CACHE_SIZE", "1000")),
+        ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "86400")),
+        sqlite_path=os.getenv("RESPONSE_CACHE_SQLITE_PATH") or None,
+    )
@@ -1,36 +1,34 @@
-import os
-import google.generativeai as genai
+import asyncio
+from model_backend import ModelBackend, create_backend_from_env
+from prompts import get_system_prompt
 
-def generate_response(system_prompt: str, user_prompt: str) -> str:
-    """Gemini 모델로부터 답변을 생성합니다."""
-    
-    # Gemini 모델 설정 (시스템 프롬프트 포함)
-    model = genai.GenerativeModel(
-        model_name="gemini-2.0-flash-lite",
-        system_instruction=system_prompt
-    )
+def generate_response(backend: ModelBackend, category: str, user_prompt: str) -> str:
+    """모델 백엔드로부터 답변을 생성합니다. 시스템 프롬프트는 카테고리로 결정됩니다."""
     
     # 모델에 프롬프트 전송 및 응답 생성
-    response = model.generate_content(user_prompt)
+    result = asyncio.run(backend.generate(category, user_prompt))
     
-    return response.text
+    return result.text
 
 if __name__ == '__main__':
-    # --- API 키 설정 ---
-    # GOOGLE_API_KEY라는 이름의 환경 변수를 설정해야 합니다.
+    # --- 백엔드 설정 ---
+    # 기본(gemini) 백엔드는 GOOGLE_API_KEY라는 이름의 환경 변수를 설정해야 합니다.
     # 예: export GOOGLE_API_KEY='당신의 API 키'
-    API_KEY = os.getenv("GOOGLE_API_KEY")
-    if not API_KEY:
-        print("오류: GOOGLE_API_KEY 환경 변수가 설정되지 않았습니다.")
-        print("테스트를 실행하기 전에 'export GOOGLE_API_KEY="<YOUR_API_KEY>"' 명령을 실행하세요.")
-    else:
-        genai.configure(api_key=API_KEY)
+    # MODEL_BACKEND=fake로 실행하면 API 키 없이 가짜 백엔드로 동작을 확인할 수 있습니다.
+    try:
+        backend = create_backend_from_env()
+    except ValueError as e:
+        backend = None
+        print(f"오류: {e}")
+        print("테스트를 실행하기 전에 'export GOOGLE_API_KEY=\"<YOUR_API_KEY>\"' 명령을 실행하세요.")
 
+    if backend is not None:
         # --- 테스트용 프롬프트 설정 ---
         
-        # 시스템 프롬프트 (모델의 역할을 정의)
-        # api_server.py의 SYSTEM_PROMPTS 딕셔너리에서 가져온 예시입니다.
-        test_system_prompt = "당신은 커뮤니케이션 매니저입니다. 사용자가 5점 만점의 긍정적인 리뷰를 남겼습니다. 진심 어린 감사를 표현하고, 게임을 계속 즐겨달라는 따뜻한 답변을 작성해주세요."
+        # 카테고리 (모델의 역할을 정의하는 시스템 프롬프트를 결정)
+        # prompts.py의 SYSTEM_PROMPTS 딕셔너리 키 중 하나입니다.
+        test_category = "review_5_star"
+        test_system_prompt = get_system_prompt(test_category)
 
         # 사용자 프롬프트 (실제 사용자의 입력)
         test_user_prompt = """
@@ -50,7 +48,7 @@ Review Text: 모험 좋아하는 사람으로서 최고의 게임이에요! 근
             print("\n--- 사용자 프롬프트 ---")
             print(test_user_prompt)
             
-            generated_text = generate_response(test_system_prompt, test_user_prompt)
+            generated_text = generate_response(backend, test_category, test_user_prompt)
             
             print("\n--- 모델 생성 답변 ---")
             print(generated_text)
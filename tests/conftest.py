@@ -0,0 +1,7 @@
+import os
+import sys
+
+# 서버 모듈(프로젝트 루트)과 데이터 스크립트(data/scripts)를 테스트에서 바로 import할 수 있도록 경로에 추가합니다.
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'data', 'scripts'))
@@ -0,0 +1,64 @@
+import pytest
+
+from anonymizer import anonymize_text, find_pii
+
+
+@pytest.mark.parametrize('text, expected', [
+    # 한글 등 유니코드 주소와 점 없는 호스트도 이메일로 처리합니다.
+    ('홍길동@회사.com 으로 연락 주세요', '[email_address] 으로 연락 주세요'),
+    ('메일: user@localhost', '메일: [email_address]'),
+    ('cs.user_01@example.co.kr', '[email_address]'),
+    # 문장 끝의 마침표는 주소에 포함하지 않습니다.
+    ('mail john.doe@example.com.', 'mail [email_address].'),
+])
+def test_email_addresses(text, expected):
+    assert anonymize_text(text) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('https://example.com/a@b?x=1 참고', '[url] 참고'),
+    ('주문 번호 GPA.3371-2201-4478-91234..0', '주문 번호 [order_id]'),
+    ('010-2345-6789로 연락', '[phone_number]로 연락'),
+    ('+82 10 2345 6789', '[phone_number]'),
+    ('02-123-4567', '[phone_number]'),
+    ('UID: 81234567', 'UID: [uid]'),
+    ('회원번호 ABC123456', '회원번호 [uid]'),
+])
+def test_other_pii(text, expected):
+    assert anonymize_text(text) == expected
+
+
+@pytest.mark.parametrize('text, expected', [
+    # 한글 리뷰에서는 개인정보가 띄어쓰기 없이 한글에 바로 붙어 옵니다.
+    ('사이트https://evil.com/abc 참고', '사이트[url] 참고'),
+    ('..https://x.com', '..[url]'),
+    ('연락처는010-1234-5678', '연락처는[phone_number]'),
+    ('번호는+82 10 2345 6789입니다', '번호는[phone_number]입니다'),
+    ('메일은user@example.com 으로', '메일은[email_address] 으로'),
+    ('주문번호GPA.3371-2201-4478-91234 확인', '주문번호[order_id] 확인'),
+    ('문의: 홍길동@회사.com', '문의: [email_address]'),
+])
+def test_pii_attached_to_hangul(text, expected):
+    assert anonymize_text(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    '버전 1.2.3에서 렉이 심해요',
+    'abc010-2345-6789',       # 영문/숫자 토큰 중간은 건드리지 않음
+    'UID: 123',               # 너무 짧은 값
+    'QmFzZTY0RW5jb2RlZERhdGE' * 20,
+])
+def test_leaves_non_pii(text):
+    assert anonymize_text(text) == text
+
+
+def test_non_string_returns_empty():
+    assert anonymize_text(None) == ""
+    assert anonymize_text(float('nan')) == ""
+
+
+def test_find_pii_reports_kinds():
+    assert find_pii('홍길동@회사.com, 010-2345-6789') == [
+        ('email_address', '홍길동@회사.com'),
+        ('phone_number', '010-2345-6789'),
+    ]
@@ -0,0 +1,181 @@
+import asyncio
+import json
+import os
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+# api_server는 import할 때 환경 변수로 구성되므로, 네트워크 없는 가짜 백엔드를 쓰고 분류기/few-shot 색인은 끕니다.
+os.environ.update(MODEL_BACKEND="fake", CATEGORY_CLASSIFIER_PATH="", FEW_SHOT_TOP_K="0")
+
+import api_server  # noqa: E402
+from response_cache import ResponseCache  # noqa: E402
+from upstream_scheduler import PriorityRateLimiter, PrioritySemaphore, UpstreamScheduler  # noqa: E402
+
+PROMPT = "Author: 홍길동\nStar Rating: 5\nReview Text: 최고의 게임이에요!"
+CATEGORY = "review_5_star"
+
+
+@pytest.fixture
+def server(monkeypatch):
+    """요청마다 지연 시간을 바꿀 수 있는 가짜 백엔드, 빈 캐시, 동시성 슬롯 1개로 서버를 준비합니다."""
+    backend = api_server.model_backend
+    monkeypatch.setattr(backend, "latency_ms", 0.0)
+    monkeypatch.setattr(backend, "latency_distribution", "fixed")
+    monkeypatch.setattr(backend, "token_delay_ms", 0.0)
+    monkeypatch.setattr(backend, "error_rate", 0.0)
+    monkeypatch.setattr(backend, "calls", 0)
+    monkeypatch.setattr(api_server, "response_cache", ResponseCache(max_size=100))
+    scheduler = UpstreamScheduler(PriorityRateLimiter(0, 10), backend.is_retryable,
+                                  concurrency=PrioritySemaphore(1), max_retries=0)
+    monkeypatch.setattr(api_server, "upstream_scheduler", scheduler)
+    monkeypatch.setattr(api_server, "REQUEST_TIMEOUT_SECONDS", 5.0)
+    monkeypatch.setattr(api_server, "DISCONNECT_POLL_INTERVAL_SECONDS", 0.01)
+    return backend, scheduler
+
+
+@pytest.fixture
+def client(server):
+    return TestClient(api_server.app)
+
+
+def test_generate_response_returns_reply(server, client):
+    response = client.post("/generate-response", json={"prompt": PROMPT, "category": CATEGORY})
+    assert response.status_code == 200
+    assert response.json()["reply"]
+
+
+def test_generate_response_times_out_with_504_and_releases_slot(server, client, monkeypatch):
+    backend, scheduler = server
+    monkeypatch.setattr(backend, "latency_ms", 500.0)
+    monkeypatch.setattr(api_server, "REQUEST_TIMEOUT_SECONDS", 0.05)
+    response = client.post("/generate-response", json={"prompt": PROMPT, "category": CATEGORY})
+    assert response.status_code == 504
+    assert scheduler.concurrency.stats() == {"limit": 1, "available": 1, "waiting": 0}
+
+    # 슬롯이 하나뿐이므로, 취소된 호출이 슬롯을 돌려주지 않았다면 다음 요청도 시간 초과가 납니다.
+    monkeypatch.setattr(backend, "latency_ms", 0.0)
+    response = client.post("/generate-response", json={"prompt": PROMPT, "category": CATEGORY, "cache": "bypass"})
+    assert response.status_code == 200
+
+
+class DisconnectedRequest:
+    """연결이 이미 끊긴 클라이언트를 흉내 냅니다."""
+
+    async def is_disconnected(self):
+        return True
+
+
+def test_generate_response_cancels_on_disconnect_with_499(server, monkeypatch):
+    backend, scheduler = server
+    monkeypatch.setattr(backend, "latency_ms", 5000.0)
+    request = api_server.GenerateRequest(prompt=PROMPT, category=CATEGORY)
+
+    async def scenario():
+        with pytest.raises(HTTPException) as error:
+            await api_server.generate_response(request, DisconnectedRequest())
+        # 취소된 모델 호출이 정리될 때까지 한 번 양보합니다.
+        await asyncio.sleep(0)
+        return error.value.status_code
+
+    assert asyncio.run(scenario()) == 499
+    assert backend.calls == 1
+    assert scheduler.concurrency.stats() == {"limit": 1, "available": 1, "waiting": 0}
+    assert api_server.response_cache.get(CATEGORY, PROMPT) is None
+
+
+def read_sse(response):
+    """SSE 응답을 (이벤트, 데이터) 목록으로 바꿉니다."""
+    events = []
+    for message in response.text.strip().split("\n\n"):
+        event, data = message.split("\n")
+        events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+    return events
+
+
+def test_stream_sends_chunks_then_done(server, client):
+    response = client.post("/generate-response/stream", json={"prompt": PROMPT, "category": CATEGORY})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    assert response.headers["x-accel-buffering"] == "no"
+    events = read_sse(response)
+    chunks = [data["text"] for event, data in events if event == "chunk"]
+    assert len(chunks) > 1
+    event, done = events[-1]
+    assert event == "done"
+    assert done["reply"] == "".join(chunks)
+    assert done["cached"] is False
+    assert done["usage"]["candidates_token_count"] > 0
+
+
+def test_stream_replays_cache_hit_as_single_chunk(server, client):
+    backend, _ = server
+    first = read_sse(client.post("/generate-response/stream", json={"prompt": PROMPT, "category": CATEGORY}))
+    second = read_sse(client.post("/generate-response/stream", json={"prompt": PROMPT, "category": CATEGORY}))
+    reply = first[-1][1]["reply"]
+    assert second == [("chunk", {"text": reply}), ("done", {"reply": reply, "usage": None, "cached": True})]
+    assert backend.calls == 1
+
+
+def test_stream_sends_error_event_on_timeout(server, client, monkeypatch):
+    backend, scheduler = server
+    monkeypatch.setattr(backend, "token_delay_ms", 200.0)
+    monkeypatch.setattr(api_server, "REQUEST_TIMEOUT_SECONDS", 0.1)
+    events = read_sse(client.post("/generate-response/stream", json={"prompt": PROMPT, "category": CATEGORY}))
+    assert [event for event, _ in events[:-1]] == ["chunk"] * (len(events) - 1)
+    event, data = events[-1]
+    assert event == "error"
+    assert "0.1초" in data["detail"]
+    # 완료되지 않은 답변은 캐시에 저장하지 않고, 슬롯도 돌려줍니다.
+    assert api_server.response_cache.get(CATEGORY, PROMPT) is None
+    assert scheduler.concurrency.stats()["available"] == 1
+
+
+@pytest.fixture
+def batch_backend(server, monkeypatch):
+    """프롬프트에 "느림"이 있으면 늦게, "실패"가 있으면 오류로 끝나는 백엔드입니다. 슬롯은 여러 개로 늘립니다."""
+    backend, scheduler = server
+    monkeypatch.setattr(scheduler, "concurrency", PrioritySemaphore(4))
+    generate = backend.generate
+
+    async def fake_generate(category, prompt):
+        if "느림" in prompt:
+            await asyncio.sleep(0.2)
+        if "실패" in prompt:
+            raise ValueError("잘못된 요청")
+        return await generate(category, prompt)
+
+    monkeypatch.setattr(backend, "generate", fake_generate)
+    return backend
+
+
+def post_batch(client, prompts):
+    response = client.post("/generate-responses", json={"items": [{"prompt": prompt} for prompt in prompts]})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+def test_batch_generates_duplicate_prompts_once(batch_backend, client):
+    prompts = ["Review Text: 좋아요", "Review Text: 렉이 심해요", "Review Text:   좋아요"]
+    lines = post_batch(client, prompts)
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    replies = {line["index"]: line["reply"] for line in lines}
+    assert replies[0] == replies[2]
+    assert all(line["error"] is None for line in lines)
+    assert batch_backend.calls == 2
+
+
+def test_batch_streams_lines_in_completion_order(batch_backend, client):
+    lines = post_batch(client, ["Review Text: 느림 리뷰", "Review Text: 빠른 리뷰", "Review Text: 느림 리뷰"])
+    # 빠른 항목이 먼저 오고, 같은 프롬프트의 항목은 함께 이어서 옵니다.
+    assert [line["index"] for line in lines] == [1, 0, 2]
+    assert lines[1]["reply"] == lines[2]["reply"]
+
+
+def test_batch_reports_item_errors_per_line(batch_backend, client):
+    lines = {line["index"]: line for line in post_batch(client, ["Review Text: 실패", "Review Text: 정상"])}
+    assert lines[0]["reply"] is None
+    assert "잘못된 요청" in lines[0]["error"]
+    assert lines[1]["reply"] and lines[1]["error"] is None
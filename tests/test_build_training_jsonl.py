@@ -0,0 +1,63 @@
+import json
+
+import pandas as pd
+
+from build_training_jsonl import build_training_lines, build_training_jsonl, validation_mask
+
+
+def review_chunk():
+    # 통합 리뷰 CSV를 문자열(dtype=str, 빈 값은 '')로 읽은 형태입니다.
+    return pd.DataFrame({
+        'Author': ['홍길동', '김철수', '이영희'],
+        'Star Rating': ['5', '1', '3'],
+        'Device': ['SM-G991N', '', 'Pixel 8'],
+        'Review Link': ['http://a', 'http://b', 'http://c'],
+        'Review Title': ['', '', ''],
+        'Review Text': ['최고의 게임이에요!', '환불해 주세요 010-2345-6789', '   '],
+        'Developer Reply Text': ['감사합니다!', 'cs@example.com 으로 문의 주세요.', '확인했습니다.'],
+    })
+
+
+def test_build_training_lines_output_is_pinned():
+    lines = build_training_lines(review_chunk()).tolist()
+    # 빈 값은 'nan'이 아니라 빈 문자열로, 숫자는 원본 문자열 그대로 들어갑니다.
+    assert lines == [
+        '{"contents": [{"role": "user", "parts": [{"text": "Author: 홍길동\\nStar Rating: 5\\nDevice: SM-G991N'
+        '\\n\\nReview Text: 최고의 게임이에요!"}]}, {"role": "model", "parts": [{"text": "감사합니다!"}]}]}',
+        '{"contents": [{"role": "user", "parts": [{"text": "Author: 김철수\\nStar Rating: 1\\nDevice: '
+        '\\n\\nReview Text: 환불해 주세요 [phone_number]"}]}, {"role": "model", "parts": [{"text": '
+        '"[email_address] 으로 문의 주세요."}]}]}',
+    ]
+
+
+def test_build_training_lines_matches_json_dumps():
+    line = build_training_lines(review_chunk()).iloc[0]
+    assert line == json.dumps({"contents": [
+        {"role": "user", "parts": [{"text": "Author: 홍길동\nStar Rating: 5\nDevice: SM-G991N\n\nReview Text: 최고의 게임이에요!"}]},
+        {"role": "model", "parts": [{"text": "감사합니다!"}]},
+    ]}, ensure_ascii=False)
+
+
+def test_build_training_lines_without_usable_rows():
+    chunk = review_chunk()
+    chunk['Developer Reply Text'] = ''
+    assert build_training_lines(chunk).empty
+
+
+def test_validation_split_does_not_depend_on_chunking():
+    lines = pd.Series([f'line {i}' for i in range(200)])
+    whole = validation_mask(lines, 0.3, seed=1)
+    parts = pd.concat([validation_mask(lines[:70], 0.3, seed=1), validation_mask(lines[70:], 0.3, seed=1)])
+    assert whole.tolist() == parts.tolist()
+    assert 0 < whole.sum() < 200
+
+
+def test_build_training_jsonl_from_csv(tmp_path):
+    input_path = tmp_path / 'reviews.csv'
+    review_chunk().to_csv(input_path, index=False, encoding='utf-8-sig')
+    output_path = tmp_path / 'training.jsonl'
+    stats = build_training_jsonl(str(input_path), str(output_path), chunksize=2)
+    assert stats['rows_read'] == 3
+    assert stats['train_examples'] == 2
+    written = output_path.read_text(encoding='utf-8').splitlines()
+    assert written == build_training_lines(review_chunk()).tolist()
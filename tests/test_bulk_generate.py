@@ -0,0 +1,111 @@
+import asyncio
+import json
+
+import pandas as pd
+import pytest
+
+import bulk_generate
+from columnar import CSV_ENCODING
+
+REVIEW_COUNT = 30
+# 답변이 이미 있는 리뷰입니다. 대량 생성 대상에서 빠져야 합니다.
+ANSWERED = {3, 17}
+
+
+class Interrupted(BaseException):
+    """실행 중 중단(Ctrl+C 등)을 흉내 냅니다. 작업 안의 except Exception에 잡히지 않습니다."""
+
+
+@pytest.fixture
+def paths(tmp_path, monkeypatch):
+    """가짜 백엔드를 지연 없이 쓰고, 분류기/few-shot 색인은 끈 채로 작은 입력 파일을 준비합니다."""
+    monkeypatch.setenv('MODEL_BACKEND', 'fake')
+    monkeypatch.setenv('FAKE_LATENCY_MS', '0')
+    monkeypatch.setenv('FAKE_LATENCY_DISTRIBUTION', 'fixed')
+    monkeypatch.setenv('FAKE_TOKEN_DELAY_MS', '0')
+    monkeypatch.setenv('CATEGORY_CLASSIFIER_PATH', '')
+    monkeypatch.setenv('FEW_SHOT_TOP_K', '0')
+    input_path = str(tmp_path / 'reviews.csv')
+    pd.DataFrame({
+        'Review Link': [f'https://play.google.com/r/{i}' for i in range(REVIEW_COUNT)],
+        'Star Rating': [str(i % 5 + 1) for i in range(REVIEW_COUNT)],
+        'Review Text': [f'리뷰 {i}번, 게임이 재미있어요' for i in range(REVIEW_COUNT)],
+        'Developer Reply Text': ['감사합니다' if i in ANSWERED else '' for i in range(REVIEW_COUNT)],
+    }).to_csv(input_path, index=False, encoding=CSV_ENCODING)
+    return input_path, str(tmp_path / 'replies.csv')
+
+
+def expected_keys():
+    return {f'https://play.google.com/r/{i}' for i in range(REVIEW_COUNT) if i not in ANSWERED}
+
+
+def run(input_path, output_path, **kwargs):
+    return asyncio.run(bulk_generate.run_bulk(input_path, output_path, concurrency=1, checkpoint_every=5,
+                                              use_cache=False, **kwargs))
+
+
+def interrupt_after(monkeypatch, calls):
+    """calls번째 생성 호출에서 실행을 중단시킵니다."""
+    generate = bulk_generate.BulkGenerator.generate
+    count = [0]
+
+    async def interrupting_generate(self, prompt):
+        count[0] += 1
+        if count[0] == calls:
+            raise Interrupted()
+        return await generate(self, prompt)
+
+    monkeypatch.setattr(bulk_generate.BulkGenerator, 'generate', interrupting_generate)
+
+
+def output_keys(output_path):
+    return pd.read_csv(output_path, encoding=CSV_ENCODING, dtype=str, keep_default_na=False)['Review Link'].tolist()
+
+
+def test_resume_after_interrupt_generates_remaining_rows_once(paths, monkeypatch):
+    input_path, output_path = paths
+    with monkeypatch.context() as patch:
+        interrupt_after(patch, 13)
+        with pytest.raises(Interrupted):
+            run(input_path, output_path)
+    # 중단되어도 그때까지 쓴 12행은 마지막 체크포인트에 포함됩니다.
+    assert len(output_keys(output_path)) == 12
+
+    stats = run(input_path, output_path)
+    assert stats['skipped'] == 12
+    assert stats['generated'] == len(expected_keys()) - 12
+    keys = output_keys(output_path)
+    assert len(keys) == len(set(keys))
+    assert set(keys) == expected_keys()
+
+
+def test_resume_after_crash_discards_rows_past_checkpoint(paths, monkeypatch):
+    input_path, output_path = paths
+    # 강제 종료(kill -9 등)로 마지막 체크포인트를 기록하지 못한 경우를 흉내 내기 위해, 저장한 상태를 모두 남겨 둡니다.
+    saved_states = []
+    save_state = bulk_generate.save_state
+
+    def recording_save_state(state_path, state):
+        saved_states.append(json.loads(json.dumps(state)))
+        save_state(state_path, state)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(bulk_generate, 'save_state', recording_save_state)
+        interrupt_after(patch, 13)
+        with pytest.raises(Interrupted):
+            run(input_path, output_path)
+
+    # 상태 파일을 10행 체크포인트로 되돌리고, 출력 끝에는 쓰다 만 행을 붙입니다.
+    state_path = bulk_generate.state_output_path(output_path)
+    checkpoint = next(state for state in saved_states if state['generated'] == 10)
+    save_state(state_path, checkpoint)
+    with open(output_path, 'ab') as f:
+        f.write('https://play.google.com/r/29,5,"쓰다 만'.encode('utf-8'))
+
+    stats = run(input_path, output_path)
+    assert stats['skipped'] == 10
+    assert stats['generated'] == len(expected_keys()) - 10
+    keys = output_keys(output_path)
+    assert len(keys) == len(set(keys))
+    assert set(keys) == expected_keys()
+    assert bulk_generate.load_state(state_path)['generated'] == len(expected_keys())
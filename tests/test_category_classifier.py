@@ -0,0 +1,101 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from category_classifier import (
+    FEATURE_DIM,
+    STAR_SLOTS,
+    CategoryClassifier,
+    example_features,
+    parse_star_rating,
+)
+from train_category_classifier import label_examples, read_log_file, train_category_classifier
+
+SAMPLES = {
+    'bug_report': ['업데이트 후 게임이 자꾸 튕겨요', '렉이 너무 심하고 화면이 멈춰요', '실행하면 검은 화면만 나와요',
+                   '접속하자마자 오류 코드가 떠요', '스테이지 3에서 계속 튕김'],
+    'billing_inquiry': ['결제했는데 아이템이 안 들어왔어요', '환불 해주세요 결제가 두 번 됐어요',
+                        '패키지 구매했는데 지급이 안 됨', '결제 취소 하고 싶어요', '이중 결제 환불 요청합니다'],
+    'review_5_star': ['최고의 게임이에요', '너무 재밌어요 최고', '재밌게 하고 있어요 최고예요', '갓겜 인정 최고',
+                      '정말 재밌는 게임 최고입니다'],
+}
+
+
+def test_parse_star_rating():
+    assert parse_star_rating("Author: 홍길동\nStar Rating: 4\n\nReview Text: 좋아요") == 4
+    assert parse_star_rating("Star Rating: 7\nReview Text: x") == 0
+    assert parse_star_rating("Review Text: Star Rating: 5") == 0
+    assert parse_star_rating("Review Text: 별점 없음") == 0
+
+
+def test_example_features_are_normalized_with_star_slot():
+    idf = np.ones(FEATURE_DIM, dtype=np.float32)
+    indices, values = example_features("렉이 심해요", 3, idf)
+    assert indices[-1] == FEATURE_DIM + 3 and values[-1] == 1.0
+    assert (indices[:-1] < FEATURE_DIM).all() and np.all(np.diff(indices[:-1]) > 0)
+    assert np.isclose(np.linalg.norm(values[:-1]), 1.0)
+    assert FEATURE_DIM + STAR_SLOTS > indices.max()
+
+
+def test_label_examples_reads_prompts_and_columns():
+    records = [
+        {'category': 'bug_report', 'prompt': 'Star Rating: 1\n\nReview Text: 튕겨요'},
+        {'category': 'review_5_star', 'Review Text': '최고', 'Star Rating': '5.0'},
+        {'category': '', 'Review Text': '레이블 없음'},
+    ]
+    assert list(label_examples(records)) == [('bug_report', '튕겨요', 1), ('review_5_star', '최고', 5)]
+
+
+def test_read_log_file_skips_classifier_choices(tmp_path):
+    path = tmp_path / 'server.log'
+    records = [
+        {'event': 'generation_completed', 'category': 'bug_report', 'category_source': 'request',
+         'prompt': 'Review Text: 튕겨요'},
+        {'event': 'generation_completed', 'category': 'etc', 'category_source': 'classifier',
+         'prompt': 'Review Text: 분류기가 고른 것'},
+        {'event': 'request_started', 'category': 'etc', 'prompt': 'Review Text: 다른 이벤트'},
+    ]
+    path.write_text('\n'.join(json.dumps(r, ensure_ascii=False) for r in records) + '\nnot json\n', encoding='utf-8')
+    assert read_log_file(str(path)) == [('bug_report', '튕겨요', 0)]
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    rows = [{'category': category, 'Review Text': text, 'Star Rating': '5' if category == 'review_5_star' else '1'}
+            for category, texts in SAMPLES.items() for text in texts]
+    labels_path = tmp_path / 'labels.csv'
+    pd.DataFrame(rows).to_csv(labels_path, index=False, encoding='utf-8-sig')
+    output_path = tmp_path / 'category_classifier.npz'
+    stats = train_category_classifier([str(labels_path)], [], str(output_path), dim=2 ** 12,
+                                      validation_fraction=0.0, epochs=60)
+    assert stats['train_accuracy'] == 1.0
+    return str(output_path)
+
+
+def test_classifier_predicts_and_chooses(model_path):
+    # 학습 때와 다른 dim(2**12)으로 저장한 모델도 idf 길이로 차원을 읽습니다.
+    classifier = CategoryClassifier(model_path, min_confidence=0.0)
+    assert classifier.enabled
+    result = classifier.classify("Star Rating: 1\n\nReview Text: 결제했는데 환불 해주세요", top_n=2)
+    assert result['category'] == 'billing_inquiry'
+    assert len(result['scores']) == 2 and next(iter(result['scores'])) == 'billing_inquiry'
+    assert classifier.predict("Star Rating: 5\n\nReview Text: 너무 재밌어요") == 'review_5_star'
+
+    assert classifier.choose('bug_report', "Review Text: 최고") == ('bug_report', 'request')
+    assert classifier.choose('unknown_category', "Star Rating: 1\n\nReview Text: 게임이 튕겨요") == \
+        ('bug_report', 'classifier')
+
+
+def test_low_confidence_falls_back_to_default(model_path):
+    classifier = CategoryClassifier(model_path, min_confidence=0.99)
+    assert classifier.choose(None, "Review Text: ???") == (None, 'default')
+    assert classifier.stats()['selected'] == 0
+
+
+def test_missing_model_is_disabled(tmp_path):
+    classifier = CategoryClassifier(str(tmp_path / 'missing.npz'))
+    assert not classifier.enabled
+    assert classifier.classify("Review Text: 튕겨요") is None
+    assert classifier.choose(None, "Review Text: 튕겨요") == (None, 'default')
@@ -0,0 +1,46 @@
+import pandas as pd
+
+from columnar import CSV_ENCODING, CsvRowWriter, to_text_columns
+
+COLUMNS = ['key', 'text']
+
+
+def read_rows(path):
+    return pd.read_csv(path, encoding=CSV_ENCODING, dtype=str, keep_default_na=False).to_dict('records')
+
+
+def test_csv_row_writer_resumes_from_committed_size(tmp_path):
+    path = str(tmp_path / 'out.csv')
+    writer = CsvRowWriter(path, COLUMNS)
+    writer.write([{'key': '1', 'text': '첫 줄'}])
+    committed = writer.commit()
+    # 체크포인트 이후에 쓴 행은 중단되면 버려집니다.
+    writer.write([{'key': '2', 'text': '중단 전, 체크포인트 전'}])
+    writer.close()
+
+    writer = CsvRowWriter(path, COLUMNS, committed_size=committed['size'])
+    writer.write([{'key': '3', 'text': '여러 줄\n"따옴표"'}])
+    writer.close()
+    assert read_rows(path) == [{'key': '1', 'text': '첫 줄'}, {'key': '3', 'text': '여러 줄\n"따옴표"'}]
+
+
+def test_csv_row_writer_starts_over_without_state(tmp_path):
+    path = tmp_path / 'out.csv'
+    path.write_text('old,file\n1,2\n')
+    writer = CsvRowWriter(str(path), COLUMNS)
+    writer.write([{'key': '1'}])
+    writer.close()
+    assert read_rows(str(path)) == [{'key': '1', 'text': ''}]
+    assert path.read_bytes().startswith(b'\xef\xbb\xbf')
+
+
+def test_to_text_columns_restores_csv_format():
+    df = pd.DataFrame({
+        'Star Rating': pd.array([5, None], dtype='Int64'),
+        'Review Submit Date and Time': pd.to_datetime(['2025-07-13T10:00:00Z', None], utc=True),
+        'Author': ['홍길동', None],
+    })
+    assert to_text_columns(df).to_dict('records') == [
+        {'Star Rating': '5', 'Review Submit Date and Time': '2025-07-13T10:00:00Z', 'Author': '홍길동'},
+        {'Star Rating': '', 'Review Submit Date and Time': '', 'Author': ''},
+    ]
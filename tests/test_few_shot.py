@@ -0,0 +1,68 @@
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from build_reply_index import build_reply_index
+from few_shot import FewShotIndex, embed_text, normalize_text, review_text_from_prompt
+from prompts import FEW_SHOT_SEPARATOR
+
+
+def test_normalize_text():
+    assert normalize_text("  환불\t요청   Order 12345 ") == "환불 요청 order 0"
+    # NFD로 분해된 한글도 같은 텍스트가 됩니다.
+    assert normalize_text(unicodedata.normalize("NFD", "한글")) == "한글"
+
+
+def test_embed_text_is_deterministic_unit_vector():
+    vector = embed_text("업데이트 후 로그인이 안 돼요")
+    assert vector.dtype == np.float32 and vector.shape == (512,)
+    assert np.isclose(np.linalg.norm(vector), 1.0)
+    assert np.array_equal(vector, embed_text("업데이트 후  로그인이 안 돼요"))
+    assert not embed_text("").any()
+
+
+def test_similar_reviews_score_higher():
+    query = embed_text("업데이트 후 로그인이 안 돼요")
+    similar = embed_text("업데이트하고 나서 로그인이 안 됩니다")
+    unrelated = embed_text("캐릭터 디자인이 너무 귀여워요")
+    assert query @ similar > query @ unrelated
+
+
+def test_review_text_from_prompt():
+    assert review_text_from_prompt("Author: 홍길동\n\nReview Text: 렉이 심해요") == "렉이 심해요"
+    assert review_text_from_prompt("렉이 심해요") == "렉이 심해요"
+
+
+def test_index_search_and_augment(tmp_path):
+    input_path = tmp_path / 'reviews.csv'
+    pd.DataFrame({
+        'Review Link': ['r1', 'r2', 'r3', 'r4'],
+        'Star Rating': ['1', '5', '2', '3'],
+        'Review Text': ['업데이트 후 로그인이 안 돼요', '캐릭터가 너무 귀여워요', '결제했는데 아이템이 안 들어왔어요', '답변 없음'],
+        'Developer Reply Text': ['로그인 문제를 확인 중입니다. 010-2345-6789', '감사합니다!', '결제 내역을 보내 주세요.', ''],
+    }).to_csv(input_path, index=False, encoding='utf-8-sig')
+    index_dir = tmp_path / 'reply_index'
+    stats = build_reply_index(str(input_path), str(index_dir))
+    assert stats['examples'] == 3 and stats['embedded'] == 3
+
+    index = FewShotIndex(str(index_dir), top_k=1, min_score=0.2)
+    assert index.enabled
+    (score, example), = index.search("업데이트하고 나서 로그인이 안 됩니다")
+    assert example['key'] == 'r1' and score > 0.2
+    # 예시는 비식별화한 답변입니다.
+    assert example['reply'] == '로그인 문제를 확인 중입니다. [phone_number]'
+
+    prompt = "Star Rating: 1\n\nReview Text: 업데이트하고 나서 로그인이 안 됩니다"
+    augmented = index.augment(prompt)
+    assert augmented.endswith(FEW_SHOT_SEPARATOR + prompt)
+    assert '로그인 문제를 확인 중입니다.' in augmented
+    # 비슷한 예시가 없으면 프롬프트를 그대로 보냅니다.
+    assert index.augment("Review Text: zzzz qqqq") == "Review Text: zzzz qqqq"
+    assert index.stats()['injected'] == 1
+
+
+def test_missing_index_is_disabled(tmp_path):
+    index = FewShotIndex(str(tmp_path / 'missing'))
+    assert not index.enabled
+    assert index.augment("Review Text: 렉") == "Review Text: 렉"
@@ -0,0 +1,101 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import integrate_data
+from columnar import KeyCounts, read_processed, to_text_columns
+from pipeline_manifest import Manifest
+
+COLUMNS = ['Review Link', 'Star Rating', 'Review Text']
+
+
+def test_key_counts_keeps_last_occurrence_across_chunks():
+    chunks = [['a', '', 'b', 'a'], ['c', 'a', 'b', ''], ['b', 'd']]
+    counts = KeyCounts()
+    for chunk in chunks:
+        counts.add(chunk)
+    assert len(counts) == 4
+    masks = [counts.keep_last_mask(chunk).tolist() for chunk in chunks]
+    assert masks == [[False, True, False, False], [True, True, False, True], [True, True]]
+    assert counts.contains(['a', 'x', '']).tolist() == [True, False, False]
+
+
+def test_key_counts_matches_drop_duplicates_on_random_links():
+    rng = np.random.default_rng(0)
+    links = np.array([f'https://play.google.com/r/{i}' if i else '' for i in rng.integers(0, 5_000, 200_000)],
+                     dtype=object)
+    counts = KeyCounts()
+    for start in range(0, len(links), 7_000):
+        counts.add(links[start:start + 7_000])
+    mask = np.concatenate([counts.keep_last_mask(links[start:start + 7_000])
+                           for start in range(0, len(links), 7_000)])
+    expected = ~pd.Series(links).duplicated(keep='last') | (links == '')
+    assert mask.tolist() == expected.tolist()
+
+
+def write_export(path, rows):
+    pd.DataFrame(rows, columns=COLUMNS).to_csv(path, index=False, encoding='utf-16')
+
+
+@pytest.fixture
+def review_dirs(tmp_path, monkeypatch):
+    input_dir = tmp_path / 'google_play'
+    input_dir.mkdir()
+    monkeypatch.setattr(integrate_data, 'output_filepath', str(tmp_path / 'integrated.parquet'))
+    return input_dir, str(tmp_path / 'manifest.json')
+
+
+def integrated_rows():
+    df = to_text_columns(read_processed(integrate_data.output_filepath))
+    return df[COLUMNS].values.tolist()
+
+
+def test_integrate_keeps_last_version_of_each_review(review_dirs):
+    input_dir, manifest_path = review_dirs
+    write_export(input_dir / '202401.csv', [['r1', '1', '렉'], ['', '3', '링크 없음'], ['r2', '5', '좋아요']])
+    write_export(input_dir / '202402.csv', [['r1', '2', '렉 (수정)'], ['r3', '4', '괜찮아요'], ['', '3', '링크 없음']])
+    files = sorted(str(path) for path in input_dir.glob('*.csv'))
+
+    manifest = Manifest.load(manifest_path, str(input_dir))
+    assert integrate_data.integrate_full(files, manifest, chunksize=2) == (2, 5)
+    assert integrated_rows() == [
+        ['', '3', '링크 없음'], ['r2', '5', '좋아요'], ['r1', '2', '렉 (수정)'], ['r3', '4', '괜찮아요'], ['', '3', '링크 없음'],
+    ]
+
+    # 새 파일의 리뷰가 기존 행을 대체합니다.
+    write_export(input_dir / '202403.csv', [['r2', '1', '업데이트 후 별로'], ['r4', '5', '신규']])
+    files = sorted(str(path) for path in input_dir.glob('*.csv'))
+    manifest = Manifest.load(manifest_path, str(input_dir))
+    assert integrate_data.integrate_incremental(files, manifest, COLUMNS, chunksize=2) == (1, 2)
+    assert integrated_rows() == [
+        ['', '3', '링크 없음'], ['r1', '2', '렉 (수정)'], ['r3', '4', '괜찮아요'], ['', '3', '링크 없음'],
+        ['r2', '1', '업데이트 후 별로'], ['r4', '5', '신규'],
+    ]
+
+
+def test_full_rebuild_aborts_on_truncated_input(review_dirs, monkeypatch):
+    input_dir, manifest_path = review_dirs
+    write_export(input_dir / '202401.csv', [['r1', '1', '렉'], ['r2', '5', '좋아요']])
+    files = [str(input_dir / '202401.csv')]
+    assert integrate_data.integrate_full(files, Manifest.load(manifest_path, str(input_dir)), chunksize=2) == (1, 2)
+    before = integrated_rows()
+
+    # 다음 파일에는 r1의 새 버전이 있지만, 링크를 센 뒤 행을 쓰는 동안에는 파일이 중간에 잘려 있습니다. (동기화 중 등)
+    # 읽은 부분까지만 쓰고 계속하면 r1의 이전 버전이 빠진 채 새 버전도 쓰이지 않으므로, 전체 재생성을 취소합니다.
+    truncated = input_dir / '202402.csv'
+    write_export(truncated, [[f'r{i}', '4', '괜찮아요 ' * 20] for i in range(3, 5000)] + [['r1', '2', '렉 (수정)']])
+    count_review_links = integrate_data.count_review_links
+
+    def count_then_truncate(headers, chunksize):
+        counts = count_review_links(headers, chunksize)
+        data = truncated.read_bytes()
+        truncated.write_bytes(data[:len(data) * 3 // 4 | 1])
+        return counts
+
+    monkeypatch.setattr(integrate_data, 'count_review_links', count_then_truncate)
+    files = sorted(str(path) for path in input_dir.glob('*.csv'))
+    with pytest.raises(UnicodeDecodeError):
+        integrate_data.integrate_full(files, Manifest.load(manifest_path, str(input_dir)), chunksize=100)
+    assert integrated_rows() == before
+    assert not (input_dir.parent / 'integrated.parquet.tmp').exists()
+    assert Manifest.load(manifest_path, str(input_dir)).files.keys() == {'202401.csv'}
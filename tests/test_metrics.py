@@ -0,0 +1,35 @@
+from metrics import Counter, Gauge, Histogram
+
+
+def test_function_counter_is_exported_as_counter():
+    hits = {"value": 0}
+    counter = Counter("cs_ai_test_cache_hits_total", "적중 수")
+    counter.set_function(lambda: hits["value"])
+    hits["value"] = 3
+    assert counter.header() == ["# HELP cs_ai_test_cache_hits_total 적중 수",
+                                "# TYPE cs_ai_test_cache_hits_total counter"]
+    assert counter.collect() == ["cs_ai_test_cache_hits_total 3"]
+
+
+def test_labelled_counter_and_gauge():
+    counter = Counter("cs_ai_test_requests_total", "요청 수", ("endpoint",))
+    counter.inc(endpoint="generate-response")
+    counter.inc(2, endpoint="generate-response")
+    assert counter.collect() == ['cs_ai_test_requests_total{endpoint="generate-response"} 3']
+
+    gauge = Gauge("cs_ai_test_ratio", "비율")
+    gauge.set(0.25)
+    assert gauge.collect() == ["cs_ai_test_ratio 0.25"]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("cs_ai_test_seconds", "시간", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value)
+    assert histogram.collect() == [
+        'cs_ai_test_seconds_bucket{le="0.1"} 1',
+        'cs_ai_test_seconds_bucket{le="1"} 2',
+        'cs_ai_test_seconds_bucket{le="+Inf"} 3',
+        'cs_ai_test_seconds_sum 5.55',
+        'cs_ai_test_seconds_count 3',
+    ]
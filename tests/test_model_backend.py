@@ -0,0 +1,17 @@
+import asyncio
+
+from model_backend import GenerationResult, ModelBackend
+
+
+class NonStreamingBackend(ModelBackend):
+    """generate()만 구현한 백엔드입니다."""
+
+    async def generate(self, category, prompt):
+        return GenerationResult(text=f"{category}: {prompt}", usage={"total_token_count": 3})
+
+
+def test_generate_stream_defaults_to_single_chunk_from_generate():
+    async def scenario():
+        return [event async for event in NonStreamingBackend().generate_stream("bug_report", "렉이 심해요")]
+
+    assert asyncio.run(scenario()) == [("text", "bug_report: 렉이 심해요"), ("usage", {"total_token_count": 3})]
@@ -0,0 +1,101 @@
+import pytest
+
+from prompt_compaction import TRUNCATION_MARKER, PromptCompactor, _parse_budgets, strip_quoted_history
+
+GMAIL_REPLY = (
+    "결제가 두 번 되었어요. 확인 부탁드립니다.\n"
+    "\n"
+    "On Mon, Jan 1, 2024 at 10:00 AM Support <cs@example.com> wrote:\n"
+    "> 안녕하세요, 고객센터입니다.\n"
+    "> 문의하신 내용을 확인 중입니다.\n"
+)
+
+
+@pytest.mark.parametrize('text, expected', [
+    (GMAIL_REPLY, "결제가 두 번 되었어요. 확인 부탁드립니다."),
+    ("환불 요청합니다.\n\n2024년 1월 1일 (월) 오전 10:00, 고객센터님이 작성:\n> 안녕하세요", "환불 요청합니다."),
+    ("확인 부탁드려요.\n-----Original Message-----\nFrom: cs@example.com\n본문", "확인 부탁드려요."),
+    ("확인 부탁드려요.\nFrom: 고객센터\nSent: Monday, January 1, 2024\n본문", "확인 부탁드려요."),
+    # 답장 사이사이 인용한 줄도 머리글이 있으면 뺍니다.
+    ("> 결제 내역을 보내 주세요.\n여기 있습니다.\n\nOn Mon wrote:\n> 이전 메일", "여기 있습니다."),
+    ("로그인이 안 돼요.\n\n-- \n홍길동 드림\n010-0000-0000", "로그인이 안 돼요."),
+    ("로그인이 안 돼요.\n\niPhone에서 보냄", "로그인이 안 돼요."),
+])
+def test_strip_quoted_history(text, expected):
+    assert strip_quoted_history(text) == expected
+
+
+@pytest.mark.parametrize('text', [
+    # 인용 머리글이 없는 리뷰의 ">" 줄(이모티콘, 화살표, 인용처럼 쓴 문장)은 리뷰 내용입니다.
+    ">_< 업데이트 후에 자꾸 튕겨요",
+    "로그인\n> 설정\n> 계정 순서로 눌러도 안 돼요",
+    "10레벨 -> 11레벨 보상이 없어요\n>.<",
+])
+def test_keeps_review_lines_without_quote_header(text):
+    assert strip_quoted_history(text) == text
+
+
+def test_emoticon_lines_survive_in_email_reply():
+    text = ">_< 아직도 안 돼요\n\nOn Mon, Jan 1, 2024 Support wrote:\n> 재설치해 보세요"
+    assert strip_quoted_history(text) == ">_< 아직도 안 돼요"
+
+
+PROMPT = (
+    "Package Name: https://mail.google.com/mail/u/0/#inbox/abc\n"
+    "Author: 홍길동\n"
+    "Review Submit Date and Time: 2024년 1월 1일\n"
+    "Star Rating: 0\n"
+    "Review Text: " + GMAIL_REPLY
+)
+
+STORE_REVIEW = (
+    "Package Name: com.example.game\n"
+    "Author: 홍길동\n"
+    "Star Rating: 1\n"
+    "Device: SM-G991N\n"
+    "Review Title: 환불해 주세요\n"
+    "Review Link: https://play.google.com/store/apps/details?id=com.example.game&reviewId=1\n"
+    "Review Text: 업데이트 후 튕겨요\n--\n> 설정 > 계정에서도 안 돼요"
+)
+
+
+def test_compact_drops_metadata_and_quotes_from_email():
+    result = PromptCompactor().compact("bug_report", PROMPT)
+    assert result.prompt == "Author: 홍길동\nStar Rating: 0\nReview Text: 결제가 두 번 되었어요. 확인 부탁드립니다."
+    assert result.tokens_after < result.tokens_before
+    assert result.truncated is False
+
+
+def test_compact_keeps_device_title_and_store_review_body():
+    # 기기와 리뷰 제목은 남기고, 스토어 리뷰 본문에는 서명/인용 제거를 하지 않습니다.
+    result = PromptCompactor().compact("bug_report", STORE_REVIEW)
+    assert result.prompt == (
+        "Author: 홍길동\n"
+        "Star Rating: 1\n"
+        "Device: SM-G991N\n"
+        "Review Title: 환불해 주세요\n"
+        "Review Text: 업데이트 후 튕겨요\n--\n> 설정 > 계정에서도 안 돼요"
+    )
+
+
+def test_compact_truncates_body_to_budget():
+    compactor = PromptCompactor(token_budget=40)
+    result = compactor.compact(None, "Author: 홍길동\nReview Text: " + "아주 긴 리뷰입니다. " * 50)
+    assert result.truncated
+    assert result.prompt.startswith("Author: 홍길동\nReview Text: 아주 긴 리뷰입니다.")
+    assert result.prompt.endswith(TRUNCATION_MARKER)
+    assert result.tokens_after <= 40
+    assert compactor.stats()["truncated"] == 1
+
+
+def test_category_budget_and_disabled_compactor():
+    compactor = PromptCompactor(token_budget=10, category_budgets=_parse_budgets("bug_report=0, review_5_star=5"))
+    assert compactor.budget_for("bug_report") == 0
+    assert compactor.budget_for("review_5_star") == 5
+    assert compactor.budget_for(None) == 10
+    assert PromptCompactor(enabled=False).compact(None, PROMPT).prompt == PROMPT
+
+
+def test_prompt_without_review_text_is_all_body():
+    result = PromptCompactor().compact(None, GMAIL_REPLY)
+    assert result.prompt == "결제가 두 번 되었어요. 확인 부탁드립니다."
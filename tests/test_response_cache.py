@@ -0,0 +1,115 @@
+import asyncio
+import unicodedata
+
+from response_cache import (
+    MemoryCacheBackend,
+    ResponseCache,
+    SqliteCacheBackend,
+    make_cache_key,
+    normalize_prompt,
+)
+
+PROMPT = (
+    "Author: 홍길동\n"
+    "Star Rating: 5\n"
+    "Device: SM-G991N\n"
+    "Review Submit Date and Time: 2024-01-01T00:00:00Z\n"
+    "Review Text: 최고의 게임이에요!"
+)
+
+
+def test_normalize_prompt_drops_volatile_fields_and_whitespace():
+    assert normalize_prompt(PROMPT) == "Author: 홍길동\nStar Rating: 5\nDevice: SM-G991N\nReview Text: 최고의 게임이에요!"
+    assert normalize_prompt("Review Text:　최고의   게임\t이에요! \n\n") == "Review Text: 최고의 게임 이에요!"
+
+
+def test_normalize_prompt_unifies_unicode():
+    decomposed = unicodedata.normalize("NFD", "Review Text: 한글")
+    assert decomposed != "Review Text: 한글"
+    assert normalize_prompt(decomposed) == "Review Text: 한글"
+
+
+def test_cache_key_ignores_volatile_fields():
+    other_date = PROMPT.replace("2024-01-01", "2024-02-02")
+    assert make_cache_key("review_5_star", PROMPT) == make_cache_key("review_5_star", other_date)
+
+
+def test_cache_key_keeps_device():
+    # 기기만 다른 버그 신고는 답변이 다를 수 있으므로 같은 키로 묶지 않습니다.
+    other_device = PROMPT.replace("SM-G991N", "Pixel 8")
+    assert make_cache_key("bug_report", PROMPT) != make_cache_key("bug_report", other_device)
+    assert make_cache_key("bug_report", PROMPT, ()) != make_cache_key("bug_report", other_device, ())
+    ignored = ("Device", "Review Submit Date and Time")
+    assert make_cache_key("bug_report", PROMPT, ignored) == make_cache_key("bug_report", other_device, ignored)
+
+
+def test_cache_key_depends_on_category_and_text():
+    key = make_cache_key("review_5_star", PROMPT)
+    assert key != make_cache_key(None, PROMPT)
+    assert key != make_cache_key("review_5_star", PROMPT.replace("최고의", "최악의"))
+    assert make_cache_key(None, PROMPT) == make_cache_key("", PROMPT)
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryCacheBackend(max_size=2, ttl_seconds=60)
+    backend.set("a", "1")
+    backend.set("b", "2")
+    assert backend.get("a") == "1"
+    backend.set("c", "3")
+    assert backend.get("b") is None
+    assert backend.get("a") == "1" and backend.get("c") == "3"
+
+
+def test_memory_backend_expires_items():
+    backend = MemoryCacheBackend(max_size=2, ttl_seconds=-1)
+    backend.set("a", "1")
+    assert backend.get("a") is None
+    assert len(backend) == 0
+
+
+def test_sqlite_backend_batches_access_times(tmp_path):
+    backend = SqliteCacheBackend(str(tmp_path / "cache.db"), max_size=2, ttl_seconds=60,
+                                 touch_flush_size=100, touch_flush_seconds=3600)
+    backend.set("a", "1")
+    backend.set("b", "2")
+    assert backend.get("a") == "1"
+    # 접근 시각은 모아 두었다가, 항목을 제거하기 전에 반영하므로 최근에 읽은 "a"가 남습니다.
+    assert backend._touched
+    backend.set("c", "3")
+    assert backend.get("b") is None
+    assert backend.get("a") == "1" and backend.get("c") == "3"
+    backend.close()
+
+    reopened = SqliteCacheBackend(str(tmp_path / "cache.db"), max_size=2, ttl_seconds=60)
+    assert len(reopened) == 2
+    assert reopened.get("a") == "1"
+    reopened.close()
+
+
+def test_async_access_counts_hits_and_misses(tmp_path):
+    cache = ResponseCache(max_size=10, ttl_seconds=60, sqlite_path=str(tmp_path / "cache.db"))
+
+    async def scenario():
+        assert await cache.get_async("review_5_star", PROMPT) is None
+        await cache.set_async("review_5_star", PROMPT, "감사합니다!")
+        return await cache.get_async("review_5_star", PROMPT.replace("2024-01-01", "2024-02-02"))
+
+    assert asyncio.run(scenario()) == "감사합니다!"
+    assert (cache.hits, cache.misses) == (1, 1)
+    cache.close()
+
+
+def test_disabled_cache_returns_nothing():
+    cache = ResponseCache(max_size=0)
+    cache.set(None, PROMPT, "reply")
+    assert cache.get(None, PROMPT) is None
+    assert cache.stats()["enabled"] is False
+
+
+def test_disabled_cache_does_not_create_sqlite_file(tmp_path):
+    path = tmp_path / "cache.db"
+    cache = ResponseCache(max_size=0, sqlite_path=str(path))
+    assert cache.get(None, PROMPT) is None
+    assert cache.stats()["backend"] == "memory"
+    cache.close()
+    assert not path.exists()
@@ -0,0 +1,213 @@
+import asyncio
+
+import pytest
+
+from upstream_scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    PrioritySemaphore,
+    PriorityRateLimiter,
+    UpstreamScheduler,
+)
+
+
+class UpstreamError(Exception):
+    def __init__(self, code):
+        super().__init__(code)
+        self.code = code
+
+
+def is_retryable(error):
+    return getattr(error, "code", None) in (429, 500, 503, 504)
+
+
+def make_scheduler(**kwargs):
+    kwargs.setdefault("backoff_base_seconds", 0.0)
+    return UpstreamScheduler(PriorityRateLimiter(rate_per_minute=0, burst=10), is_retryable, **kwargs)
+
+
+def test_priority_semaphore_serves_interactive_before_batch():
+    async def scenario():
+        semaphore = PrioritySemaphore(1)
+        order = []
+
+        async def worker(name, priority):
+            async with semaphore.slot(priority):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        await semaphore.acquire()
+        tasks = [asyncio.ensure_future(worker("batch-1", PRIORITY_BATCH)),
+                 asyncio.ensure_future(worker("batch-2", PRIORITY_BATCH)),
+                 asyncio.ensure_future(worker("interactive", PRIORITY_INTERACTIVE))]
+        await asyncio.sleep(0)
+        assert semaphore.waiting() == 3
+        semaphore.release()
+        await asyncio.gather(*tasks)
+        return order, semaphore.stats()
+
+    order, stats = asyncio.run(scenario())
+    assert order == ["interactive", "batch-1", "batch-2"]
+    assert stats == {"limit": 1, "available": 1, "waiting": 0}
+
+
+def test_priority_semaphore_skips_cancelled_waiters():
+    async def scenario():
+        semaphore = PrioritySemaphore(1)
+        await semaphore.acquire()
+        waiter = asyncio.ensure_future(semaphore.acquire(PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.sleep(0)
+        semaphore.release()
+        return semaphore.stats()
+
+    assert asyncio.run(scenario())["available"] == 1
+
+
+def test_scheduler_orders_calls_by_priority_without_rate_limit():
+    async def scenario():
+        scheduler = make_scheduler(concurrency=PrioritySemaphore(1))
+        started = []
+        gate = asyncio.Event()
+
+        def factory(name):
+            async def attempt():
+                started.append(name)
+                if name == "first":
+                    await gate.wait()
+                return name
+            return attempt
+
+        first = asyncio.ensure_future(scheduler.run(factory("first"), PRIORITY_BATCH))
+        await asyncio.sleep(0)
+        batch = [asyncio.ensure_future(scheduler.run(factory(f"batch-{i}"), PRIORITY_BATCH)) for i in range(3)]
+        await asyncio.sleep(0)
+        interactive = asyncio.ensure_future(scheduler.run(factory("interactive"), PRIORITY_INTERACTIVE))
+        await asyncio.sleep(0)
+        gate.set()
+        await asyncio.gather(first, interactive, *batch)
+        return started
+
+    assert asyncio.run(scenario()) == ["first", "interactive", "batch-0", "batch-1", "batch-2"]
+
+
+@pytest.mark.parametrize("code", [429, 503])
+def test_run_retries_transient_errors(code):
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        if len(calls) < 3:
+            raise UpstreamError(code)
+        return "ok"
+
+    assert asyncio.run(make_scheduler(max_retries=3).run(attempt)) == "ok"
+    assert len(calls) == 3
+
+
+def test_run_does_not_retry_permanent_errors():
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        raise UpstreamError(400)
+
+    with pytest.raises(UpstreamError):
+        asyncio.run(make_scheduler().run(attempt))
+    assert len(calls) == 1
+
+
+def test_run_gives_up_after_max_retries():
+    calls = []
+
+    async def attempt():
+        calls.append(1)
+        raise UpstreamError(503)
+
+    with pytest.raises(UpstreamError):
+        asyncio.run(make_scheduler(max_retries=2).run(attempt))
+    assert len(calls) == 3
+
+
+def test_backoff_is_capped_full_jitter():
+    scheduler = make_scheduler(backoff_base_seconds=0.5, backoff_max_seconds=2.0)
+    for attempt in range(6):
+        delay = scheduler.backoff_seconds(attempt)
+        assert 0 <= delay <= min(2.0, 0.5 * 2 ** attempt)
+
+
+def collect_stream(scheduler, stream_factory):
+    async def scenario():
+        return [event async for event in scheduler.run_stream(stream_factory)]
+    return asyncio.run(scenario())
+
+
+def test_stream_retries_before_first_chunk():
+    calls = []
+
+    async def stream():
+        calls.append(1)
+        if len(calls) == 1:
+            raise UpstreamError(503)
+        yield "chunk", "안녕하세요"
+
+    assert collect_stream(make_scheduler(), stream) == [("chunk", "안녕하세요")]
+    assert len(calls) == 2
+
+
+def test_stream_does_not_retry_after_first_chunk():
+    calls = []
+
+    async def stream():
+        calls.append(1)
+        yield "chunk", "안녕"
+        raise UpstreamError(503)
+
+    with pytest.raises(UpstreamError):
+        collect_stream(make_scheduler(), stream)
+    assert len(calls) == 1
+
+
+def test_hedge_returns_first_successful_result():
+    async def scenario():
+        scheduler = make_scheduler(hedge_enabled=True, hedge_min_delay_seconds=0.01, min_samples_for_hedge=1)
+        calls = []
+        primary_cancelled = asyncio.Event()
+
+        async def attempt():
+            calls.append(1)
+            if len(calls) == 1:
+                return "warm-up"
+            if len(calls) == 2:
+                try:
+                    await asyncio.sleep(5)
+                except asyncio.CancelledError:
+                    primary_cancelled.set()
+                    raise
+                return "primary"
+            return "hedge"
+
+        await scheduler.run(attempt, hedge=True)
+        result = await scheduler.run(attempt, hedge=True)
+        await asyncio.sleep(0)
+        return result, len(calls), primary_cancelled.is_set()
+
+    assert asyncio.run(scenario()) == ("hedge", 3, True)
+
+
+def test_hedge_latency_excludes_slot_wait():
+    async def scenario():
+        concurrency = PrioritySemaphore(1)
+        scheduler = make_scheduler(concurrency=concurrency, min_samples_for_hedge=1, hedge_min_delay_seconds=0)
+
+        async def attempt():
+            return "ok"
+
+        async with concurrency.slot():
+            waiting = asyncio.ensure_future(scheduler.run(attempt))
+            await asyncio.sleep(0.2)
+        await waiting
+        return scheduler.hedge_delay_seconds()
+
+    assert asyncio.run(scenario()) < 0.1
@@ -0,0 +1,80 @@
+import csv
+import json
+
+import pytest
+
+from verify_json import JsonlStats, split_ranges, validate_example, verify_jsonl
+
+
+def example_line(user='Star Rating: 5\n\nReview Text: 좋아요', reply='감사합니다!', **extra):
+    return json.dumps({"contents": [
+        {"role": "user", "parts": [{"text": user}]},
+        {"role": "model", "parts": [{"text": reply}]},
+    ], **extra}, ensure_ascii=False)
+
+
+def test_valid_example_info():
+    reasons, info = validate_example(example_line())
+    assert reasons == []
+    user = 'Star Rating: 5\n\nReview Text: 좋아요'
+    assert info == {'category': 'star_5', 'user_chars': len(user), 'model_chars': len('감사합니다!'),
+                    'tokens': len(user) // 2 + len('감사합니다!') // 2}
+    assert validate_example(example_line(category='bug_report'))[1]['category'] == 'bug_report'
+    assert validate_example(example_line(user='Review Text: 좋아요'))[1]['category'] == 'unknown'
+
+
+@pytest.mark.parametrize('line, kind', [
+    ('', 'empty_line'),
+    ('{"contents": [', 'invalid_json'),
+    ('[]', 'not_object'),
+    ('{"contents": []}', 'no_contents'),
+    (example_line(reply='  '), 'empty_text'),
+    ('{"contents": [{"role": "model", "parts": [{"text": "a"}]}]}', 'role_order'),
+    ('{"contents": [{"role": "user", "parts": [{"text": "a"}]}]}', 'last_role'),
+    ('{"contents": [{"role": "bot", "parts": [{"text": "a"}]}]}', 'invalid_role'),
+    ('{"contents": [{"role": "user", "parts": []}, {"role": "model", "parts": [{"text": "a"}]}]}', 'no_parts'),
+    ('{"contents": [{"role": "user", "parts": [{}]}, {"role": "model", "parts": [{"text": "a"}]}]}', 'missing_text'),
+])
+def test_invalid_examples(line, kind):
+    reasons, info = validate_example(line)
+    assert kind in {reason for reason, _ in reasons}
+    assert info is None
+
+
+def test_length_limits():
+    assert validate_example(example_line(), max_chars=10)[0][0][0] == 'too_many_chars'
+    assert validate_example(example_line(), max_tokens=10)[0][0][0] == 'too_many_tokens'
+
+
+def test_percentiles_use_nearest_rank():
+    stats = JsonlStats()
+    for tokens in (10, 20, 30, 40):
+        stats.add([], {'category': 'star_5', 'user_chars': tokens, 'model_chars': 1, 'tokens': tokens})
+    assert stats.percentiles('tokens') == {50: 20, 90: 40, 99: 40, 100: 40}
+
+
+def test_split_ranges_start_at_line_boundaries(tmp_path):
+    path = tmp_path / 'data.jsonl'
+    path.write_bytes(b''.join(f'{{"n": {i}}}\n'.encode() for i in range(100)))
+    ranges = split_ranges(str(path), 4)
+    data = path.read_bytes()
+    assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start and data[start - 1:start] == b'\n'
+
+
+@pytest.mark.parametrize('workers', [1, 3])
+def test_verify_jsonl_reports_global_line_numbers(tmp_path, workers):
+    lines = [example_line() for _ in range(30)]
+    lines[4] = 'not json'
+    lines[25] = example_line(reply='')
+    path = tmp_path / 'training.jsonl'
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    errors_path = tmp_path / 'errors.csv'
+
+    stats = verify_jsonl(str(path), str(errors_path), workers=workers)
+    assert (stats.lines, stats.valid, stats.invalid) == (30, 28, 2)
+    assert stats.categories == {'star_5': 28}
+    with open(errors_path, encoding='utf-8-sig', newline='') as f:
+        rows = list(csv.reader(f))
+    assert [row[0] for row in rows] == ['line', '5', '26']
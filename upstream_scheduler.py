@@ -0,0 +1,324 @@
+import asyncio
+import contextlib
+import heapq
+import itertools
+import os
+import random
+import time
+from collections import deque
+
+import metrics
+
+# --- 우선순위 ---
+# 숫자가 작을수록 먼저 처리됩니다. 상담원이 기다리는 단건 요청이 배치/백필 요청보다 앞섭니다.
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch"}
+
+RATE_LIMIT_WAIT = metrics.registry.histogram(
+    "cs_ai_rate_limit_wait_seconds", "업스트림 호출 전 레이트 리미터 대기 시간", ("priority",))
+RATE_LIMIT_QUEUE_DEPTH = metrics.registry.gauge(
+    "cs_ai_rate_limit_queue_depth", "레이트 리미터에서 대기 중인 호출 수")
+CONCURRENCY_WAIT = metrics.registry.histogram(
+    "cs_ai_concurrency_wait_seconds", "업스트림 호출 전 동시성 슬롯 대기 시간", ("priority",))
+RETRIES = metrics.registry.counter(
+    "cs_ai_upstream_retries_total", "재시도한 업스트림 호출 수", ("error_type",))
+HEDGES = metrics.registry.counter(
+    "cs_ai_upstream_hedges_total", "헤지(중복) 요청 수", ("outcome",))
+
+
+class PriorityRateLimiter:
+    """
+    우선순위 대기열을 가진 토큰 버킷 레이트 리미터입니다.
+    분당 rate_per_minute개의 토큰이 일정하게 채워지며 최대 burst개까지 쌓입니다.
+    토큰이 없으면 대기열에 들어가고, 토큰이 생기면 우선순위가 높은(숫자가 작은) 호출부터, 같은 우선순위는 도착 순으로 처리합니다.
+    rate_per_minute가 0이면 제한하지 않습니다.
+    """
+
+    def __init__(self, rate_per_minute: float, burst: float):
+        self.rate_per_second = rate_per_minute / 60
+        self.burst = max(1.0, burst)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._dispatcher = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate_per_second > 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate_per_second)
+        self._updated = now
+
+    def try_acquire(self) -> bool:
+        """기다리지 않고 토큰을 얻을 수 있으면 사용하고 True를 반환합니다."""
+        if not self.enabled:
+            return True
+        self._refill()
+        if not self._waiters and self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE):
+        if self.try_acquire():
+            RATE_LIMIT_WAIT.observe(0.0, priority=PRIORITY_NAMES.get(priority, priority))
+            return
+
+        started = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        RATE_LIMIT_QUEUE_DEPTH.set(len(self._waiters))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.ensure_future(self._dispatch())
+        # 기다리던 호출이 취소되면 future도 취소되어, 디스패처가 건너뜁니다.
+        await future
+        RATE_LIMIT_WAIT.observe(time.monotonic() - started, priority=PRIORITY_NAMES.get(priority, priority))
+
+    async def _dispatch(self):
+        while self._waiters:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate_per_second)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            RATE_LIMIT_QUEUE_DEPTH.set(len(self._waiters))
+            if future.done():
+                continue
+            self._tokens -= 1
+            future.set_result(None)
+
+    def stats(self) -> dict:
+        if self.enabled:
+            self._refill()
+        return {
+            "enabled": self.enabled,
+            "rate_per_minute": round(self.rate_per_second * 60, 3),
+            "burst": self.burst,
+            "available_tokens": round(self._tokens, 3),
+            "waiting": len(self._waiters),
+        }
+
+
+class PrioritySemaphore:
+    """
+    우선순위 대기열을 가진 세마포어입니다. 동시에 value개의 호출만 슬롯을 가집니다.
+    슬롯이 비면 우선순위가 높은(숫자가 작은) 호출부터, 같은 우선순위는 도착 순으로 넘겨줍니다.
+    (asyncio.Semaphore는 도착 순이라, 배치 요청이 슬롯을 모두 차지하면 단건 요청이 그 뒤에서 기다림)
+    """
+
+    def __init__(self, value: int):
+        self.value = value
+        self._available = value
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def locked(self) -> bool:
+        """빈 슬롯이 없으면 True입니다."""
+        return self._available <= 0
+
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiters if not future.done())
+
+    async def acquire(self, priority: int = PRIORITY_INTERACTIVE):
+        started = time.monotonic()
+        if self._available > 0:
+            self._available -= 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                # 슬롯을 넘겨받은 직후 취소되었으면 다음 대기자에게 넘깁니다.
+                # (기다리는 중에 취소된 future는 release에서 건너뜀)
+                if future.done() and not future.cancelled():
+                    self.release()
+                raise
+        CONCURRENCY_WAIT.observe(time.monotonic() - started, priority=PRIORITY_NAMES.get(priority, priority))
+
+    def release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._available += 1
+
+    @contextlib.asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE):
+        await self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> dict:
+        return {"limit": self.value, "available": self._available, "waiting": self.waiting()}
+
+
+class UpstreamScheduler:
+    """
+    업스트림 모델 호출을 감싸는 스케줄러입니다.
+
+    - 호출마다 레이트 리미터 토큰을 얻습니다. (쿼터 초과로 인한 429를 미리 막음)
+    - concurrency를 지정하면 토큰을 얻은 뒤 동시성 슬롯도 우선순위 순으로 얻습니다.
+      (레이트 리밋을 끈 경우에도 단건 요청이 배치 요청보다 먼저 처리됨)
+    - is_retryable이 True인 오류(429/503 등)는 지수 백오프 + full jitter로 재시도합니다.
+    - hedge=True인 호출이 최근 지연 시간의 p95를 넘기면, 토큰과 빈 슬롯이 있을 때에 한해 같은 요청을 한 번 더 보내고
+      먼저 성공한 결과를 사용합니다. 지연 시간은 슬롯을 얻은 뒤의 업스트림 호출 시간만 잽니다.
+    """
+
+    def __init__(self, rate_limiter: PriorityRateLimiter, is_retryable, concurrency: PrioritySemaphore | None = None,
+                 max_retries: int = 3,
+                 backoff_base_seconds: float = 0.5, backoff_max_seconds: float = 8.0,
+                 hedge_enabled: bool = False, hedge_min_delay_seconds: float = 1.0,
+                 hedge_quantile: float = 0.95, latency_window: int = 200, min_samples_for_hedge: int = 20):
+        self.rate_limiter = rate_limiter
+        self.is_retryable = is_retryable
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.backoff_base_seconds = backoff_base_seconds
+        self.backoff_max_seconds = backoff_max_seconds
+        self.hedge_enabled = hedge_enabled
+        self.hedge_min_delay_seconds = hedge_min_delay_seconds
+        self.hedge_quantile = hedge_quantile
+        self.min_samples_for_hedge = min_samples_for_hedge
+        self._latencies = deque(maxlen=latency_window)
+
+    def backoff_seconds(self, attempt: int) -> float:
+        """attempt번째(0부터) 재시도 전 대기 시간입니다. (full jitter)"""
+        return random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * 2 ** attempt))
+
+    def hedge_delay_seconds(self) -> float | None:
+        """최근 성공한 호출 지연 시간의 p95입니다. 표본이 부족하면 None(헤지하지 않음)입니다."""
+        if len(self._latencies) < self.min_samples_for_hedge:
+            return None
+        ordered = sorted(self._latencies)
+        quantile = ordered[min(len(ordered) - 1, int(len(ordered) * self.hedge_quantile))]
+        return max(self.hedge_min_delay_seconds, quantile)
+
+    def _slot(self, priority: int):
+        if self.concurrency is None:
+            return contextlib.nullcontext()
+        return self.concurrency.slot(priority)
+
+    async def _attempt(self, attempt_factory, priority: int):
+        """동시성 슬롯을 얻은 뒤 한 번 호출합니다. 슬롯 대기 시간은 지연 시간 표본에 넣지 않습니다."""
+        async with self._slot(priority):
+            started = time.monotonic()
+            result = await attempt_factory()
+            self._latencies.append(time.monotonic() - started)
+            return result
+
+    async def _run_hedged(self, attempt_factory, priority: int):
+        delay = self.hedge_delay_seconds()
+        primary = asyncio.ensure_future(self._attempt(attempt_factory, priority))
+        tasks = {primary}
+        try:
+            if delay is None:
+                return await primary
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            # 슬롯이 모두 차 있으면 헤지가 다른 요청의 자리를 빼앗으므로 보내지 않습니다.
+            slots_full = self.concurrency is not None and self.concurrency.locked()
+            if done or slots_full or not self.rate_limiter.try_acquire():
+                return await primary
+
+            HEDGES.inc(outcome="launched")
+            hedge = asyncio.ensure_future(self._attempt(attempt_factory, priority))
+            tasks.add(hedge)
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            HEDGES.inc(outcome="won")
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def run(self, attempt_factory, priority: int = PRIORITY_INTERACTIVE, hedge: bool = False):
+        """
+        attempt_factory()가 만드는 코루틴을 실행하고 결과를 반환합니다.
+        재시도/헤지 때마다 attempt_factory를 다시 호출하므로, 매번 새 코루틴을 만들어야 합니다.
+        """
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire(priority)
+            try:
+                if hedge and self.hedge_enabled:
+                    return await self._run_hedged(attempt_factory, priority)
+                return await self._attempt(attempt_factory, priority)
+            except Exception as e:
+                if attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+                RETRIES.inc(error_type=type(e).__name__)
+                await asyncio.sleep(self.backoff_seconds(attempt))
+                attempt += 1
+
+    async def run_stream(self, stream_factory, priority: int = PRIORITY_INTERACTIVE):
+        """
+        stream_factory()가 만드는 비동기 제너레이터의 이벤트를 그대로 내보냅니다.
+        첫 이벤트를 내보내기 전에 실패한 경우에만 재시도합니다. (이미 전달한 조각을 되돌릴 수 없으므로)
+        """
+        attempt = 0
+        while True:
+            await self.rate_limiter.acquire(priority)
+            emitted = False
+            try:
+                async with self._slot(priority):
+                    async for event in stream_factory():
+                        emitted = True
+                        yield event
+                return
+            except Exception as e:
+                if emitted or attempt >= self.max_retries or not self.is_retryable(e):
+                    raise
+                RETRIES.inc(error_type=type(e).__name__)
+                await asyncio.sleep(self.backoff_seconds(attempt))
+                attempt += 1
+
+    def stats(self) -> dict:
+        hedge_delay = self.hedge_delay_seconds()
+        return {
+            "rate_limiter": self.rate_limiter.stats(),
+            "concurrency": self.concurrency.stats() if self.concurrency is not None else None,
+            "max_retries": self.max_retries,
+            "hedge_enabled": self.hedge_enabled,
+            "hedge_delay_ms": round(hedge_delay * 1000, 1) if hedge_delay is not None else None,
+        }
+
+
+def create_scheduler_from_env(is_retryable, rate_limit_rpm: float | None = None,
+                              max_concurrency: int = 0) -> UpstreamScheduler:
+    """
+    환경 변수 설정으로 스케줄러를 생성합니다.
+    UPSTREAM_RATE_LIMIT_RPM은 사용 중인 Gemini 요금제의 분당 요청 한도(RPM)에 맞춰 설정합니다. (0이면 제한 없음)
+    rate_limit_rpm을 지정하면 UPSTREAM_RATE_LIMIT_RPM 대신 사용합니다. (bulk_generate.py의 --rpm 등)
+    max_concurrency가 0보다 크면 동시에 진행하는 업스트림 호출 수를 우선순위 세마포어로 제한합니다.
+    """
+    if rate_limit_rpm is None:
+        rate_limit_rpm = float(os.getenv("UPSTREAM_RATE_LIMIT_RPM", "0"))
+    rate_limiter = PriorityRateLimiter(
+        rate_per_minute=rate_limit_rpm,
+        burst=float(os.getenv("UPSTREAM_RATE_LIMIT_BURST", "10")),
+    )
+    return UpstreamScheduler(
+        rate_limiter,
+        is_retryable,
+        concurrency=PrioritySemaphore(max_concurrency) if max_concurrency > 0 else None,
+        max_retries=int(os.getenv("UPSTREAM_MAX_RETRIES", "3")),
+        backoff_base_seconds=float(os.getenv("UPSTREAM_BACKOFF_BASE_MS", "500")) / 1000,
+        backoff_max_seconds=float(os.getenv("UPSTREAM_BACKOFF_MAX_MS", "8000")) / 1000,
+        hedge_enabled=os.getenv("UPSTREAM_HEDGE_ENABLED", "false").lower() in ("1", "true", "yes"),
+        hedge_min_delay_seconds=float(os.getenv("UPSTREAM_HEDGE_MIN_DELAY_MS", "1000")) / 1000,
+    )
@@ -1,12 +1,27 @@
+import os
+import sys
+
 import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'scripts'))
+from columnar import read_processed
+
 pd.set_option('display.max_colwidth', None)
 try:
-    df = pd.read_csv('data/processed_data/training_data.csv')
+    # 학습 데이터(JSONL)의 크기와 샘플을 확인합니다.
+    df = pd.read_json('data/processed_data/training_data.jsonl', lines=True)
     print(f'학습 데이터셋 크기: {df.shape}')
     print('\n--- 데이터 샘플 ---')
     print(df.head())
-except FileNotFoundError:
-    print("오류: data/processed_data/training_data.csv 파일을 찾을 수 없습니다.")
+
+    # 통합 리뷰는 필요한 열만 타입이 있는 그대로 읽습니다. (Parquet, 없으면 이전 형식의 CSV)
+    reviews = read_processed('data/processed_data/google_play_reviews_integrated.parquet',
+                             columns=['Star Rating', 'Developer Reply Text'])
+    replied = reviews['Developer Reply Text'].fillna('').str.strip() != ''
+    print(f'\n통합 리뷰 수: {len(reviews)} (답변 있음: {replied.sum()})')
+    print('\n--- 별점 분포 ---')
+    print(reviews['Star Rating'].value_counts().sort_index())
+except FileNotFoundError as e:
+    print(f"오류: 파일을 찾을 수 없습니다. ({e.filename})")
 except Exception as e:
     print(f"오류 발생: {e}")
-
@@ -1,5 +1,30 @@
+import argparse
+import csv
 import json
+import os
+import re
 import sys
+import tempfile
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from model_backend import estimate_token_count
+
+# Gemini 튜닝 데이터(JSONL)의 한 줄은 {"contents": [{"role": "user", "parts": [{"text": ...}]}, {"role": "model", ...}]} 형식입니다.
+# user로 시작해 user/model이 번갈아 나오고, model로 끝나야 합니다.
+ROLE_ORDER = ('user', 'model')
+# 예시 하나(모든 parts의 text 합계)의 최대 토큰 수입니다. 0이면 검사하지 않습니다.
+DEFAULT_MAX_TOKENS = 32_768
+# 예시 하나의 최대 글자 수입니다. 0이면 검사하지 않습니다.
+DEFAULT_MAX_CHARS = 0
+# 통계에 출력할 길이 백분위수입니다.
+PERCENTILES = (50, 90, 99, 100)
+# 화면에 보여줄 오류 줄 수입니다. (전체 목록은 오류 파일에 저장)
+PRINTED_ERRORS = 5
+
+# 카테고리가 없는 예시는 user 내용의 별점으로 구분합니다. (build_training_jsonl.py가 만드는 context 형식)
+STAR_RATING_PATTERN = re.compile(r'^Star Rating: (\d+)$', re.MULTILINE)
+
 
 def verify_json(file_path):
     try:
@@ -18,11 +43,271 @@ def verify_json(file_path):
         print(f"An unexpected error occurred: {e}")
         return False
 
-if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python verify_json.py <file_path>")
+
+def example_category(example, user_text):
+    """예시의 카테고리입니다. "category" 키가 있으면 그 값을, 없으면 별점(star_N)을, 둘 다 없으면 unknown을 사용합니다."""
+    category = example.get('category')
+    if isinstance(category, str) and category:
+        return category
+    match = STAR_RATING_PATTERN.search(user_text)
+    return f"star_{match.group(1)}" if match else 'unknown'
+
+
+def validate_example(line, max_chars=DEFAULT_MAX_CHARS, max_tokens=DEFAULT_MAX_TOKENS):
+    """
+    JSONL 한 줄을 검사합니다.
+    (오류 목록, 통계용 정보)를 반환합니다. 오류는 (종류, 설명) 튜플이며, 오류가 없을 때만 통계용 정보(dict)가 있습니다.
+    """
+    if not line.strip():
+        return [('empty_line', 'empty line')], None
+    try:
+        example = json.loads(line)
+    except ValueError as e:
+        return [('invalid_json', f'invalid JSON: {e}')], None
+    if not isinstance(example, dict):
+        return [('not_object', 'line is not a JSON object')], None
+    contents = example.get('contents')
+    if not isinstance(contents, list) or not contents:
+        return [('no_contents', '"contents" must be a non-empty list')], None
+
+    reasons = []
+    texts = {role: [] for role in ROLE_ORDER}
+    for index, content in enumerate(contents):
+        if not isinstance(content, dict):
+            reasons.append(('content_not_object', f'contents[{index}] is not an object'))
+            continue
+        role = content.get('role')
+        expected = ROLE_ORDER[index % len(ROLE_ORDER)]
+        if role not in ROLE_ORDER:
+            reasons.append(('invalid_role', f'contents[{index}].role is {role!r} (expected "user" or "model")'))
+        elif role != expected:
+            reasons.append(('role_order', f'contents[{index}].role is "{role}" (expected "{expected}")'))
+        parts = content.get('parts')
+        if not isinstance(parts, list) or not parts:
+            reasons.append(('no_parts', f'contents[{index}].parts must be a non-empty list'))
+            continue
+        for part_index, part in enumerate(parts):
+            text = part.get('text') if isinstance(part, dict) else None
+            if not isinstance(text, str):
+                reasons.append(('missing_text', f'contents[{index}].parts[{part_index}].text is missing'))
+            elif not text.strip():
+                reasons.append(('empty_text', f'contents[{index}].parts[{part_index}].text is empty'))
+            elif role in texts:
+                texts[role].append(text)
+    if isinstance(contents[-1], dict) and contents[-1].get('role') != ROLE_ORDER[-1]:
+        reasons.append(('last_role', 'last content must have role "model"'))
+
+    user_text = '\n'.join(texts['user'])
+    model_text = '\n'.join(texts['model'])
+    chars = len(user_text) + len(model_text)
+    tokens = estimate_token_count(user_text) + estimate_token_count(model_text)
+    if max_chars and chars > max_chars:
+        reasons.append(('too_many_chars', f'{chars} chars exceeds limit {max_chars}'))
+    if max_tokens and tokens > max_tokens:
+        reasons.append(('too_many_tokens', f'about {tokens} tokens exceeds limit {max_tokens}'))
+    if reasons:
+        return reasons, None
+    return [], {
+        'category': example_category(example, user_text),
+        'user_chars': len(user_text),
+        'model_chars': len(model_text),
+        'tokens': tokens,
+    }
+
+
+class JsonlStats:
+    """
+    검사 결과 통계입니다. 길이는 값별 개수(Counter)로만 보관하므로 줄 수와 관계없이 메모리 사용량이 일정하고,
+    병렬 처리한 구간의 결과를 merge로 합칠 수 있습니다.
+    """
+
+    def __init__(self):
+        self.lines = 0
+        self.valid = 0
+        self.categories = Counter()
+        self.reasons = Counter()
+        self.lengths = {'user_chars': Counter(), 'model_chars': Counter(), 'tokens': Counter()}
+
+    @property
+    def invalid(self):
+        return self.lines - self.valid
+
+    def add(self, reasons, info):
+        self.lines += 1
+        if reasons:
+            # 한 줄에 같은 종류의 오류가 여러 번 있어도 한 번만 셉니다.
+            self.reasons.update({kind for kind, _ in reasons})
+            return
+        self.valid += 1
+        self.categories[info['category']] += 1
+        for key, counter in self.lengths.items():
+            counter[info[key]] += 1
+
+    def merge(self, other):
+        self.lines += other.lines
+        self.valid += other.valid
+        self.categories.update(other.categories)
+        self.reasons.update(other.reasons)
+        for key, counter in self.lengths.items():
+            counter.update(other.lengths[key])
+
+    def percentiles(self, key):
+        """길이 분포의 백분위수(nearest-rank)를 {백분위: 값}으로 반환합니다."""
+        counter = self.lengths[key]
+        total = sum(counter.values())
+        if not total:
+            return {}
+        targets = {p: max(1, -(-total * p // 100)) for p in PERCENTILES}
+        result = {}
+        seen = 0
+        for value in sorted(counter):
+            seen += counter[value]
+            for p, rank in targets.items():
+                if p not in result and seen >= rank:
+                    result[p] = value
+        return result
+
+
+def split_ranges(file_path, count):
+    """파일을 바이트 기준으로 count개 구간으로 나눕니다. 구간의 경계는 항상 줄의 시작 위치입니다."""
+    size = os.path.getsize(file_path)
+    boundaries = [0]
+    with open(file_path, 'rb') as f:
+        for index in range(1, count):
+            position = size * index // count
+            if position <= boundaries[-1]:
+                continue
+            f.seek(position - 1)
+            f.readline()
+            position = f.tell()
+            if position >= size:
+                break
+            if position > boundaries[-1]:
+                boundaries.append(position)
+    boundaries.append(size)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+
+def validate_range(file_path, start, end, errors_path, max_chars=DEFAULT_MAX_CHARS, max_tokens=DEFAULT_MAX_TOKENS):
+    """
+    파일의 [start, end) 구간을 한 줄씩 읽어 검사합니다.
+    오류가 있는 줄은 (구간 안에서의 줄 번호, 사유)로 errors_path에 바로 쓰고, 통계만 반환합니다.
+    """
+    stats = JsonlStats()
+    with open(file_path, 'rb') as f, open(errors_path, 'w', encoding='utf-8', newline='') as errors_file:
+        writer = csv.writer(errors_file)
+        f.seek(start)
+        position = start
+        while position < end:
+            raw = f.readline()
+            if not raw:
+                break
+            position += len(raw)
+            try:
+                line = raw.decode('utf-8')
+            except UnicodeDecodeError as e:
+                reasons, info = [('invalid_utf8', f'invalid UTF-8: {e.reason}')], None
+            else:
+                reasons, info = validate_example(line, max_chars=max_chars, max_tokens=max_tokens)
+            stats.add(reasons, info)
+            if reasons:
+                writer.writerow([stats.lines, '; '.join(message for _, message in reasons)])
+    return stats
+
+
+def _validate_range_job(job):
+    return validate_range(*job)
+
+
+def verify_jsonl(file_path, errors_path, workers=1, max_chars=DEFAULT_MAX_CHARS, max_tokens=DEFAULT_MAX_TOKENS):
+    """
+    JSONL 파일 전체를 스트리밍으로 검사하고 통계를 반환합니다.
+    오류가 있는 모든 줄은 errors_path(CSV: line, reason)에 저장합니다.
+    workers가 2 이상이면 파일을 바이트 구간으로 나눠 여러 프로세스에서 검사합니다.
+    """
+    ranges = split_ranges(file_path, max(1, workers))
+    # 구간별 오류는 임시 파일에 쓰고, 끝난 뒤 앞 구간의 줄 수를 더해 전체 줄 번호로 바꿔 합칩니다.
+    tmp_dir = tempfile.mkdtemp(prefix='verify_jsonl_', dir=os.path.dirname(os.path.abspath(errors_path)))
+    jobs = [(file_path, start, end, os.path.join(tmp_dir, f'{index:05d}.csv'), max_chars, max_tokens)
+            for index, (start, end) in enumerate(ranges)]
+    try:
+        if len(jobs) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+                results = list(executor.map(_validate_range_job, jobs))
+        else:
+            results = [_validate_range_job(job) for job in jobs]
+
+        stats = JsonlStats()
+        with open(errors_path, 'w', encoding='utf-8-sig', newline='') as errors_file:
+            writer = csv.writer(errors_file)
+            writer.writerow(['line', 'reason'])
+            for job, range_stats in zip(jobs, results):
+                with open(job[3], 'r', encoding='utf-8', newline='') as part:
+                    for line_number, reason in csv.reader(part):
+                        writer.writerow([stats.lines + int(line_number), reason])
+                stats.merge(range_stats)
+    finally:
+        for job in jobs:
+            if os.path.exists(job[3]):
+                os.remove(job[3])
+        os.rmdir(tmp_dir)
+    return stats
+
+
+def print_jsonl_report(file_path, stats, errors_path):
+    print(f"Lines: {stats.lines} (valid: {stats.valid}, invalid: {stats.invalid})")
+    if stats.valid:
+        print("\nExamples per category:")
+        for category, count in sorted(stats.categories.items()):
+            print(f"  {category:<28}{count:>10}")
+        print("\nLength percentiles (" + ', '.join(f"p{p}" for p in PERCENTILES) + "):")
+        for key in stats.lengths:
+            values = stats.percentiles(key)
+            print(f"  {key:<28}" + ''.join(f"{values[p]:>10}" for p in PERCENTILES))
+    if stats.invalid:
+        print("\nInvalid lines by error type:")
+        for reason, count in stats.reasons.most_common():
+            print(f"  {count:>8}  {reason}")
+        print(f"\nERROR: {stats.invalid} invalid lines in '{file_path}'. All of them are listed in: {errors_path}")
+        with open(errors_path, 'r', encoding='utf-8-sig', newline='') as f:
+            rows = csv.reader(f)
+            next(rows)
+            for _, (line_number, reason) in zip(range(PRINTED_ERRORS), rows):
+                print(f"  - line {line_number}: {reason}")
+    else:
+        print(f"\nSUCCESS: '{file_path}' is a valid tuning JSONL file.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Validate a JSON file, or a Gemini tuning JSONL file line by line.")
+    parser.add_argument('file_path', help=".json file, or .jsonl training data.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Processes for .jsonl validation. The file is split into byte ranges.")
+    parser.add_argument('--max-chars', type=int, default=DEFAULT_MAX_CHARS,
+                        help="Max characters per example (0 = no limit).")
+    parser.add_argument('--max-tokens', type=int, default=DEFAULT_MAX_TOKENS,
+                        help="Max estimated tokens per example (0 = no limit).")
+    parser.add_argument('--errors', default=None,
+                        help="CSV file listing every invalid line. Defaults to <file>_errors.csv.")
+    args = parser.parse_args()
+
+    if not args.file_path.endswith('.jsonl'):
+        if not verify_json(args.file_path):
+            sys.exit(1)
+        return
+
+    if not os.path.exists(args.file_path):
+        print(f"ERROR: File not found at '{args.file_path}'.")
         sys.exit(1)
-    
-    file_to_check = sys.argv[1]
-    if not verify_json(file_to_check):
+    errors_path = args.errors or os.path.splitext(args.file_path)[0] + '_errors.csv'
+    stats = verify_jsonl(args.file_path, errors_path, workers=args.workers,
+                         max_chars=args.max_chars, max_tokens=args.max_tokens)
+    print_jsonl_report(args.file_path, stats, errors_path)
+    if stats.invalid:
         sys.exit(1)
+    # 오류가 없으면 이전 실행의 오류 목록이 남아 혼동되지 않도록 지웁니다.
+    os.remove(errors_path)
+
+
+if __name__ == "__main__":
+    main()